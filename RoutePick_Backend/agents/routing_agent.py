@@ -5,9 +5,11 @@ Google Maps Tool과 T Map Tool을 사용하여 경로를 최적화합니다.
 """
 # [신규] 필요한 라이브러리 import
 from typing import Any, Dict, List, Optional 
+import numpy as np
 from .base_agent import BaseAgent
 from tools.google_maps_tool import GoogleMapsTool
 from tools.tmap_tool import TMapTool
+from utils.geo import korea_mask
 
 
 class RoutingAgent(BaseAgent):
@@ -131,6 +133,9 @@ class RoutingAgent(BaseAgent):
                 print(f"❌ T Map API 예외 발생: {error_msg}")
                 print(f"⚠️ T Map API 예외 발생, Google Maps API로 폴백합니다.")
                 use_tmap = False
+            finally:
+                # 이벤트 루프가 끝나기 전에 HTTP 세션 정리
+                await self.tmap_tool.close()
         
         if not use_tmap:
             # Google Maps API 사용 (대중교통 또는 한국 외 지역 또는 T Map 실패 시)
@@ -221,52 +226,24 @@ class RoutingAgent(BaseAgent):
         if not places:
             return False
         
-        # 한국 영역 경계 (대략적인 범위)
-        KOREA_BOUNDS = {
-            "min_lat": 33.0,  # 제주도 남쪽
-            "max_lat": 38.6,  # DMZ 북쪽
-            "min_lng": 124.5,  # 서해
-            "max_lng": 132.0   # 동해
-        }
-        
-        has_valid_coords = False
-        korea_count = 0
-        non_korea_count = 0
-        
-        for place in places:
-            coords = place.get("coordinates")
-            if not coords:
-                continue
-            
-            lat = coords.get("lat")
-            lng = coords.get("lng")
-            
-            if lat is None or lng is None:
-                continue
-            
-            has_valid_coords = True
-            
-            # 한국 영역 확인
-            if (KOREA_BOUNDS["min_lat"] <= lat <= KOREA_BOUNDS["max_lat"] and
-                KOREA_BOUNDS["min_lng"] <= lng <= KOREA_BOUNDS["max_lng"]):
-                korea_count += 1
-            else:
-                non_korea_count += 1
-                # 한국 밖 장소가 하나라도 있으면 False
-                print(f"⚠️ 한국 영역 외 장소 발견: {place.get('name', 'Unknown')} ({lat}, {lng})")
-                return False
+        # 좌표가 있는 장소 전체를 한 번에 경계 비교
+        positions, inside = korea_mask(places)
         
         # 좌표가 있는 장소가 하나도 없으면 False (확인 불가)
-        if not has_valid_coords:
+        if not positions:
             print(f"⚠️ 좌표 정보가 있는 장소가 없어 한국 영역 확인 불가")
             return False
         
-        # 모든 좌표가 있는 장소가 한국 영역 내에 있으면 True
-        if korea_count > 0 and non_korea_count == 0:
-            print(f"✅ 한국 영역 확인: {korea_count}개 장소 모두 한국 내")
-            return True
+        # 한국 밖 장소가 하나라도 있으면 False
+        if not inside.all():
+            place = places[positions[int(np.argmin(inside))]]
+            coords = place.get("coordinates", {})
+            print(f"⚠️ 한국 영역 외 장소 발견: {place.get('name', 'Unknown')} ({coords.get('lat')}, {coords.get('lng')})")
+            return False
         
-        return False
+        # 모든 좌표가 있는 장소가 한국 영역 내에 있으면 True
+        print(f"✅ 한국 영역 확인: {len(positions)}개 장소 모두 한국 내")
+        return True
 
 
     def cluster_places(self, places: List[Dict], user_transportation: str) -> List[Dict]:
@@ -11,6 +11,10 @@ from tools.tavily_search_tool import TavilySearchTool
 import numpy as np
 from sklearn.cluster import DBSCAN
 
+# 장소명 추출 LLM 호출의 system 메시지 (호출마다 같은 dict 재사용)
+PLACE_EXTRACTION_SYSTEM_MESSAGE = {"role": "system", "content": "You are a professional travel data miner who never skips info. Output only JSON."}
+
+
 class SearchAgent(BaseAgent):
     """
     사용자의 테마를 [행동 단위]로 분석하여 [코스 구조]를 먼저 설계하고,
@@ -316,7 +320,7 @@ class SearchAgent(BaseAgent):
         try:
             response = await self.client.chat.completions.create(
                 model=self.llm_model,
-                messages=[{"role": "system", "content": "You are a professional travel data miner who never skips info. Output only JSON."},
+                messages=[PLACE_EXTRACTION_SYSTEM_MESSAGE,
                           {"role": "user", "content": prompt}],
                 max_tokens=1500,  # 장소명 리스트 추출에는 1500 토큰으로 충분 (입력 토큰 여유 확보)
                 temperature=0.3  # 일관된 JSON 형식 유지
@@ -466,7 +470,7 @@ class SearchAgent(BaseAgent):
                 try:
                     response = await self.client.chat.completions.create(
                         model=self.llm_model,
-                        messages=[{"role": "system", "content": "You are a professional travel data miner who never skips info. Output only JSON."},
+                        messages=[PLACE_EXTRACTION_SYSTEM_MESSAGE,
                                   {"role": "user", "content": prompt}],
                         max_tokens=1500,
                         temperature=0.3
@@ -1,11 +1,15 @@
 import asyncio
+import functools
 import threading
 import json
+import logging
 import os
 import re
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+import struct
+import zlib
+from flask import Flask, Response, render_template, request, jsonify, redirect, url_for, send_file, stream_with_context
 from flask_cors import CORS
-from chatbot import get_chatbot_response, clear_chat_history, parse_course_update  # chatbot.py가 course 객체를 인자로 받도록 수정 필요
+from chatbot import get_chatbot_response, stream_chatbot_response, clear_chat_history, parse_course_update, strip_course_update  # chatbot.py가 course 객체를 인자로 받도록 수정 필요
 from agents import SearchAgent, PlanningAgent
 from config.config import Config
 import uuid
@@ -14,6 +18,21 @@ import googlemaps
 from PIL import Image, ImageDraw, ImageFont
 import io # 메모리 상에서 이미지를 다루기 위함
 
+try:
+    # 선택 사항: SIMD(AVX2) 기반 PNG 인코더 (https://github.com/animetosho/python-fpnge)
+    import fpnge
+except ImportError:
+    fpnge = None
+
+try:
+    # 선택 사항: ISA-L 기반 DEFLATE (zlib 호환 API, 카드 PNG 압축에 사용)
+    from isal import isal_zlib as png_zlib
+except ImportError:
+    png_zlib = zlib
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.secret_key = 'string_secret_key'
 CORS(app)
@@ -352,9 +371,7 @@ async def execute_Agents(task_id, input_data):
         agent_tasks[task_id].update({"done": True, "success": True, "course": final_course, "message": "완료되었습니다."})
 
     except Exception as e:
-        print(f"\n❌ [{task_id}] 에이전트 실행 중 오류 발생: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ [%s] 에이전트 실행 중 오류 발생: %s", task_id, e)
         agent_tasks[task_id].update({"done": True, "success": False, "error": str(e), "message": f"오류 발생: {str(e)}"})
         
 def run_agent_task_with_id(task_id, input_data):
@@ -385,7 +402,7 @@ def create_trip():
     }
     threading.Thread(target=run_agent_task_with_id, args=(task_id, input_data_from_react)).start()
     
-    print(f"🚀 [{task_id}] 신규 작업 시작.")
+    logger.info("🚀 [%s] 신규 작업 시작.", task_id)
     return jsonify({"taskId": task_id, "status": "processing"})
 
 @app.route("/status/<task_id>")
@@ -410,6 +427,100 @@ def chat_page(task_id):
         # TODO: 더 나은 에러 페이지를 보여줄 수 있음
         return f"여행 경로 생성에 실패했습니다: {error_message}", 404
 
+def apply_course_update(task, update_info):
+    """
+    챗봇이 요청한 코스 변경(장소 추가/제거)을 task의 코스에 반영
+    
+    Returns:
+        변경된 코스 (변경되지 않았으면 None)
+    """
+    current_course = task.get('course')
+    course_updated = False
+    updated_course = None
+    
+    action = update_info.get('action')
+    
+    if action == 'add':
+        # 장소 추가
+        place_name = update_info.get('place_name')
+        if place_name:
+            try:
+                # Google Maps API로 장소 검색
+                gmaps = googlemaps.Client(key=Config.GOOGLE_MAPS_API_KEY)
+                location = current_course.get('location', '서울')
+                query = f"{location} {place_name}"
+                
+                places_result = gmaps.places(query=query)
+                if places_result.get('results'):
+                    result = places_result['results'][0]
+                    place_id = result.get('place_id')
+                    
+                    # 상세 정보 가져오기
+                    if place_id:
+                        fields = ['name', 'rating', 'formatted_address', 'photo', 'geometry/location']
+                        details = gmaps.place(place_id, fields=fields)
+                        if details and details.get('result'):
+                            place_data = details['result']
+                            
+                            # 새 장소 정보 구성
+                            new_place = {
+                                'name': place_data.get('name', place_name),
+                                'address': place_data.get('formatted_address', ''),
+                                'place_id': place_id,
+                                'rating': place_data.get('rating', 0),
+                                'category': '관광지',  # 기본값
+                                'coordinates': None
+                            }
+                            
+                            if 'geometry' in place_data and 'location' in place_data['geometry']:
+                                loc = place_data['geometry']['location']
+                                new_place['coordinates'] = {'lat': loc['lat'], 'lng': loc['lng']}
+                            
+                            # 장소 추가 (직접 로직 호출)
+                            current_course = task.get('course', {})
+                            places = current_course.get('places', [])
+                            sequence = current_course.get('sequence', [])
+                            
+                            new_index = len(places)
+                            places.append(new_place)
+                            insert_index = len(sequence)
+                            sequence.insert(insert_index, new_index)
+                            
+                            current_course['places'] = places
+                            current_course['sequence'] = sequence
+                            task['course'] = current_course
+                            updated_course = current_course
+                            course_updated = True
+            except Exception as e:
+                logger.exception("장소 추가 중 오류: %s", e)
+    
+    elif action == 'remove':
+        # 장소 제거
+        index = update_info.get('index')
+        if index is not None:
+            try:
+                # 장소 제거 (직접 로직 호출)
+                current_course = task.get('course', {})
+                places = current_course.get('places', [])
+                sequence = current_course.get('sequence', [])
+                
+                if index < len(sequence):
+                    removed_place_idx = sequence[index]
+                    sequence.pop(index)
+                    places.pop(removed_place_idx)
+                    sequence = [idx - 1 if idx > removed_place_idx else idx for idx in sequence]
+                    
+                    current_course['places'] = places
+                    current_course['sequence'] = sequence
+                    task['course'] = current_course
+                    updated_course = current_course
+                    course_updated = True
+            except Exception as e:
+                logger.exception("장소 제거 중 오류: %s", e)
+    
+    return updated_course if course_updated else None
+
+
 # --- 채팅 API: 이제 task_id를 받아 해당 코스에 대해 채팅하도록 수정 ---
 @app.route('/api/chat', methods=['POST'])
 def chat():
@@ -430,93 +541,11 @@ def chat():
     
     # 코스 업데이트 정보 파싱
     update_info = parse_course_update(bot_response)
-    course_updated = False
-    updated_course = None
-    
-    if update_info:
-        action = update_info.get('action')
-        
-        if action == 'add':
-            # 장소 추가
-            place_name = update_info.get('place_name')
-            if place_name:
-                try:
-                    # Google Maps API로 장소 검색
-                    gmaps = googlemaps.Client(key=Config.GOOGLE_MAPS_API_KEY)
-                    location = current_course.get('location', '서울')
-                    query = f"{location} {place_name}"
-                    
-                    places_result = gmaps.places(query=query)
-                    if places_result.get('results'):
-                        result = places_result['results'][0]
-                        place_id = result.get('place_id')
-                        
-                        # 상세 정보 가져오기
-                        if place_id:
-                            fields = ['name', 'rating', 'formatted_address', 'photo', 'geometry/location']
-                            details = gmaps.place(place_id, fields=fields)
-                            if details and details.get('result'):
-                                place_data = details['result']
-                                
-                                # 새 장소 정보 구성
-                                new_place = {
-                                    'name': place_data.get('name', place_name),
-                                    'address': place_data.get('formatted_address', ''),
-                                    'place_id': place_id,
-                                    'rating': place_data.get('rating', 0),
-                                    'category': '관광지',  # 기본값
-                                    'coordinates': None
-                                }
-                                
-                                if 'geometry' in place_data and 'location' in place_data['geometry']:
-                                    loc = place_data['geometry']['location']
-                                    new_place['coordinates'] = {'lat': loc['lat'], 'lng': loc['lng']}
-                                
-                                # 장소 추가 (직접 로직 호출)
-                                current_course = task.get('course', {})
-                                places = current_course.get('places', [])
-                                sequence = current_course.get('sequence', [])
-                                
-                                new_index = len(places)
-                                places.append(new_place)
-                                insert_index = len(sequence)
-                                sequence.insert(insert_index, new_index)
-                                
-                                current_course['places'] = places
-                                current_course['sequence'] = sequence
-                                task['course'] = current_course
-                                updated_course = current_course
-                                course_updated = True
-                except Exception as e:
-                    print(f"장소 추가 중 오류: {str(e)}")
-        
-        elif action == 'remove':
-            # 장소 제거
-            index = update_info.get('index')
-            if index is not None:
-                try:
-                    # 장소 제거 (직접 로직 호출)
-                    current_course = task.get('course', {})
-                    places = current_course.get('places', [])
-                    sequence = current_course.get('sequence', [])
-                    
-                    if index < len(sequence):
-                        removed_place_idx = sequence[index]
-                        sequence.pop(index)
-                        places.pop(removed_place_idx)
-                        sequence = [idx - 1 if idx > removed_place_idx else idx for idx in sequence]
-                        
-                        current_course['places'] = places
-                        current_course['sequence'] = sequence
-                        task['course'] = current_course
-                        updated_course = current_course
-                        course_updated = True
-                except Exception as e:
-                    print(f"장소 제거 중 오류: {str(e)}")
+    updated_course = apply_course_update(task, update_info) if update_info else None
+    course_updated = updated_course is not None
     
     # 응답에서 업데이트 태그 제거
-    import re
-    clean_response = re.sub(r'\[COURSE_UPDATE\].*?\[/COURSE_UPDATE\]', '', bot_response, flags=re.DOTALL).strip()
+    clean_response = strip_course_update(bot_response)
     
     return jsonify({
         "response": clean_response,
@@ -524,6 +553,52 @@ def chat():
         "course": updated_course if course_updated else None
     })
 
+def _sse_event(payload):
+    """Server-Sent Events 형식의 data 라인 생성"""
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """
+    /api/chat의 스트리밍 버전 (text/event-stream)
+    - 생성 중: {"delta": "..."} 이벤트로 답변을 조금씩 전송
+    - 완료 시: {"done": true, "response", "course_updated", "course"} 이벤트 (/api/chat 응답과 같은 필드)
+    """
+    data = request.json
+    user_message = data.get("message")
+    task_id = data.get("taskId")
+
+    if not all([user_message, task_id]):
+        return jsonify({"response": "메시지 또는 taskId가 누락되었습니다."}), 400
+    
+    task = agent_tasks.get(task_id)
+    if not task or not task.get('success'):
+        return jsonify({"response": "유효하지 않은 taskId입니다."}), 400
+
+    current_course = task.get('course')
+
+    def generate():
+        for event, text in stream_chatbot_response(user_message, current_course, task_id):
+            if event == "delta":
+                yield _sse_event({"delta": text})
+                continue
+            # 스트림 종료: 전체 응답으로 코스 업데이트 처리
+            update_info = parse_course_update(text)
+            updated_course = apply_course_update(task, update_info) if update_info else None
+            yield _sse_event({
+                "done": True,
+                "response": strip_course_update(text),
+                "course_updated": updated_course is not None,
+                "course": updated_course
+            })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 # --- 기타 API (필요 시 수정) ---
 @app.route('/api/locations/<task_id>', methods=['GET'])
 def get_locations(task_id):
@@ -727,7 +802,7 @@ def get_route_guide(task_id):
         # transit이 포함되어 있으면 transit을 우선 사용 (T Map API는 대중교통 미지원)
         if 'transit' in preferred_modes:
             transport_mode = 'transit'
-            print(f"🚇 대중교통 포함 감지: transit 모드로 설정 (T Map API는 대중교통 미지원)")
+            logger.info("🚇 대중교통 포함 감지: transit 모드로 설정 (T Map API는 대중교통 미지원)")
         else:
             transport_mode = preferred_modes[0]
     else:
@@ -899,7 +974,7 @@ def get_route_guide(task_id):
             
             # Google Maps API 키 확인
             if not config.get("google_maps_api_key"):
-                print("⚠️ Google Maps API 키가 없습니다. 기본 경로 안내를 제공합니다.")
+                logger.warning("⚠️ Google Maps API 키가 없습니다. 기본 경로 안내를 제공합니다.")
                 basic_guide, basic_paths = create_basic_guide()
                 return jsonify({"guide": basic_guide, "route_paths": basic_paths})
             
@@ -945,14 +1020,14 @@ def get_route_guide(task_id):
             # 결과 확인
             if not route_result.get("success"):
                 error_msg = route_result.get("error", "알 수 없는 오류")
-                print(f"⚠️ 경로 정보 가져오기 실패: {error_msg}")
+                logger.warning("⚠️ 경로 정보 가져오기 실패: %s", error_msg)
                 # 기본 안내 제공
                 return jsonify({"guide": create_basic_guide(), "route_paths": []})
             
             directions = route_result.get("directions", [])
             
             if not directions:
-                print("⚠️ 경로 안내 정보가 비어있습니다. 기본 안내를 제공합니다.")
+                logger.warning("⚠️ 경로 안내 정보가 비어있습니다. 기본 안내를 제공합니다.")
                 return jsonify({"guide": create_basic_guide(), "route_paths": []})
             
             # directions에 에러가 있는지 확인 (일부 구간만 에러가 있어도 나머지는 상세 안내 제공)
@@ -963,7 +1038,7 @@ def get_route_guide(task_id):
             
             # 모든 구간이 에러이거나 steps가 비어있을 때만 기본 안내 제공
             if not has_any_valid_directions:
-                print(f"⚠️ 모든 구간의 경로 안내에 문제가 있습니다. 기본 안내를 제공합니다.")
+                logger.warning("⚠️ 모든 구간의 경로 안내에 문제가 있습니다. 기본 안내를 제공합니다.")
                 # 모든 구간이 실패했을 때만 기본 안내 제공
                 basic_guide, basic_paths = create_basic_guide()
                 return jsonify({"guide": basic_guide, "route_paths": basic_paths})
@@ -984,22 +1059,21 @@ def get_route_guide(task_id):
                 error = direction.get("error")
                 
                 # 디버깅: direction 데이터 확인
-                print(f"\n=== 구간 {i} 데이터 확인 ===")
-                print(f"from: {from_place}, to: {to_place}")
-                print(f"mode: {mode}, steps 개수: {len(steps)}, error: {error}")
-                if steps and len(steps) > 0:
+                logger.debug("=== 구간 %d 데이터 확인 === from: %s, to: %s, mode: %s, steps 개수: %d, error: %s",
+                             i, from_place, to_place, mode, len(steps), error)
+                if steps and logger.isEnabledFor(logging.DEBUG):
                     first_step = steps[0]
-                    print(f"첫 번째 step 키들: {list(first_step.keys())}")
+                    logger.debug("첫 번째 step 키들: %s", list(first_step.keys()))
                     if "formatted_instruction" in first_step:
-                        print(f"첫 번째 step formatted_instruction: {first_step['formatted_instruction'][:100]}...")
+                        logger.debug("첫 번째 step formatted_instruction: %s...", first_step['formatted_instruction'][:100])
                     else:
-                        print(f"⚠️ 첫 번째 step에 formatted_instruction이 없습니다!")
+                        logger.debug("⚠️ 첫 번째 step에 formatted_instruction이 없습니다!")
                 
                 guide_text += f"<strong>{i}. {from_place} → {to_place}</strong>\n"
                 
                 # steps가 비어있으면 기본 안내만 제공 (더 상세하게)
                 if not steps or len(steps) == 0:
-                    print(f"⚠️ 구간 {i}의 steps가 비어있습니다. 기본 안내를 제공합니다.")
+                    logger.warning("⚠️ 구간 %d의 steps가 비어있습니다. 기본 안내를 제공합니다.", i)
                     
                     # 에러 메시지가 있으면 표시
                     if error:
@@ -1098,8 +1172,9 @@ def get_route_guide(task_id):
                 route_paths.append(segment_paths)
                 
                 # 디버깅: 경로 좌표 정보 로그
-                total_coords_in_segment = sum(len(sp.get("path", [])) for sp in segment_paths)
-                print(f"구간 {i} 경로 좌표 수집: {len(segment_paths)}개 step, 총 {total_coords_in_segment}개 좌표")
+                if logger.isEnabledFor(logging.DEBUG):
+                    total_coords_in_segment = sum(len(sp.get("path", [])) for sp in segment_paths)
+                    logger.debug("구간 %d 경로 좌표 수집: %d개 step, 총 %d개 좌표", i, len(segment_paths), total_coords_in_segment)
                 
                 # 이동 수단별 상세 안내
                 # 원본 directions JSON(raw_steps)을 우선적으로 사용
@@ -1122,7 +1197,7 @@ def get_route_guide(task_id):
                         for step_idx, step in enumerate(steps):
                             formatted_instruction = step.get("formatted_instruction")
                             if formatted_instruction:
-                                print(f"  ✅ 구간 {i}, step {step_idx} formatted_instruction 사용")
+                                logger.debug("✅ 구간 %d, step %d formatted_instruction 사용", i, step_idx)
                                 # formatted_instruction의 모든 줄을 그대로 사용 (버스 번호, 정류장, 시간 등 모든 정보 포함)
                                 transit_info_lines = formatted_instruction.split('\n')
                                 for line in transit_info_lines:
@@ -1342,7 +1417,7 @@ def get_route_guide(task_id):
                             has_transit_details = any(step.get("transit_details") for step in steps)
                             has_formatted = any(step.get("formatted_instruction") for step in steps)
                             
-                            print(f"  ⚠️ 구간 {i} transit_steps가 비어있음. has_transit_details={has_transit_details}, has_formatted={has_formatted}")
+                            logger.debug("⚠️ 구간 %d transit_steps가 비어있음. has_transit_details=%s, has_formatted=%s", i, has_transit_details, has_formatted)
                             
                             if has_formatted:
                                 # formatted_instruction이 있으면 강제로 사용
@@ -1511,7 +1586,7 @@ def get_route_guide(task_id):
                 sum(len(step.get("path", [])) for step in segment)
                 for segment in route_paths
             )
-            print(f"✅ 경로 안내 생성 완료: {len(route_paths)}개 구간, {total_paths}개 step, 총 {total_coords}개 좌표")
+            logger.info("✅ 경로 안내 생성 완료: %d개 구간, %d개 step, 총 %d개 좌표", len(route_paths), total_paths, total_coords)
             
             return jsonify({
                 "guide": guide_text,
@@ -1520,14 +1595,11 @@ def get_route_guide(task_id):
             
         except Exception as api_error:
             # Google Maps API 호출 실패 시 기본 안내 제공
-            print(f"⚠️ Google Maps API 호출 실패: {api_error}")
+            logger.warning("⚠️ Google Maps API 호출 실패: %s", api_error)
             return jsonify({"guide": create_basic_guide(), "route_paths": []})
         
     except Exception as e:
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"❌ 경로 안내 생성 중 오류 발생:")
-        print(error_detail)
+        logger.exception("❌ 경로 안내 생성 중 오류 발생")
         # 오류 발생 시에도 기본 안내 제공
         try:
             basic_guide = create_basic_guide()
@@ -1629,12 +1701,12 @@ def search_place():
                             if details.get('result'):
                                 places_result['results'].append(details['result'])
                         except Exception as e:
-                            print(f"⚠️ Place Details API 호출 실패 (place_id: {place_id}): {e}")
+                            logger.warning("⚠️ Place Details API 호출 실패 (place_id: %s): %s", place_id, e)
                             # 상세 정보 없이 기본 정보만 사용
                             places_result['results'].append(candidate)
         except Exception as e:
             error_msg = f"find_place 실패: {str(e)}"
-            print(f"⚠️ {error_msg}")
+            logger.warning("⚠️ %s", error_msg)
         
         # 방법 2: find_place가 실패하면 places 메서드 사용 (폴백)
         if not places_result or not places_result.get('results'):
@@ -1643,14 +1715,14 @@ def search_place():
                 places_result = gmaps.places(query=query)
             except Exception as e:
                 error_msg = f"places 검색 실패: {str(e)}"
-                print(f"⚠️ {error_msg}")
+                logger.warning("⚠️ %s", error_msg)
                 return jsonify({'error': f'장소 검색에 실패했습니다: {error_msg}'}), 500
         
         # API 응답 상태 확인
         if places_result.get('status') and places_result.get('status') != 'OK':
             status = places_result.get('status')
             error_message = places_result.get('error_message', '알 수 없는 오류')
-            print(f"⚠️ Google Places API 오류: {status} - {error_message}")
+            logger.warning("⚠️ Google Places API 오류: %s - %s", status, error_message)
             return jsonify({'error': f'장소 검색에 실패했습니다: {status} - {error_message}'}), 500
         
         if not places_result.get('results'):
@@ -1675,13 +1747,11 @@ def search_place():
             
             places.append(place_data)
         
-        print(f"✅ 장소 검색 성공: '{query}' -> {len(places)}개 결과")
+        logger.info("✅ 장소 검색 성공: '%s' -> %d개 결과", query, len(places))
         return jsonify({'places': places})
     except Exception as e:
         error_detail = str(e)
-        print(f"❌ 장소 검색 API 오류: {error_detail}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ 장소 검색 API 오류: %s", error_detail)
         return jsonify({'error': f'장소 검색 중 오류가 발생했습니다: {error_detail}'}), 500
 
 @app.route('/api/save-place', methods=['POST'])
@@ -1717,7 +1787,7 @@ def save_place():
         saved_places.append(place_data)
         save_places(saved_places)
         
-        print(f"✅ 장소 저장 완료: {place_data['name']} (카테고리: {raw_category} -> {normalized_category})")
+        logger.info("✅ 장소 저장 완료: %s (카테고리: %s -> %s)", place_data['name'], raw_category, normalized_category)
         
         return jsonify({'success': True, 'message': '장소가 저장되었습니다.'})
     except Exception as e:
@@ -1743,29 +1813,134 @@ def delete_saved_place(place_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-# (text_wrap 헬퍼 함수는 이전과 동일하게 유지)
-def text_wrap(text, font, max_width, draw):
+# 카드 이미지 출력 포맷: ?fmt= 값 -> (PIL 포맷, mimetype, 확장자)
+# PNG는 DEFLATE 인코딩 비용이 커서 기본값은 JPEG로 제공
+CARD_IMAGE_FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg', 'jpg'),
+    'jpeg': ('JPEG', 'image/jpeg', 'jpg'),
+    'webp': ('WEBP', 'image/webp', 'webp'),
+    'png': ('PNG', 'image/png', 'png'),
+}
+DEFAULT_CARD_FORMAT = 'jpg'
+
+# 카드 템플릿 이미지/폰트 경로 (실행 위치와 무관하게 app.py 기준으로 찾음)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CARD_TEMPLATE_PATH = os.path.join(BASE_DIR, "static", "images", "card_template_horizontal.png")
+CARD_FONT_PATH = os.path.join(BASE_DIR, "static", "fonts", "GowunDodum-Regular.ttf")
+
+
+def _load_card_assets():
+    """카드 템플릿 이미지와 폰트를 서버 시작 시 한 번만 로드 (요청마다 디스크 I/O 및 폰트 파싱 방지)"""
+    try:
+        with Image.open(CARD_TEMPLATE_PATH) as image:
+            template = image.copy()
+        fonts = {
+            'title': ImageFont.truetype(CARD_FONT_PATH, size=60),
+            'subtitle': ImageFont.truetype(CARD_FONT_PATH, size=34),
+            'place': ImageFont.truetype(CARD_FONT_PATH, size=20),
+        }
+        return template, fonts
+    except OSError as e:
+        # FileNotFoundError 포함: 서버는 띄우되 카드 생성 요청은 500으로 응답
+        logger.warning("⚠️ 카드 템플릿/폰트를 불러올 수 없습니다: %s", e)
+        return None, {}
+
+
+CARD_TEMPLATE, CARD_FONTS = _load_card_assets()
+
+# PNG 색상 타입 (IHDR): 그 외 모드는 RGBA로 변환 후 저장
+_PNG_COLOR_TYPES = {'RGB': 2, 'RGBA': 6}
+
+
+def _png_chunk(chunk_type, data):
+    """PNG 청크 (길이 + 타입 + 데이터 + CRC) 생성"""
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def _save_png_unfiltered(image, fp, compress_level=1):
+    """
+    모든 스캔라인에 필터 None(0)을 적용해 PNG로 저장
+    PIL은 줄마다 필터를 골라보는 휴리스틱을 옵션으로 끌 수 없어 청크를 직접 작성함
+    (단색 배경 + 텍스트 위주의 카드는 필터가 없어도 크기 차이가 거의 없음)
+    """
+    if image.mode not in _PNG_COLOR_TYPES:
+        image = image.convert('RGBA')
+    width, height = image.size
+    pixels = memoryview(image.tobytes())
+    stride = len(pixels) // height
+    # 각 행 앞에 필터 바이트 0을 붙임
+    scanlines = b'\x00' + b'\x00'.join(pixels[y * stride:(y + 1) * stride] for y in range(height))
+    header = struct.pack('>IIBBBBB', width, height, 8, _PNG_COLOR_TYPES[image.mode], 0, 0, 0)
+    fp.write(b'\x89PNG\r\n\x1a\n')
+    fp.write(_png_chunk(b'IHDR', header))
+    fp.write(_png_chunk(b'IDAT', png_zlib.compress(scanlines, compress_level)))
+    fp.write(_png_chunk(b'IEND', b''))
+
+
+def _longest_fitting_end(pieces, start, sep, measure, max_width):
+    """
+    pieces[start:end]를 sep로 이어 붙였을 때 max_width 안에 들어가는 가장 큰 end를 이진 탐색
+    (조각을 늘릴수록 너비가 단조 증가하므로 줄마다 O(log n)번만 측정, 최소 1조각은 포함)
+    """
+    lo, hi = start + 1, len(pieces)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if measure(sep.join(pieces[start:mid])) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _encode_card(template, pil_format):
+    """완성된 카드 이미지를 지정 포맷으로 인코딩하여 읽기 위치가 0인 BytesIO로 반환"""
+    img_io = io.BytesIO()
+    if pil_format == 'JPEG':
+        # 템플릿은 불투명 RGBA이므로 알파 채널을 버려도 결과가 동일함
+        template.convert('RGB').save(img_io, 'JPEG', quality=88, optimize=False, progressive=False)
+    elif pil_format == 'WEBP':
+        template.save(img_io, 'WEBP', quality=85, method=4)
+    else:
+        # 투명도가 필요한 경우를 위한 PNG 폴백
+        if fpnge is not None:
+            img_io.write(fpnge.fromPIL(template))
+        else:
+            # fpnge가 없으면 필터 없이 낮은 압축 레벨로 인코딩 시간 단축
+            _save_png_unfiltered(template, img_io, compress_level=1)
+    img_io.seek(0)
+    return img_io
+
+
+@functools.lru_cache(maxsize=4096)
+def text_wrap(text, font_key, max_width):
+    """
+    카드에 들어갈 텍스트를 max_width에 맞춰 줄 단위로 나눔
+    같은 장소 이름은 요청/사용자 간에 반복되므로 (텍스트, 폰트 키, 너비) 기준으로 결과를 캐시
+    (캐시된 리스트를 공유하므로 호출 측에서 수정하지 말 것)
+
+    Args:
+        text: 줄바꿈할 텍스트
+        font_key: CARD_FONTS의 키 (예: 'place')
+        max_width: 한 줄의 최대 픽셀 너비
+    """
+    measure = CARD_FONTS[font_key].getlength
     lines = []
-    words = text.split(' ')
-    current_line = ''
-    for word in words:
-        word_width = draw.textlength(word, font)
-        if word_width > max_width:
-            temp_word = ''
-            for char in word:
-                if draw.textlength(temp_word + char, font) > max_width:
-                    lines.append(temp_word)
-                    temp_word = char
-                else:
-                    temp_word += char
-            if temp_word: lines.append(temp_word)
+    words = text.split()
+    start = 0
+    while start < len(words):
+        word = words[start]
+        if measure(word) > max_width:
+            # 한 단어가 한 줄보다 길면 글자 단위로 분할
+            pos = 0
+            while pos < len(word):
+                end = _longest_fitting_end(word, pos, '', measure, max_width)
+                lines.append(word[pos:end])
+                pos = end
+            start += 1
             continue
-        if draw.textlength(current_line + ' ' + word, font) <= max_width:
-            current_line += ' ' + word
-        else:
-            lines.append(current_line.strip())
-            current_line = word
-    if current_line: lines.append(current_line.strip())
+        end = _longest_fitting_end(words, start, ' ', measure, max_width)
+        lines.append(' '.join(words[start:end]))
+        start = end
     return lines
 
 
@@ -1775,22 +1950,32 @@ def generate_travel_card(task_id):
     if not course_data:
         return "코스 정보를 찾을 수 없습니다.", 404
 
+    fmt = request.args.get('fmt', DEFAULT_CARD_FORMAT).lower()
+    if fmt not in CARD_IMAGE_FORMATS:
+        return f"지원하지 않는 이미지 형식입니다: {fmt} (jpg, webp, png 중 선택)", 400
+    pil_format, mimetype, extension = CARD_IMAGE_FORMATS[fmt]
+
     try:
         # --- [수정] 템플릿 맞춤 설정 (공격적 재조정) ---
-        template = Image.open("static/images/card_template_horizontal.png")
+        if CARD_TEMPLATE is None:
+            raise FileNotFoundError(CARD_TEMPLATE_PATH)
+        # 캐시된 원본은 그대로 두고 요청마다 복사본에 그림
+        template = CARD_TEMPLATE.copy()
         IMG_WIDTH, IMG_HEIGHT = template.size
         PADDING = 90
         
         draw = ImageDraw.Draw(template)
-        font_path = "static/fonts/GowunDodum-Regular.ttf"
 
-        # [수정] 폰트 사이즈 대폭 축소
-        title_font = ImageFont.truetype(font_path, size=60)
-        subtitle_font = ImageFont.truetype(font_path, size=34)
-        place_font = ImageFont.truetype(font_path, size=20) # <<< 훨씬 작게
+        # [수정] 폰트 사이즈 대폭 축소 (모듈 로드 시 생성된 폰트 재사용)
+        title_font = CARD_FONTS['title']
+        subtitle_font = CARD_FONTS['subtitle']
+        place_font = CARD_FONTS['place'] # <<< 훨씬 작게
         
         # [수정] 간격 대폭 축소
-        line_height = place_font.getbbox("A")[3] * 1.3 # 줄 간격
+        place_font_height = place_font.getbbox("A")[3]
+        line_height = place_font_height * 1.3 # 줄 간격
+        # multiline_text는 줄마다 getbbox("A")[3] + spacing 만큼 내려가므로 위와 같은 줄 간격이 됨
+        place_line_spacing = line_height - place_font_height
         item_gap = 20 # 장소와 장소 사이 간격
 
         # --- 텍스트 그리기 ---
@@ -1843,32 +2028,28 @@ def generate_travel_card(task_id):
                 cleaned = " ".join(cleaned.split())
                 draw.text((number_x, y_position), f"{i+1}.", font=place_font, fill="#111111")
                 
-                wrapped_lines = text_wrap(cleaned, place_font, max_width, draw)
+                wrapped_lines = text_wrap(cleaned, 'place', max_width)
                 
-                temp_y = y_position
-                for line in wrapped_lines:
-                    draw.text((text_x, temp_y), line, font=place_font, fill="#111111")
-                    temp_y += line_height
+                # 줄마다 draw.text를 부르지 않고 한 번에 그림
+                draw.multiline_text((text_x, y_position), "\n".join(wrapped_lines), font=place_font, fill="#111111", spacing=place_line_spacing)
                 
-                y_position = temp_y + item_gap
+                y_position += line_height * len(wrapped_lines) + item_gap
 
 
         # --- 이미지 파일로 변환 및 전송 ---
-        img_io = io.BytesIO()
-        template.save(img_io, 'PNG', quality=95)
-        img_io.seek(0)
+        img_io = _encode_card(template, pil_format)
 
         return send_file(
             img_io,
-            mimetype='image/png',
+            mimetype=mimetype,
             as_attachment=True,
-            download_name=f'RoutePick_{course_data.get("location", "")}.png'
+            download_name=f'RoutePick_{course_data.get("location", "")}.{extension}'
         )
 
     except FileNotFoundError:
         return "가로 템플릿 이미지를 찾을 수 없습니다.", 500
     except Exception as e:
-        print(f"이미지 생성 오류: {e}")
+        logger.exception("이미지 생성 오류: %s", e)
         return "이미지를 생성하는 중 오류가 발생했습니다.", 500
             
 # 기존의 단계별 입력 방식은 이제 사용되지 않으므로 주석 처리하거나 삭제 가능
@@ -1896,26 +2077,23 @@ def index():
     )
 
 if __name__ == '__main__':
+    # 운영 환경에서는 개발 서버(app.run) 대신 gunicorn으로 실행 (wsgi.py 참고)
+    if os.environ.get('FLASK_ENV') == 'production':
+        logger.error("FLASK_ENV=production에서는 개발 서버를 띄우지 않습니다. gunicorn으로 실행해주세요: gunicorn --preload -w 1 -k gthread --threads 8 wsgi:app")
+        raise SystemExit(1)
+    
     # Render 등 배포 환경에서는 PORT 환경변수 사용, 없으면 5000
     port = int(os.environ.get('PORT', 5000))
     # 배포 환경에서는 debug=False (재시작 방지)
     is_debug = os.environ.get('FLASK_DEBUG', '0') == '1'
     
     try:
-        print("=" * 50)
-        print("RoutePick 서버를 시작합니다...")
-        print(f"포트: {port}, 디버그 모드: {is_debug}")
-        print("=" * 50)
+        logger.info("RoutePick 서버를 시작합니다... (포트: %s, 디버그 모드: %s)", port, is_debug)
         app.run(debug=is_debug, port=port, host='0.0.0.0')
     except OSError as e:
         if "Address already in use" in str(e) or "포트가 이미 사용 중" in str(e):
-            print(f"\n오류: 포트 {port}이(가) 이미 사용 중입니다.")
-            print("다른 포트를 사용하거나 기존 프로세스를 종료해주세요.")
+            logger.error("오류: 포트 %s이(가) 이미 사용 중입니다. 다른 포트를 사용하거나 기존 프로세스를 종료해주세요.", port)
         else:
-            print(f"\n오류 발생: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("오류 발생: %s", e)
     except Exception as e:
-        print(f"\n예상치 못한 오류 발생: {e}")
-        import traceback
-        traceback.print_exc()
\ No newline at end of file
+        logger.exception("예상치 못한 오류 발생: %s", e)
\ No newline at end of file
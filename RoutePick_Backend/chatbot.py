@@ -1,15 +1,26 @@
 import os
+import re
 import json
+import logging
+import time
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
 from openai import OpenAI
-from config.config import Config
-from typing import List, Dict, Optional
+from config.config import OPENAI_API_KEY, REDIS_URL
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
 # from langchain.prompts import PromptTemplate
 
-# OpenAI 클라이언트 초기화 (Config에서 API 키 가져오기)
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
+try:
+    # 선택 사항: 여러 워커가 대화 히스토리를 공유할 때 사용
+    import redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
 
-# 대화 히스토리 저장 (task_id별로 관리)
-chat_histories: Dict[str, List[Dict[str, str]]] = {}
+# OpenAI 클라이언트 초기화 (Config에서 API 키 가져오기)
+client = OpenAI(api_key=OPENAI_API_KEY)
 
 """
 TODO:
@@ -49,24 +60,13 @@ Thought: {agent_scratchpad}
 
 # prompt = PromptTemplate.from_template(langchainPrompt)
 
-# langchain 사용 안 하는 버전 (개선된 interactive 챗봇)
+# 챗봇 응답 끝의 코스 업데이트 블록: [COURSE_UPDATE]{...}[/COURSE_UPDATE]
+COURSE_UPDATE_START = "[COURSE_UPDATE]"
+COURSE_UPDATE_END = "[/COURSE_UPDATE]"
+COURSE_UPDATE_PATTERN = re.compile(r'\[COURSE_UPDATE\](.*?)\[/COURSE_UPDATE\]', re.DOTALL)
 
-def get_chatbot_response(user_message: str, course: Dict, task_id: str = None) -> str:
-    """
-    개선된 챗봇 응답 생성
-    - 대화 히스토리 관리
-    - 맥락 이해 개선
-    - 더 자연스러운 대화
-    """
-    # 대화 히스토리 초기화 또는 가져오기
-    if task_id and task_id not in chat_histories:
-        chat_histories[task_id] = []
-    
-    # 코스 정보 포맷팅
-    course_info = format_course_info(course)
-    
-    # 시스템 프롬프트
-    system_prompt = f"""
+# 챗봇 시스템 프롬프트 ({COURSE_INFO} 자리에 코스 정보를 넣어 사용, 나머지는 고정 문자열)
+SYSTEM_PROMPT_TEMPLATE = """
     # 페르소나
     당신은 현지 지리에 능통한 전문 여행 가이드입니다.
     
@@ -91,7 +91,7 @@ def get_chatbot_response(user_message: str, course: Dict, task_id: str = None) -
     - 대화 중간에 볼드 표시나 특수 기호를 사용하지 말고, 자연스러운 문장으로 작성하세요.
     
     # 코스 정보
-    {course_info}
+    {COURSE_INFO}
     
     # 주의사항
     - 항상 제공된 코스 정보를 우선적으로 참고하세요.
@@ -107,31 +107,142 @@ def get_chatbot_response(user_message: str, course: Dict, task_id: str = None) -
     장소 변경이 필요한 경우, 응답 끝에 다음 형식으로 추가하세요:
     
     [COURSE_UPDATE]
-    {{
+    {
         "action": "add" 또는 "remove",
         "place_name": "장소 이름",
         "index": 제거할 경우 순서 번호 (0부터 시작)
-    }}
+    }
     [/COURSE_UPDATE]
     
     예시:
-    - "경복궁 추가해줘" → [COURSE_UPDATE]{{"action": "add", "place_name": "경복궁"}}[/COURSE_UPDATE]
-    - "첫 번째 장소 빼줘" → [COURSE_UPDATE]{{"action": "remove", "index": 0}}[/COURSE_UPDATE]
+    - "경복궁 추가해줘" → [COURSE_UPDATE]{"action": "add", "place_name": "경복궁"}[/COURSE_UPDATE]
+    - "첫 번째 장소 빼줘" → [COURSE_UPDATE]{"action": "remove", "index": 0}[/COURSE_UPDATE]
     
     주의: 장소 추가 시에는 장소 이름만 제공하면 됩니다. 시스템이 자동으로 검색하여 추가합니다.
     """
+
+# 대화 히스토리 제한
+MAX_HISTORY_MESSAGES = 20      # task_id별 보관 메시지 수 (오래된 메시지부터 자동 삭제)
+PROMPT_HISTORY_MESSAGES = 10   # 프롬프트에 포함할 최근 메시지 수
+MAX_CHAT_SESSIONS = 1000       # 동시에 보관하는 task_id 수 (가장 오래 사용하지 않은 것부터 삭제)
+CHAT_HISTORY_TTL = 6 * 60 * 60 # 마지막 대화 후 보관 시간 (초)
+
+# Redis 사용 시 task_id별 대화 히스토리 리스트 키 접두사
+CHAT_HISTORY_KEY_PREFIX = "chat:"
+
+
+def _connect_redis():
+    """REDIS_URL이 설정되어 있으면 Redis 클라이언트 생성 (없으면 None → 프로세스 메모리에 보관)"""
+    if not REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("⚠️ REDIS_URL이 설정되어 있지만 redis 패키지가 없어 대화 히스토리를 메모리에 보관합니다.")
+        return None
+    return redis.Redis.from_url(REDIS_URL)
+
+
+redis_client = _connect_redis()
+
+# 대화 히스토리 저장 (Redis를 쓰지 않을 때, task_id별로 관리, 최근 사용 순서 유지)
+chat_histories: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
+# task_id별 마지막 대화 시각 (time.monotonic 기준)
+_chat_last_access: Dict[str, float] = {}
+# gthread 워커의 여러 요청 스레드가 같은 히스토리 딕셔너리를 수정하므로 조회/추가/삭제 모두 이 락 안에서 수행
+_chat_lock = threading.Lock()
+
+
+def _evict_chat_histories(now: float):
+    """TTL이 지났거나 보관 개수를 초과한 대화 히스토리 정리 (오래 사용하지 않은 순)"""
+    while chat_histories:
+        oldest_task_id = next(iter(chat_histories))
+        expired = now - _chat_last_access.get(oldest_task_id, now) > CHAT_HISTORY_TTL
+        if not expired and len(chat_histories) <= MAX_CHAT_SESSIONS:
+            break
+        chat_histories.popitem(last=False)
+        _chat_last_access.pop(oldest_task_id, None)
+
+
+def _get_chat_history(task_id: str) -> Deque[Dict[str, str]]:
+    """task_id의 대화 히스토리를 가져오거나 새로 생성 (최근 사용으로 갱신, _chat_lock을 잡은 상태에서 호출)"""
+    now = time.monotonic()
+    history = chat_histories.get(task_id)
+    if history is None:
+        history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        chat_histories[task_id] = history
+    else:
+        chat_histories.move_to_end(task_id)
+    _chat_last_access[task_id] = now
+    _evict_chat_histories(now)
+    return history
+
+
+def _load_chat_history(task_id: str) -> List[Dict[str, str]]:
+    """프롬프트에 넣을 최근 대화 히스토리 (최대 PROMPT_HISTORY_MESSAGES개, 오래된 순)"""
+    if redis_client is not None:
+        try:
+            raw_messages = redis_client.lrange(CHAT_HISTORY_KEY_PREFIX + task_id, -PROMPT_HISTORY_MESSAGES, -1)
+        except redis.RedisError as e:
+            logger.warning("⚠️ 대화 히스토리 조회 실패 (task_id: %s): %s", task_id, e)
+            return []
+        return [json.loads(raw) for raw in raw_messages]
+    
+    with _chat_lock:
+        history = _get_chat_history(task_id)
+        return list(islice(history, max(0, len(history) - PROMPT_HISTORY_MESSAGES), None))
+
+
+def _save_chat_turn(task_id: str, user_message: str, bot_response: str):
+    """대화 한 턴(사용자 메시지 + 챗봇 응답)을 히스토리에 추가 (최근 MAX_HISTORY_MESSAGES개만 유지)"""
+    turn = (
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": bot_response},
+    )
+    if redis_client is not None:
+        key = CHAT_HISTORY_KEY_PREFIX + task_id
+        try:
+            pipe = redis_client.pipeline()
+            pipe.rpush(key, *(json.dumps(message, ensure_ascii=False) for message in turn))
+            pipe.ltrim(key, -MAX_HISTORY_MESSAGES, -1)
+            pipe.expire(key, CHAT_HISTORY_TTL)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("⚠️ 대화 히스토리 저장 실패 (task_id: %s): %s", task_id, e)
+        return
+    
+    with _chat_lock:
+        _get_chat_history(task_id).extend(turn)
+
+# langchain 사용 안 하는 버전 (개선된 interactive 챗봇)
+
+def _build_messages(user_message: str, course: Dict, history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """시스템 프롬프트 + 최근 대화 히스토리 + 현재 사용자 메시지로 요청 메시지 구성"""
+    # 코스 정보 포맷팅
+    course_info = format_course_info(course)
+    
+    # 시스템 프롬프트 (코스 정보만 요청마다 채워 넣음)
+    system_prompt = SYSTEM_PROMPT_TEMPLATE.replace("{COURSE_INFO}", course_info)
     
     # 대화 히스토리 구성
     messages = [{"role": "system", "content": system_prompt}]
     
     # 이전 대화 히스토리 추가 (최근 10개만)
-    if task_id and task_id in chat_histories:
-        recent_history = chat_histories[task_id][-10:]
-        for msg in recent_history:
-            messages.append(msg)
+    messages.extend(history)
     
     # 현재 사용자 메시지 추가
     messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+def get_chatbot_response(user_message: str, course: Dict, task_id: str = None) -> str:
+    """
+    개선된 챗봇 응답 생성
+    - 대화 히스토리 관리
+    - 맥락 이해 개선
+    - 더 자연스러운 대화
+    """
+    # 대화 히스토리 초기화 또는 가져오기
+    history = _load_chat_history(task_id) if task_id else []
+    messages = _build_messages(user_message, course, history)
     
     try:
         response = client.chat.completions.create(
@@ -145,34 +256,111 @@ def get_chatbot_response(user_message: str, course: Dict, task_id: str = None) -
         
         # 대화 히스토리 저장
         if task_id:
-            if task_id not in chat_histories:
-                chat_histories[task_id] = []
-            chat_histories[task_id].append({"role": "user", "content": user_message})
-            chat_histories[task_id].append({"role": "assistant", "content": bot_response})
+            _save_chat_turn(task_id, user_message, bot_response)
         
         return bot_response
     except Exception as e:
         error_msg = f"죄송합니다. 일시적인 오류가 발생했습니다. 다시 시도해주세요. 😔"
-        print(f"챗봇 오류: {str(e)}")
+        logger.exception("챗봇 오류: %s", e)
         return error_msg
 
 
+def _visible_length(text: str) -> int:
+    """
+    스트리밍 중 사용자에게 보여줘도 되는 길이
+    [COURSE_UPDATE] 블록과, 그 시작 태그의 앞부분일 수 있는 꼬리는 내보내지 않음
+    """
+    marker_idx = text.find(COURSE_UPDATE_START)
+    if marker_idx != -1:
+        return marker_idx
+    for keep in range(min(len(COURSE_UPDATE_START) - 1, len(text)), 0, -1):
+        if COURSE_UPDATE_START.startswith(text[-keep:]):
+            return len(text) - keep
+    return len(text)
+
+
+def stream_chatbot_response(user_message: str, course: Dict, task_id: str = None) -> Iterator[Tuple[str, str]]:
+    """
+    챗봇 응답을 토큰 단위로 스트리밍
+    
+    Yields:
+        ("delta", 화면에 추가할 텍스트) 이벤트들, 마지막에 ("done", 전체 응답 원문)
+        (원문에는 [COURSE_UPDATE] 블록이 포함될 수 있으므로 parse_course_update로 처리)
+    """
+    history = _load_chat_history(task_id) if task_id else []
+    messages = _build_messages(user_message, course, history)
+    
+    full_text = ""
+    emitted = 0
+    try:
+        stream = client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            max_tokens=800,  # 더 긴 답변 허용
+            temperature=0.8,  # 더 자연스러운 대화
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            full_text += delta
+            visible = _visible_length(full_text)
+            if visible > emitted:
+                yield "delta", full_text[emitted:visible]
+                emitted = visible
+    except Exception as e:
+        error_msg = f"죄송합니다. 일시적인 오류가 발생했습니다. 다시 시도해주세요. 😔"
+        logger.exception("챗봇 오류: %s", e)
+        yield "done", error_msg
+        return
+    
+    # 대화 히스토리 저장
+    if task_id:
+        _save_chat_turn(task_id, user_message, full_text)
+    
+    yield "done", full_text
+
+
 def parse_course_update(bot_response: str) -> Optional[Dict]:
     """챗봇 응답에서 코스 업데이트 정보 추출"""
-    import re
-    import json
+    # [COURSE_UPDATE]...[/COURSE_UPDATE] 블록 찾기 (대부분의 응답에는 블록이 없으므로 str.find로 바로 판단)
+    start = bot_response.find(COURSE_UPDATE_START)
+    if start == -1:
+        return None
+    start += len(COURSE_UPDATE_START)
+    end = bot_response.find(COURSE_UPDATE_END, start)
+    if end == -1:
+        return None
     
-    # [COURSE_UPDATE]...[/COURSE_UPDATE] 패턴 찾기
-    pattern = r'\[COURSE_UPDATE\](.*?)\[/COURSE_UPDATE\]'
-    match = re.search(pattern, bot_response, re.DOTALL)
-    
-    if match:
-        try:
-            update_data = json.loads(match.group(1).strip())
-            return update_data
-        except json.JSONDecodeError:
-            return None
-    return None
+    try:
+        update_data = json.loads(bot_response[start:end].strip())
+        return update_data
+    except json.JSONDecodeError:
+        return None
+
+
+def strip_course_update(bot_response: str) -> str:
+    """사용자에게 보여줄 응답 (코스 업데이트 블록 제거)"""
+    if COURSE_UPDATE_START not in bot_response:
+        return bot_response.strip()
+    return COURSE_UPDATE_PATTERN.sub('', bot_response).strip()
+
+
+def _durations_by_index(estimated_duration: Dict) -> Dict[int, object]:
+    """
+    체류 시간 딕셔너리의 키를 정수 장소 인덱스로 통일
+    JSON을 거치면 키가 "0"처럼 문자열이 되므로, 둘 다 있으면 문자열 키 값을 우선함
+    """
+    durations = {}
+    for key, value in estimated_duration.items():
+        if isinstance(key, int):
+            durations.setdefault(key, value)
+        elif str(key).isdigit():
+            durations[int(key)] = value
+    return durations
 
 
 def format_course_info(course: Dict) -> str:
@@ -187,36 +375,47 @@ def format_course_info(course: Dict) -> str:
     reasoning = course.get("reasoning", "")
     location = course.get("location", "")
     
-    info = "=== 코스 정보 ===\n\n"
+    parts = ["=== 코스 정보 ===\n\n"]
     
     if course_description:
-        info += f"📝 코스 설명:\n{course_description}\n\n"
+        parts.append(f"📝 코스 설명:\n{course_description}\n\n")
     
     if location:
-        info += f"📍 지역: {location}\n\n"
+        parts.append(f"📍 지역: {location}\n\n")
     
     if places and sequence:
-        info += "📍 방문 순서 및 장소 정보:\n"
+        parts.append("📍 방문 순서 및 장소 정보:\n")
+        durations = _durations_by_index(estimated_duration)
+        place_count = len(places)
         for idx, place_idx in enumerate(sequence, 1):
-            if place_idx < len(places):
+            if place_idx < place_count:
                 place = places[place_idx]
-                duration = estimated_duration.get(str(place_idx), estimated_duration.get(place_idx, "정보 없음"))
+                duration = durations.get(place_idx, "정보 없음")
+                map_url = place.get('map_url')
                 
-                info += f"\n{idx}. {place.get('name', '알 수 없음')}\n"
-                info += f"   - 카테고리: {place.get('category', 'N/A')}\n"
-                info += f"   - 체류 시간: {duration}분\n"
-                info += f"   - 평점: {place.get('rating', 'N/A')}\n"
-                info += f"   - 주소: {place.get('address', '주소 정보 없음')}\n"
-                if place.get('map_url'):
-                    info += f"   - 지도 링크: {place.get('map_url')}\n"
+                # 장소 하나당 문자열 하나로 만들어 추가
+                parts.append(
+                    f"\n{idx}. {place.get('name', '알 수 없음')}\n"
+                    f"   - 카테고리: {place.get('category', 'N/A')}\n"
+                    f"   - 체류 시간: {duration}분\n"
+                    f"   - 평점: {place.get('rating', 'N/A')}\n"
+                    f"   - 주소: {place.get('address', '주소 정보 없음')}\n"
+                    + (f"   - 지도 링크: {map_url}\n" if map_url else "")
+                )
     
     if reasoning:
-        info += f"\n💡 코스 선정 이유:\n{reasoning}\n"
+        parts.append(f"\n💡 코스 선정 이유:\n{reasoning}\n")
     
-    return info
+    return "".join(parts)
 
 
 def clear_chat_history(task_id: str):
     """특정 task_id의 대화 히스토리 초기화"""
-    if task_id in chat_histories:
-        del chat_histories[task_id]
\ No newline at end of file
+    with _chat_lock:
+        chat_histories.pop(task_id, None)
+        _chat_last_access.pop(task_id, None)
+    if redis_client is not None:
+        try:
+            redis_client.delete(CHAT_HISTORY_KEY_PREFIX + task_id)
+        except redis.RedisError as e:
+            logger.warning("⚠️ 대화 히스토리 삭제 실패 (task_id: %s): %s", task_id, e)
\ No newline at end of file
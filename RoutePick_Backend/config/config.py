@@ -11,40 +11,70 @@ from typing import Dict, Any
 load_dotenv()
 
 
+# API Keys
+TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
+GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
+T_MAP_API_KEY = os.getenv("T_MAP_API_KEY", "")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "") or os.getenv("OPENWEATHER_API_KEY", "")
+
+# LLM 설정
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+AGENT_VERBOSE = os.getenv("AGENT_VERBOSE", "0") == "1"  # LangChain Agent 실행 과정 출력 (디버깅용)
+
+# 검색 설정
+DEFAULT_MAX_RESULTS = int(os.getenv("DEFAULT_MAX_RESULTS", "20"))
+DEFAULT_MIN_RATING = float(os.getenv("DEFAULT_MIN_RATING", "4.0"))
+
+# Google Maps 설정
+DEFAULT_TRANSPORT_MODE = os.getenv("DEFAULT_TRANSPORT_MODE", "transit")
+
+# 챗봇 대화 히스토리/경로 구간 캐시 저장소 (비어 있으면 프로세스 메모리에 보관)
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+# Agent 설정 딕셔너리 (값이 바뀌지 않으므로 한 번만 생성)
+_AGENT_CONFIG: Dict[str, Any] = {
+    "api_key": TAVILY_API_KEY,
+    "google_maps_api_key": GOOGLE_MAPS_API_KEY,
+    "t_map_api_key": T_MAP_API_KEY,
+    "openai_api_key": OPENAI_API_KEY,
+    "weather_api_key": WEATHER_API_KEY,
+    "llm_model": LLM_MODEL,
+    "agent_verbose": AGENT_VERBOSE,
+    "max_results": DEFAULT_MAX_RESULTS,
+    "min_rating": DEFAULT_MIN_RATING,
+    "transport_mode": DEFAULT_TRANSPORT_MODE
+}
+
+
 class Config:
-    """전역 설정 클래스"""
+    """전역 설정 클래스 (모듈 상수에 대한 별칭)"""
     
     # API Keys
-    TAVILY_API_KEY = os.getenv("TAVILY_API_KEY", "")
-    GOOGLE_MAPS_API_KEY = os.getenv("GOOGLE_MAPS_API_KEY", "")
-    T_MAP_API_KEY = os.getenv("T_MAP_API_KEY", "")
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
-    WEATHER_API_KEY = os.getenv("WEATHER_API_KEY", "") or os.getenv("OPENWEATHER_API_KEY", "")
+    TAVILY_API_KEY = TAVILY_API_KEY
+    GOOGLE_MAPS_API_KEY = GOOGLE_MAPS_API_KEY
+    T_MAP_API_KEY = T_MAP_API_KEY
+    OPENAI_API_KEY = OPENAI_API_KEY
+    WEATHER_API_KEY = WEATHER_API_KEY
 
     # LLM 설정
-    LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    LLM_MODEL = LLM_MODEL
+    AGENT_VERBOSE = AGENT_VERBOSE
     
     # 검색 설정
-    DEFAULT_MAX_RESULTS = int(os.getenv("DEFAULT_MAX_RESULTS", "20"))
-    DEFAULT_MIN_RATING = float(os.getenv("DEFAULT_MIN_RATING", "4.0"))
+    DEFAULT_MAX_RESULTS = DEFAULT_MAX_RESULTS
+    DEFAULT_MIN_RATING = DEFAULT_MIN_RATING
     
     # Google Maps 설정
-    DEFAULT_TRANSPORT_MODE = os.getenv("DEFAULT_TRANSPORT_MODE", "transit")
+    DEFAULT_TRANSPORT_MODE = DEFAULT_TRANSPORT_MODE
+    
+    # 챗봇 대화 히스토리/경로 구간 캐시 저장소
+    REDIS_URL = REDIS_URL
     
     @classmethod
     def get_agent_config(cls) -> Dict[str, Any]:
-        """Agent 설정 딕셔너리 반환"""
-        return {
-            "api_key": cls.TAVILY_API_KEY,
-            "google_maps_api_key": cls.GOOGLE_MAPS_API_KEY,
-            "t_map_api_key": cls.T_MAP_API_KEY,
-            "openai_api_key": cls.OPENAI_API_KEY,
-            "weather_api_key": cls.WEATHER_API_KEY,
-            "llm_model": cls.LLM_MODEL,
-            "max_results": cls.DEFAULT_MAX_RESULTS,
-            "min_rating": cls.DEFAULT_MIN_RATING,
-            "transport_mode": cls.DEFAULT_TRANSPORT_MODE
-        }
+        """Agent 설정 딕셔너리 반환 (호출자가 수정할 수 있도록 얕은 복사본)"""
+        return _AGENT_CONFIG.copy()
     
     @classmethod
     def validate(cls) -> bool:
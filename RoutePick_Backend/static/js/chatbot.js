@@ -131,29 +131,88 @@ document.addEventListener('DOMContentLoaded', () => {
                 return;
             }
             
-            const response = await fetch('/api/chat', {
+            // 답변을 생성되는 대로 받아서 표시 (Server-Sent Events)
+            const response = await fetch('/api/chat/stream', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ message: message, taskId: taskId })
             });
-            const data = await response.json();
             
             // 로딩 메시지 제거
             removeLoadingMessage(loadingId);
             
-            // 봇 메시지를 타이핑 애니메이션으로 표시
-            appendMessageWithTyping('bot', data.response, () => {
+            if (!response.ok || !response.body) {
+                const errorData = await response.json();
+                appendMessage('bot', errorData.response);
+                return;
+            }
+            
+            const textElement = appendStreamingBotMessage();
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let streamedText = '';
+            let finalData = null;
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                
+                // 이벤트는 빈 줄(\n\n)로 구분됨
+                let separatorIndex;
+                while ((separatorIndex = buffer.indexOf('\n\n')) !== -1) {
+                    const line = buffer.slice(0, separatorIndex);
+                    buffer = buffer.slice(separatorIndex + 2);
+                    if (!line.startsWith('data: ')) continue;
+                    
+                    const event = JSON.parse(line.slice(6));
+                    if (event.done) {
+                        finalData = event;
+                    } else {
+                        streamedText += event.delta;
+                        textElement.innerHTML = streamedText.replace(/\n/g, '<br>');
+                        chatWindow.scrollTop = chatWindow.scrollHeight;
+                    }
+                }
+            }
+            
+            if (finalData) {
+                // 최종 응답(업데이트 태그 제거된 전체 텍스트)으로 교체
+                textElement.innerHTML = finalData.response.replace(/\n/g, '<br>');
                 // 코스가 업데이트되었으면 지도와 카드 업데이트
-                if (data.course_updated && data.course) {
-                    updateCourseDisplay(data.course);
+                if (finalData.course_updated && finalData.course) {
+                    updateCourseDisplay(finalData.course);
                 }
-            });
+            }
         } catch (error) {
             removeLoadingMessage(loadingId);
             appendMessage('bot', '오류가 발생했습니다. 다시 시도해주세요. 😔');
         }
     }
     
+    function appendStreamingBotMessage() {
+        // 스트리밍 응답을 채워 넣을 빈 봇 메시지를 만들고 텍스트 요소를 반환
+        const msgDiv = document.createElement('div');
+        msgDiv.className = 'message bot-message';
+        msgDiv.innerHTML = `
+            <div style="display: flex; align-items: flex-start; gap: 8px;">
+                <div style="width: 24px; height: 24px; border-radius: 50%; background: linear-gradient(135deg, #C5A683, #a0855f); display: flex; align-items: center; justify-content: center; flex-shrink: 0; margin-top: 2px;">
+                    <span style="color: white; font-size: 10px; font-weight: bold;">AI</span>
+                </div>
+                <div style="flex: 1;">
+                    <span class="typing-text"></span>
+                </div>
+            </div>
+        `;
+        chatWindow.appendChild(msgDiv);
+        chatWindow.scrollTo({
+            top: chatWindow.scrollHeight,
+            behavior: 'smooth'
+        });
+        return msgDiv.querySelector('.typing-text');
+    }
+    
     function showLoadingMessage() {
         const loadingId = 'loading-' + Date.now();
         const msgDiv = document.createElement('div');
@@ -3,9 +3,30 @@ Base Tool 클래스
 모든 Tool의 기본 인터페이스를 정의합니다.
 """
 
+import json
+import re
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
+import orjson
+
+try:
+    import json_repair  # 선택 사항: 깨진 LLM JSON을 한 번의 스캔으로 복구
+except ImportError:
+    json_repair = None
+
+# LLM 응답에서 첫 번째 JSON 객체만 읽을 때 사용
+_JSON_DECODER = json.JSONDecoder()
+
+# 마크다운 코드 블록 내용 (닫는 ```가 없으면 끝까지)
+# (.*?) 대신 백틱이 아닌 문자 덩어리 단위로 매칭해 긴 응답에서도 문자마다 되돌아가지 않음
+_JSON_FENCE_RE = re.compile(r"```json([^`]*(?:`(?!``)[^`]*)*)")
+_CODE_FENCE_RE = re.compile(r"```([^`]*(?:`(?!``)[^`]*)*)")
+
+# 문자열 리터럴(그룹 1, 그대로 유지) 또는 닫는 괄호 앞의 쉼표(공백/연속 쉼표 허용, 제거)
+# 문자열을 통째로 건너뛰므로 문자열 내부의 쉼표는 제거 대상이 아님 (닫히지 않은 문자열은 끝까지)
+_TRAILING_COMMA_RE = re.compile(r'("[^"\\]*(?:\\.[^"\\]*)*"?)|,(?=[\s,]*[}\]])', re.DOTALL)
+
 
 class BaseTool(ABC):
     """모든 Tool의 기본 클래스"""
@@ -75,4 +96,127 @@ class BaseTool(ABC):
             "description": self.description,
             "schema": self.get_schema()
         }
+    
+    def _remove_trailing_commas(self, json_str: str) -> str:
+        """
+        JSON 문자열에서 trailing comma 제거
+        배열과 객체 내부의 마지막 요소 뒤의 쉼표를 제거합니다.
+        (예: [1, 2, 3,] -> [1, 2, 3], {"a": 1,,} -> {"a": 1})
+        
+        문자열 값은 그대로 두므로 문자열 내부의 쉼표(예: "a,}")는 건드리지 않으며,
+        중첩 구조도 한 번의 치환으로 처리합니다.
+        """
+        if "," not in json_str:
+            return json_str
+        return _TRAILING_COMMA_RE.sub(r"\1", json_str)
+    
+    @staticmethod
+    def _parse_json_object(json_str: str) -> Optional[Dict[str, Any]]:
+        """
+        정리 작업 없이 JSON 객체 파싱 (실패하거나 딕셔너리가 아니면 None)
+        전체 파싱에 실패하면 첫 번째 객체만 읽어봄 (객체 뒤에 다른 텍스트가 붙은 경우)
+        """
+        try:
+            result = orjson.loads(json_str)
+        except orjson.JSONDecodeError:
+            start = json_str.find("{")
+            if start == -1:
+                return None
+            try:
+                result, _ = _JSON_DECODER.raw_decode(json_str, start)
+            except json.JSONDecodeError:
+                return None
+        return result if isinstance(result, dict) else None
+    
+    def _JSON_verification(self, response_content):
+        """
+        LLM 응답에서 JSON 객체 추출 (코드 블록/설명문 제거 후 파싱, 실패 시 복구 시도)
+        
+        Raises:
+            ValueError: 빈 응답이거나 JSON 객체로 복구할 수 없는 경우
+        """
+        if not response_content:
+            raise ValueError("LLM이 빈 응답을 반환했습니다.")
 
+        # JSON 부분만 추출 (마크다운 코드 블록 제거, ```json 블록 우선)
+        if "```" in response_content:
+            match = _JSON_FENCE_RE.search(response_content) or _CODE_FENCE_RE.search(response_content)
+            response_content = match.group(1).strip()
+        
+        # JSON 객체 시작/끝 찾기 (중괄호 기준)
+        json_start_idx = response_content.find("{")
+        json_end_idx = response_content.rfind("}") + 1
+        if json_start_idx != -1 and json_end_idx > json_start_idx:
+            response_content = response_content[json_start_idx:json_end_idx]
+        
+        # 대부분의 응답은 올바른 JSON이므로 정규식 정리 없이 먼저 파싱 시도
+        result = self._parse_json_object(response_content)
+        if result is not None:
+            return result
+        
+        # json_repair가 있으면 한 번의 스캔으로 복구 (trailing comma, 닫히지 않은 괄호/문자열 등)
+        # 복구 결과가 비어 있으면 아래 단계별 복구로 넘어가 기존 오류 메시지를 유지
+        if json_repair is not None:
+            repaired = json_repair.loads(response_content)
+            if isinstance(repaired, dict) and repaired:
+                return repaired
+        
+        # Trailing comma 제거 (파싱 전에 미리 처리)
+        response_content = self._remove_trailing_commas(response_content)
+        
+        # JSON 파싱 (강화된 오류 처리)
+        result = None
+        try:
+            result = orjson.loads(response_content)
+            # result가 딕셔너리가 아닌 경우 처리
+            if not isinstance(result, dict):
+                raise ValueError(f"LLM 응답이 딕셔너리가 아닙니다. 타입: {type(result)}")
+        except json.JSONDecodeError as e:
+            # 복구 시도 1: 첫 번째 { 부터 마지막 } 까지 다시 추출 + trailing comma 제거
+            try:
+                first_brace = response_content.find('{')
+                last_brace = response_content.rfind('}')
+                if first_brace != -1 and last_brace > first_brace:
+                    cleaned_json = response_content[first_brace:last_brace+1]
+                    # Trailing comma 제거
+                    cleaned_json = self._remove_trailing_commas(cleaned_json)
+                    result = orjson.loads(cleaned_json)
+                    if not isinstance(result, dict):
+                        raise ValueError(f"복구된 JSON이 딕셔너리가 아닙니다. 타입: {type(result)}")
+                else:
+                    raise ValueError(f"JSON 파싱 오류: {str(e)}\n응답 내용: {response_content[:500]}")
+            except:
+                # 복구 시도 2: 불완전한 JSON 복구 + trailing comma 제거
+                try:
+                    json_part = response_content[response_content.find('{'):]
+                    # 닫히지 않은 문자열/배열/객체 닫기
+                    open_braces = json_part.count('{')
+                    close_braces = json_part.count('}')
+                    open_brackets = json_part.count('[')
+                    close_brackets = json_part.count(']')
+                    
+                    json_part += '}' * (open_braces - close_braces)
+                    json_part += ']' * (open_brackets - close_brackets)
+                    # Trailing comma 제거 (여러 번 적용)
+                    json_part = self._remove_trailing_commas(json_part)
+                    json_part = json_part.rstrip().rstrip(',')
+                    if not json_part.endswith('}'):
+                        json_part += '}'
+                    
+                    result = orjson.loads(json_part)
+                    if not isinstance(result, dict):
+                        raise ValueError(f"복구된 JSON이 딕셔너리가 아닙니다. 타입: {type(result)}")
+                except Exception as recovery_error:
+                    # 모든 복구 시도 실패
+                    error_detail = f"원본 오류: {str(e)}\n복구 시도 오류: {str(recovery_error)}"
+                    raise ValueError(f"JSON 파싱 오류: {error_detail}\n응답 내용: {response_content[:500]}\n\nLLM이 JSON 형식으로 응답하지 않았습니다. 작업을 거부했거나 다른 형식으로 응답한 것 같습니다.")
+        
+        # result가 None이면 에러
+        if result is None:
+            raise ValueError("JSON 파싱에 실패했습니다.")
+        
+        # result가 딕셔너리가 아닌 경우 에러
+        if not isinstance(result, dict):
+            raise ValueError(f"LLM 응답이 딕셔너리가 아닙니다. 타입: {type(result)}, 값: {result}")
+        
+        return result
@@ -3,199 +3,845 @@
 검색된 장소들을 바탕으로 최적의 코스를 생성합니다.
 """
 
-import json
+import asyncio
+import collections
+import contextlib
+import copy
+import functools
+import hashlib
+import itertools
+import logging
 import os
 import re
+import threading
+import time
+from datetime import date, datetime, timedelta
+from importlib.resources import files
+import httpx
+import numpy as np
 import openai
+import orjson
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.agents import AgentExecutor, create_openai_tools_agent
 from langchain_core.tools import tool
+from langchain_core.messages import SystemMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from .base_tool import BaseTool
 from .google_maps_tool import GoogleMapsTool
 from .tmap_tool import TMapTool
-from config.config import Config
+from config.config import Config, REDIS_URL
+from utils.geo import haversine_m, haversine_matrix, korea_bounds_mask, nearest_neighbors, shortest_path_order
+
+try:
+    import tiktoken  # 선택 사항: 프롬프트 장소 목록 토큰 수 계산 (langchain-openai와 함께 설치됨)
+except ImportError:
+    tiktoken = None
+
+try:
+    import redis  # 선택 사항: REDIS_URL 설정 시 경로 구간 캐시를 워커/재시작 간 공유
+except ImportError:
+    redis = None
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 config = Config.get_agent_config()
 config["api_key"] = os.getenv("GOOGLE_MAPS_API_KEY") 
 maptool = GoogleMapsTool(config=config)
 tmaptool = TMapTool(config=config)
 
+# 방문 날짜 형식 (YYYY-MM-DD 또는 YYYY/MM/DD, 월/일은 한 자리도 허용)
+VISIT_DATE_PATTERN = re.compile(r"(\d{4})([-/])(\d{1,2})\2(\d{1,2})")
+RELATIVE_VISIT_DAYS = {"오늘": 0, "today": 0, "내일": 1, "tomorrow": 1}
+
 # check_routing 결과 캐시 (같은 장소 조합에 대한 중복 호출 방지)
-_routing_cache = {}
+ROUTING_CACHE_TTL = 60 * 60  # 교통 상황/대중교통 운행 정보가 바뀌므로 한 시간만 유지
+ROUTING_CACHE_MAX_SIZE = 512
+_routing_cache = {}  # (mode, 장소 조합) -> (저장 시각, 경로 결과), 최근 사용한 항목이 뒤쪽
+# 구간별 결과 캐시 (장소 조합이 달라도 같은 두 장소 사이 구간은 재사용)
+LEG_CACHE_MAX_SIZE = 2048
+_leg_cache = {}  # (mode, 출발 좌표, 도착 좌표) -> (저장 시각, 구간 결과)
+# Redis 사용 시 구간 결과 키 접두사 (값은 JSON, ROUTING_CACHE_TTL 후 만료)
+LEG_CACHE_KEY_PREFIX = "routing:leg:"
 
-@tool
-async def check_routing(
-        places: List[Dict[str, Any]],  # 필수 파라미터로 명시 (기본값 제거)
-        origin: Optional[Dict[str, Any]] = None,
-        destination: Optional[Dict[str, Any]] = None,
-        mode: str = "transit",  # 'driving', 'walking', 'transit' (자전거 제외)
-    ) -> Dict[str, Any]:
+# check_routing이 Agent에게 돌려주는 구간 요약 (step/path 등 원본 데이터는 토큰만 차지)
+SLIM_DIRECTION_FIELDS = ("from", "to", "duration_text", "distance_text", "mode", "error")
+SLIM_DIRECTIONS_MAX_LEGS = 10
+
+# T Map 응답이 이 시간(초) 안에 오지 않으면 Google Maps도 동시에 요청 (hedged request)
+TMAP_HEDGE_DELAY_SECONDS = 2.0
+
+# 코스 생성 결과 캐시 (프롬프트 입력이 같으면 Agent/LLM 호출 생략)
+COURSE_CACHE_TTL = 24 * 60 * 60  # 영업시간 등 장소 정보가 바뀔 수 있으므로 하루만 유지
+COURSE_CACHE_MAX_SIZE = 100
+_course_cache = {}  # cache_key -> (저장 시각, 코스 결과)
+
+# 코스 설명 결과 캐시 (입력이 달라도 planner가 같은 코스를 고르면 설명 LLM 호출 생략)
+DESCRIPTION_CACHE_TTL = 60 * 60
+DESCRIPTION_CACHE_MAX_SIZE = 256
+_description_cache = {}  # (모델, 설명 프롬프트) 해시 -> (저장 시각, 설명 결과), 최근 사용한 항목이 뒤쪽
+
+# 프롬프트용 장소 목록 문자열 캐시 (같은 장소 목록을 다시 포맷팅하지 않도록)
+PLACES_PROMPT_CACHE_MAX_SIZE = 100
+_places_prompt_cache = {}  # 장소별 포맷팅 입력값 튜플 -> 포맷팅된 문자열
+
+# tool 없이 호출하는 LLM 응답을 JSON 스키마로 강제 (마크다운 코드 블록/설명문 섞인 응답 및 복구 파싱 방지)
+# 주의: 코스 제작 Agent에는 스키마 대신 JSON 모드만 사용 - LangChain은 response_format 인자가 있으면 parse API로 호출하는데,
+#       parse API는 strict가 아닌 tool(check_routing 등)을 거부하므로 extra_body로 전달 (PLANNER_RESPONSE_FORMAT)
+# 코스 제작(planner) 출력 스키마 (estimated_duration은 장소 인덱스를 키로 쓰므로 strict 스키마로 표현할 수 없음)
+COURSE_OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "selected_places": {"type": "array", "items": {"type": "integer"}},
+        "sequence": {"type": "array", "items": {"type": "integer"}},
+        "estimated_duration": {"type": "object", "additionalProperties": {"type": "integer"}},
+        "course_description": {"type": "string"},
+        "reasoning": {"type": "string"},
+    },
+    "required": ["selected_places", "sequence", "estimated_duration", "course_description", "reasoning"],
+    "additionalProperties": False,
+}
+COURSE_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "course", "schema": COURSE_OUTPUT_SCHEMA, "strict": False},
+}
+COURSE_DESCRIPTION_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "course_description",
+        "schema": {
+            "type": "object",
+            "properties": {"course_description": {"type": "string"}},
+            "required": ["course_description"],
+            "additionalProperties": False,
+        },
+        "strict": True,
+    },
+}
+
+# execute_many()에서 동시에 진행할 기본 코스 생성 수 (LLM 호출 자체는 _llm_call_slots로 따로 제한)
+EXECUTE_MANY_MAX_CONCURRENCY = 8
+
+# Batch API(비대화형 대량 코스 생성)용 planner 입력 (Batch에서는 tool 호출 루프를 돌 수 없음)
+BATCH_PLANNER_INPUT = (
+    "{theme}에 맞는 여행 코스를 제작해 주세요. "
+    "이 요청에서는 check_routing/check_routing_batch tool을 사용할 수 없습니다. "
+    "각 장소의 '근처' 목록과 좌표로 이동 거리를 판단하세요."
+)
+BATCH_COMPLETION_WINDOW = "24h"
+
+# 코스 제작 Agent 최대 반복 횟수 (check_routing_batch/근접 장소 정보로 도구 호출 라운드가 줄어 8회면 충분)
+PLANNER_MAX_ITERATIONS = 8
+
+# 코스 제작 Agent 응답 형식/길이 (최종 JSON이 20개 장소 기준 1000토큰 안팎이므로 여유를 두고 제한)
+PLANNER_RESPONSE_FORMAT = {"type": "json_object"}
+PLANNER_MAX_COMPLETION_TOKENS = 2048
+
+# 프롬프트에 넣을 최대 장소 수 (30 -> 20으로 감소, 토큰 길이 초과 방지)
+MAX_PLACES_FOR_PROMPT = 20
+
+# 날씨를 따로 조회할 최대 지역 수 (약 11km 격자 기준, 지역별 조회는 동시에 실행)
+WEATHER_MAX_REGIONS = 3
+
+# 프롬프트 장소 목록의 최대 토큰 수 (넘으면 저장된 장소/신뢰도/평점 순으로 남김)
+PLACES_PROMPT_TOKEN_BUDGET = 1500
+
+# 프롬프트에 표시할 장소별 근접 장소 수 (LLM이 check_routing 없이 후보를 좁힐 수 있도록)
+NEAREST_PLACES_K = 5
+
+# 프롬프트용 카테고리 약어 (토큰 절약)
+CATEGORY_SHORT_NAMES = {
+    '식당': '식', '카페': '카', '관광지': '관',
+    '쇼핑': '쇼', '활동': '활', '숙소': '숙'
+}
+SAVED_PLACE_MARK = "⭐"  # 프롬프트에서 저장된 장소 표시
+
+# Agent 없이 바로 코스를 구성하는 조건 (장소가 적고 모두 가까이 모여 있는 경우)
+COMPACT_COURSE_MAX_PLACES = 6  # 순서 전수 탐색이 가능한 크기 (6! = 720)
+COMPACT_COURSE_MAX_SPAN_M = 3000  # 가장 먼 두 장소 사이 거리 (미터)
+COMPACT_COURSE_STAY_MINUTES = 60  # 장소당 예상 체류 시간 (분)
+
+
+# OpenAI HTTP 클라이언트 설정 (코스 제작 Agent와 설명 생성 호출이 공유)
+OPENAI_TIMEOUT_SECONDS = 60.0
+OPENAI_MAX_RETRIES = 2
+OPENAI_MAX_CONNECTIONS = 100
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = 20
+
+# 동시에 진행하는 코스 생성 LLM 호출 수 제한 (OpenAI rate limit 보호)
+# 작업마다 별도 스레드의 이벤트 루프에서 실행되므로 asyncio.Semaphore 대신 threading 세마포어 사용
+MAX_CONCURRENT_LLM_CALLS = int(os.getenv("COURSE_LLM_CONCURRENCY", "4"))
+_llm_call_slots = threading.BoundedSemaphore(MAX_CONCURRENT_LLM_CALLS)
+
+# 코스 설명 출력 토큰 상한 (최근 응답 길이의 P95 * 1.2, 표본이 모이기 전에는 최대값 사용)
+# 필요 이상으로 큰 상한은 서버 스케줄링/rate limit 토큰 예약에 불리함 (모든 작업 스레드 공유)
+DESCRIPTION_MAX_COMPLETION_TOKENS = 2000
+DESCRIPTION_MIN_COMPLETION_TOKENS = 800  # 짧은 응답만 모였을 때도 긴 코스 설명이 잘리지 않도록
+DESCRIPTION_TOKEN_MARGIN = 1.2
+DESCRIPTION_TOKEN_HISTORY_SIZE = 1000
+DESCRIPTION_TOKEN_RETUNE_EVERY = 50  # 이 횟수마다 상한 재계산
+_description_token_history = collections.deque(maxlen=DESCRIPTION_TOKEN_HISTORY_SIZE)
+_description_token_lock = threading.Lock()
+_description_calls = 0
+_description_max_tokens = DESCRIPTION_MAX_COMPLETION_TOKENS
+
+# OpenAI 응답 헤더(x-ratelimit-*) 기준 rate limit 상태
+# 남은 요청/토큰이 바닥나면 reset 시각까지 새 호출을 보내지 않음 (429 연쇄 방지, 모든 작업 스레드 공유)
+RATE_LIMIT_MIN_TOKENS = 4000  # 코스 설명 호출 1회 분량 (프롬프트 + 최대 출력 2000토큰)
+_rate_limit_resume_at = 0.0  # time.monotonic() 기준
+_RESET_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_RESET_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _parse_reset_seconds(value: Optional[str]) -> float:
+    """x-ratelimit-reset-* 헤더 값(예: "1s", "6m0s", "20ms")을 초 단위로 변환"""
+    if not value:
+        return 0.0
+    return sum(float(amount) * _RESET_DURATION_UNITS[unit] for amount, unit in _RESET_DURATION_RE.findall(value))
+
+
+def _update_rate_limit(headers) -> None:
+    """응답 헤더의 남은 요청/토큰 수를 보고 필요하면 reset까지 새 호출 대기 설정"""
+    global _rate_limit_resume_at
+    try:
+        remaining_requests = int(headers.get("x-ratelimit-remaining-requests", MAX_CONCURRENT_LLM_CALLS))
+        remaining_tokens = int(headers.get("x-ratelimit-remaining-tokens", RATE_LIMIT_MIN_TOKENS))
+    except (TypeError, ValueError):
+        return
+    wait = 0.0
+    # 동시에 진행 중인 호출이 남은 요청 수를 모두 쓸 수 있으므로 슬롯 수 기준으로 판단
+    if remaining_requests < MAX_CONCURRENT_LLM_CALLS:
+        wait = max(wait, _parse_reset_seconds(headers.get("x-ratelimit-reset-requests")))
+    if remaining_tokens < RATE_LIMIT_MIN_TOKENS:
+        wait = max(wait, _parse_reset_seconds(headers.get("x-ratelimit-reset-tokens")))
+    if wait > 0:
+        _rate_limit_resume_at = max(_rate_limit_resume_at, time.monotonic() + wait)
+        logger.warning("⚠️ OpenAI rate limit 한도 근접 (남은 요청 %d, 토큰 %d): %.1f초 동안 새 호출 대기",
+                       remaining_requests, remaining_tokens, wait)
+
+
+@contextlib.asynccontextmanager
+async def _llm_call_slot():
+    """LLM 호출 슬롯 확보 (빈 슬롯이 생기고 rate limit이 풀릴 때까지 이벤트 루프를 막지 않고 대기)"""
+    delay = _rate_limit_resume_at - time.monotonic()
+    if delay > 0:
+        await asyncio.sleep(delay)
+    while not _llm_call_slots.acquire(blocking=False):
+        await asyncio.sleep(0.05)
+    try:
+        yield
+    finally:
+        _llm_call_slots.release()
+
+
+async def _read_json_stream(stream) -> str:
     """
-    주어진 장소들에 대해 경로 최적화를 실행합니다.
+    스트리밍 응답을 모으다가 최상위 JSON 객체가 닫히면 바로 중단
+    (닫는 중괄호 뒤의 토큰이나 종료 청크를 기다리지 않음, 문자열 안의 중괄호는 무시)
+    """
+    parts = []
+    depth = 0
+    in_string = escaped = False
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            text = chunk.choices[0].delta.content
+            if not text:
+                continue
+            parts.append(text)
+            for char in text:
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == "\\":
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char == "{":
+                    depth += 1
+                elif char == "}":
+                    depth -= 1
+                    if depth == 0:
+                        return "".join(parts)
+    finally:
+        await stream.close()
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=8)
+def _get_token_encoder(model: str):
+    """모델의 tiktoken 인코더 (tiktoken이 없거나 인코딩 파일을 받을 수 없으면 None)"""
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning("⚠️ tiktoken 인코더를 불러오지 못해 글자 수로 토큰 수를 추정합니다: %s", e)
+        return None
+
+
+def _to_float(value: Any) -> float:
+    """정렬용 숫자 변환 (숫자가 아니면 0)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _top_k_indices(scores: np.ndarray, k: int) -> List[int]:
+    """
+    점수가 높은 순으로 상위 k개 인덱스 (점수가 같으면 앞쪽 인덱스 우선, 안정 정렬 후 자른 결과와 동일)
     
-    **중요: 이 함수를 호출할 때는 반드시 'places' 파라미터를 전달해야 합니다.**
-    **주의: 이미 검증한 경로는 다시 확인하지 마세요. 캐시된 결과를 사용합니다.**
+    np.partition으로 k번째 점수만 찾고 상위 k개 안에서만 정렬합니다.
+    """
+    n = len(scores)
+    k = max(0, min(k, n))
+    neg = -scores
+    if k < n:
+        kth = np.partition(neg, k - 1)[k - 1] if k else -np.inf
+        top = np.flatnonzero(neg < kth)
+        ties = np.flatnonzero(neg == kth)[:k - len(top)]
+        top = np.concatenate([top, ties])
+    else:
+        top = np.arange(n)
+    return top[np.argsort(neg[top], kind='stable')].tolist()
+
+
+@functools.lru_cache(maxsize=4096)
+def _format_place_fields(name: str, category: str, is_saved: bool, coords: Optional[tuple], rating: Any) -> str:
+    """
+    프롬프트용 장소 한 줄에서 인덱스/근처 목록을 뺀 부분 (이름|카테고리|⭐|좌표|평점)
+    인자는 CourseCreationTool._place_prompt_key의 값 (같은 장소면 캐시된 문자열 재사용)
+    """
+    # 장소 이름 (최대 25자로 제한)
+    if len(name) > 25:
+        name = name[:22] + "..."
     
-    Args:
-        places: 장소 정보 리스트 (필수, 각 장소는 name, address, coordinates 등을 포함)
-               각 장소는 반드시 coordinates 필드를 포함해야 합니다: {{"lat": 위도, "lng": 경도}}
-        origin: 출발지 (선택사항, 없으면 places의 첫 번째 항목)
-        destination: 도착지 (선택사항, 없으면 places의 마지막 항목)
-        mode: 이동 수단 ('driving', 'walking', 'transit') (자전거 제외)
+    # 최소한의 정보만 포함 (토큰 절약)
+    fields = [name]
     
-    Returns:
-        경로 최적화 결과 딕셔너리
-    """
-    # places가 None이거나 비어있으면 오류 반환
-    if not places:
-        return {
-            "success": False,
-            "optimized_route": [],
-            "total_duration": 0,
-            "total_distance": 0,
-            "directions": [],
-            "error": "places 파라미터가 필수입니다."
-        }
+    # 카테고리 (간략하게, 1글자로 축약)
+    if category:
+        fields.append(CATEGORY_SHORT_NAMES.get(category, category[:1]))
+
+    # 저장된 장소 플래그 (간략하게)
+    if is_saved:
+        fields.append(SAVED_PLACE_MARK)
     
-    # 좌표가 동일하거나 매우 가까운 장소 사전 필터링
-    import math
-    def haversine_distance(lat1, lon1, lat2, lon2):
-        """두 지점 간 거리 계산 (미터)"""
-        R = 6371000  # 지구 반지름 (미터)
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-        a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        return R * c
+    # 좌표 정보 (정밀도 더 낮춤: 소수점 2자리까지만)
+    if coords:
+        fields.append(f"{float(coords[0]):.2f},{float(coords[1]):.2f}")
+
+    # 평점 (소수점 제거, 정수만)
+    if rating:
+        fields.append(str(int(float(rating))))
     
-    # 장소가 2개이고 매우 가까운 경우 (10m 이내) 직접 경로 반환
-    if len(places) == 2:
-        coords1 = places[0].get("coordinates", {})
-        coords2 = places[1].get("coordinates", {})
-        if coords1.get("lat") and coords1.get("lng") and coords2.get("lat") and coords2.get("lng"):
-            try:
-                lat1, lng1 = float(coords1["lat"]), float(coords1["lng"])
-                lat2, lng2 = float(coords2["lat"]), float(coords2["lng"])
-                distance_m = haversine_distance(lat1, lng1, lat2, lng2)
-                if distance_m < 10:
-                    print(f"✅ [check_routing] 두 지점이 매우 가까움 ({distance_m:.1f}m), 직접 경로 반환 (API 호출 생략)")
-                    return {
-                        "success": True,
-                        "total_duration": 0,
-                        "total_distance": int(distance_m),
-                        "directions": [{
-                            "from": places[0].get("name", "Unknown"),
-                            "to": places[1].get("name", "Unknown"),
-                            "duration_text": "즉시",
-                            "distance_text": f"{int(distance_m)}m",
-                            "mode": mode,
-                            "error": None
-                        }],
-                        "mode": mode,
-                        "error": None
-                    }
-            except (ValueError, TypeError):
-                pass
+    # 주소, 링크, 설명 등은 모두 제거 (토큰 절약)
+    return "|".join(fields)
+
+
+def _record_description_tokens(completion_tokens: int):
+    """코스 설명 출력 토큰 수 기록 (DESCRIPTION_TOKEN_RETUNE_EVERY번마다 출력 토큰 상한 재계산)"""
+    global _description_calls, _description_max_tokens
+    with _description_token_lock:
+        _description_token_history.append(completion_tokens)
+        _description_calls += 1
+        if _description_calls % DESCRIPTION_TOKEN_RETUNE_EVERY:
+            return
+        p95 = float(np.percentile(_description_token_history, 95))
+        _description_max_tokens = int(min(
+            DESCRIPTION_MAX_COMPLETION_TOKENS,
+            max(DESCRIPTION_MIN_COMPLETION_TOKENS, p95 * DESCRIPTION_TOKEN_MARGIN),
+        ))
+    logger.info("📏 코스 설명 출력 토큰 상한 재계산: %d (최근 %d회 P95 %.0f)",
+                _description_max_tokens, len(_description_token_history), p95)
+
+
+def _dumps_for_prompt(value: Any) -> str:
+    """프롬프트에 넣을 JSON 문자열 (orjson: 한글을 이스케이프하지 않고 공백 없이 직렬화)"""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+
+def _course_cache_key(*prompt_inputs: str) -> str:
+    """코스 생성 캐시 키 (LLM에 들어가는 입력 문자열 기준)"""
+    return hashlib.md5("\x1f".join(prompt_inputs).encode()).hexdigest()
+
+
+def _get_cached_course(cache_key: str) -> Optional[Dict[str, Any]]:
+    """TTL 안에 저장된 코스 결과의 복사본 반환 (없거나 만료되면 None)"""
+    cached = _course_cache.get(cache_key)
+    if cached is None:
+        return None
+    stored_at, course_result = cached
+    if time.monotonic() - stored_at > COURSE_CACHE_TTL:
+        _course_cache.pop(cache_key, None)
+        return None
+    # 호출자가 코스를 수정(챗봇의 장소 추가/제거 등)해도 캐시가 바뀌지 않도록 복사본 반환
+    return copy.deepcopy(course_result)
+
+
+def _store_cached_course(cache_key: str, course_result: Dict[str, Any]):
+    """코스 결과 저장 (최대 COURSE_CACHE_MAX_SIZE개, 가장 오래된 항목부터 제거)"""
+    if cache_key not in _course_cache and len(_course_cache) >= COURSE_CACHE_MAX_SIZE:
+        _course_cache.pop(next(iter(_course_cache)), None)
+    _course_cache[cache_key] = (time.monotonic(), copy.deepcopy(course_result))
+
+
+def _get_cached_description(cache_key: str) -> Optional[Dict[str, Any]]:
+    """TTL 안에 저장된 코스 설명 결과 반환 (없거나 만료되면 None, 조회한 항목은 최근 사용으로 이동)"""
+    cached = _description_cache.pop(cache_key, None)
+    if cached is None:
+        return None
+    stored_at, description_result = cached
+    if time.monotonic() - stored_at > DESCRIPTION_CACHE_TTL:
+        return None
+    _description_cache[cache_key] = cached
+    return dict(description_result)
+
+
+def _store_cached_description(cache_key: str, description_result: Dict[str, Any]):
+    """코스 설명 결과 저장 (최대 DESCRIPTION_CACHE_MAX_SIZE개, 가장 오래 사용하지 않은 항목부터 제거)"""
+    _description_cache.pop(cache_key, None)
+    while len(_description_cache) >= DESCRIPTION_CACHE_MAX_SIZE:
+        _description_cache.pop(next(iter(_description_cache)), None)
+    _description_cache[cache_key] = (time.monotonic(), dict(description_result))
+
+
+def _get_cached_routing(cache: Dict[Tuple, tuple], cache_key: Tuple) -> Optional[Dict[str, Any]]:
+    """TTL 안에 저장된 경로/구간 결과 반환 (없거나 만료되면 None, 조회한 항목은 최근 사용으로 이동)"""
+    cached = cache.pop(cache_key, None)
+    if cached is None:
+        return None
+    stored_at, routing_result = cached
+    if time.monotonic() - stored_at > ROUTING_CACHE_TTL:
+        return None
+    cache[cache_key] = cached
+    return routing_result
+
+
+def _store_cached_routing(cache: Dict[Tuple, tuple], cache_key: Tuple, routing_result: Dict[str, Any], max_size: int):
+    """경로/구간 결과 저장 (최대 max_size개, 가장 오래 사용하지 않은 항목부터 제거)"""
+    cache.pop(cache_key, None)
+    while len(cache) >= max_size:
+        cache.pop(next(iter(cache)), None)
+    cache[cache_key] = (time.monotonic(), routing_result)
+
+
+def _connect_redis():
+    """REDIS_URL이 설정되어 있으면 Redis 클라이언트 생성 (없으면 None → 프로세스 메모리 캐시만 사용)"""
+    if not REDIS_URL:
+        return None
+    if redis is None:
+        logger.warning("⚠️ REDIS_URL이 설정되어 있지만 redis 패키지가 없어 경로 구간 캐시를 메모리에만 보관합니다.")
+        return None
+    return redis.Redis.from_url(REDIS_URL)
+
+
+redis_client = _connect_redis()
+
+
+def _shared_leg_key(leg_key: Tuple) -> str:
+    """구간 캐시 키의 Redis 키 (예: routing:leg:walking:37.5,127.0:37.51,127.01)"""
+    mode, (start_lat, start_lng), (end_lat, end_lng) = leg_key
+    return f"{LEG_CACHE_KEY_PREFIX}{mode}:{start_lat},{start_lng}:{end_lat},{end_lng}"
+
+
+def _load_shared_legs(leg_keys: List[Tuple]) -> Dict[Tuple, Dict[str, Any]]:
+    """Redis에 저장된 구간 결과를 한 번에 조회해 메모리 캐시에도 저장 (Redis 미사용/오류 시 빈 딕셔너리)"""
+    if redis_client is None or not leg_keys:
+        return {}
+    try:
+        raw_legs = redis_client.mget([_shared_leg_key(key) for key in leg_keys])
+    except redis.RedisError as e:
+        logger.warning("⚠️ 경로 구간 캐시 조회 실패: %s", e)
+        return {}
+    found = {}
+    for key, raw in zip(leg_keys, raw_legs):
+        if raw is not None:
+            found[key] = orjson.loads(raw)
+            _store_cached_routing(_leg_cache, key, found[key], LEG_CACHE_MAX_SIZE)
+    return found
+
+
+def _store_shared_legs(legs: Dict[Tuple, Dict[str, Any]]):
+    """구간 결과를 Redis에 저장 (ROUTING_CACHE_TTL 후 만료, 다른 워커/재시작 후에도 재사용)"""
+    if redis_client is None or not legs:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key, leg in legs.items():
+            pipe.set(_shared_leg_key(key), orjson.dumps(leg), ex=ROUTING_CACHE_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("⚠️ 경로 구간 캐시 저장 실패: %s", e)
+
+
+def _place_coordinates(place: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """장소의 (위도, 경도) (좌표가 없거나 숫자가 아니면 None)"""
+    coords = place.get("coordinates") or {}
+    try:
+        return float(coords["lat"]), float(coords["lng"])
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _rounded_coordinates(place: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    """구간 캐시 키용 좌표 (소수점 4자리, 약 11m 정밀도, 좌표가 없거나 숫자가 아니면 None)"""
+    coords = _place_coordinates(place)
+    return (round(coords[0], 4), round(coords[1], 4)) if coords is not None else None
+
+
+def _route_leg_keys(rounded_coords: List[Any], mode: str) -> Optional[List[Tuple]]:
+    """방문 순서대로 연속한 두 장소 구간의 캐시 키 (좌표가 없는 장소가 있으면 None)"""
+    if len(rounded_coords) < 2 or not all(isinstance(c, tuple) for c in rounded_coords):
+        return None
+    # 대중교통은 방향에 따라 노선/소요 시간이 달라지므로 출발/도착 순서를 구분
+    return [(mode, start, end) for start, end in zip(rounded_coords, rounded_coords[1:])]
+
+
+def _store_route_legs(places: List[Dict[str, Any]], result: Dict[str, Any], mode: str):
+    """
+    경로 조회 결과의 구간별 정보를 구간 캐시에 저장 (오류가 났거나 경로 정보가 비어 있는 구간은 제외)
     
-    # 캐시 키 생성 (장소 이름과 좌표, mode 기반)
-    import hashlib
-    places_key = []
+    Google Maps는 경유지 순서를 최적화해 반환할 수 있으므로 구간의 from/to 장소 이름으로 좌표를 찾습니다.
+    """
+    coords_by_name = {}
     for place in places:
-        coords = place.get("coordinates", {})
-        lat = coords.get('lat', '')
-        lng = coords.get('lng', '')
-        # 좌표를 소수점 4자리로 반올림하여 캐시 키 생성 (약 11m 정밀도)
+        name = place.get("name")
+        coords = _rounded_coordinates(place)
+        # 이름이 같은데 좌표가 다른 장소는 어느 구간인지 알 수 없으므로 제외
+        coords_by_name[name] = coords if coords_by_name.get(name, coords) == coords else None
+    shared_legs = {}
+    for direction in result.get("directions", []):
+        if direction.get("error") or (not direction.get("steps") and not direction.get("duration")):
+            continue
+        start = coords_by_name.get(direction.get("from"))
+        end = coords_by_name.get(direction.get("to"))
+        if start is None or end is None:
+            continue
+        leg_key = (mode, start, end)
+        leg = {
+            "duration": direction.get("duration", 0),
+            "distance": direction.get("distance", 0),
+            "duration_text": direction.get("duration_text"),
+            "distance_text": direction.get("distance_text"),
+            "mode": direction.get("mode"),
+            "error": None,
+        }
+        _store_cached_routing(_leg_cache, leg_key, leg, LEG_CACHE_MAX_SIZE)
+        shared_legs[leg_key] = leg
+    _store_shared_legs(shared_legs)
+
+
+def _assemble_route(places: List[Dict[str, Any]], legs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """구간별 결과를 방문 순서대로 이어 붙여 경로 조회 결과 형식으로 변환"""
+    directions = [
+        {**leg, "from": start.get("name", "Unknown"), "to": end.get("name", "Unknown")}
+        for start, end, leg in zip(places, places[1:], legs)
+    ]
+    errors = [d["error"] for d in directions if d.get("error")]
+    return {
+        "success": not errors,
+        "total_duration": sum(d.get("duration") or 0 for d in directions),
+        "total_distance": sum(d.get("distance") or 0 for d in directions),
+        "directions": directions,
+        "error": errors[0] if errors else None,
+    }
+
+def _load_prompt(filename: str) -> str:
+    """tools/prompts/ 아래 프롬프트 파일 읽기 (모듈 로드 시 한 번만 호출)"""
+    text = files(__package__).joinpath("prompts", filename).read_text(encoding="utf-8")
+    return text.replace("\r\n", "\n").strip()
+
+# 코스 제작 Agent 시스템 프롬프트
+# 요청마다 바이트 단위로 같아야 OpenAI 프롬프트 캐시(앞부분 1024토큰 이상 일치 시)가 적용되므로
+# 템플릿 변수 없이 고정 메시지로 두고, 요청별 데이터는 human 메시지(PLANNER_INPUT_TEMPLATE)로 전달
+PLANNER_SYSTEM_INSTRUCTION = _load_prompt("course_planner_system.md")
+PLANNER_INPUT_TEMPLATE = """{input}
+
+# Input Data
+- 장소 리스트: {places}
+- 허용 인덱스 범위: {allowed_indices}
+- 추천 동선: {suggested_route}
+- 사용자 선호: {user_preferences}
+- 시간 제약: {time_constraints}
+- 날씨 정보: {weather_info}"""
+
+PLANNER_PROMPT = ChatPromptTemplate.from_messages([
+    SystemMessage(content=PLANNER_SYSTEM_INSTRUCTION),
+    MessagesPlaceholder(variable_name="chat_history", optional=True),
+    ("human", PLANNER_INPUT_TEMPLATE),
+    MessagesPlaceholder(variable_name="agent_scratchpad"),
+])
+
+# 날씨 정보가 있을 때 Agent 입력에 덧붙이는 안내
+PLANNER_WEATHER_HINT = "날씨 정보를 반드시 고려하여 실내/야외 장소를 적절히 선택하고, 날씨가 나쁘면 이동 경로를 최소화하세요."
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_absolute_visit_date(visit_date: str) -> Optional[str]:
+    """
+    "오늘"/"내일"을 제외한 방문 날짜 문자열을 YYYY-MM-DD 형식으로 파싱 (같은 문자열은 캐시된 결과 사용)
+    
+    "오늘"/"내일"은 날짜가 바뀌면 결과가 달라지므로 여기서 처리하지 않음 (캐시하지 않음)
+    """
+    candidates = [visit_date]
+    # 날짜 범위 처리 (예: "2025-01-29 ~ 2025-01-31"): 첫 번째 날짜 먼저 확인
+    if "~" in visit_date or "-" in visit_date:
+        date_parts = visit_date.split("~")
+        if len(date_parts) > 1:
+            first_date = date_parts[0].strip()
+        else:
+            first_date = visit_date.split()[0] if visit_date.split() else visit_date
+        candidates.insert(0, first_date)
+    
+    # YYYY-MM-DD 또는 YYYY/MM/DD 형식 (strptime 시도/예외 반복 없이 정규식 한 번으로 확인)
+    for candidate in candidates:
+        match = VISIT_DATE_PATTERN.fullmatch(candidate)
+        if not match:
+            continue
+        year, separator, month, day = match.groups()
         try:
-            if lat and lng:
-                lat = round(float(lat), 4)
-                lng = round(float(lng), 4)
-        except (ValueError, TypeError):
-            pass
-        places_key.append(f"{place.get('name', '')}:{lat}:{lng}")
+            parsed_date = date(int(year), int(month), int(day))
+        except ValueError:
+            continue
+        return candidate if separator == "-" else parsed_date.strftime("%Y-%m-%d")
+    
+    # 파싱 실패 시 None 반환
+    return None
+
+
+@functools.lru_cache(maxsize=1024)
+def _planner_input(theme: str, with_weather: bool) -> str:
+    """코스 제작 Agent 입력 문자열 (테마/날씨 유무가 같으면 만들어 둔 문자열 재사용)"""
+    weather_hint = PLANNER_WEATHER_HINT if with_weather else ""
+    return f"{theme}에 맞는 여행 코스를 제작해 주세요. {weather_hint}".rstrip()
+
+
+def _allowed_indices_for_prompt(count: int) -> str:
+    """프롬프트용 허용 인덱스 범위 문자열 ("0..count-1", 양끝 포함 - 인덱스를 모두 나열하지 않아 토큰 절약)"""
+    return f"0..{count - 1}"
+
+# 코스 설명 프롬프트에 넣을 장소 필드 (URL/사진 링크 등은 설명에 쓰이지 않고 토큰만 차지)
+DESCRIPTION_PLACE_FIELDS = ("name", "category", "rating", "address")
+
+# 코스 설명 생성 프롬프트 (규칙은 요청마다 같은 system 메시지, 입력 데이터만 user 메시지로 전달)
+COURSE_DESCRIPTION_SYSTEM_MESSAGE = _load_prompt("course_description.md")
+COURSE_DESCRIPTION_SYSTEM_CHAT_MESSAGE = {"role": "system", "content": COURSE_DESCRIPTION_SYSTEM_MESSAGE}  # 호출마다 같은 dict 재사용
+COURSE_DESCRIPTION_INPUT_TEMPLATE = """# Input Data
+- 장소 리스트 (JSON 배열, 방문 순서대로) : {selected_places}
+- 사용자 선호 조건 : {user_preferences}
+- 활동 시간 제약 : {time_constraints}
+- 장소 별 체류 시간 : {estimated_duration}
+
+위 장소를 모두 순서대로 설명한 JSON 객체만 출력하세요."""
+
+def _tmap_needs_fallback(tmap_task: asyncio.Task) -> bool:
+    """완료된 T Map 요청 결과를 버리고 Google Maps 결과를 써야 하는지 판단"""
+    try:
+        result = tmap_task.result()
+    except Exception as e:
+        logger.error("❌ [check_routing] T Map API 예외 발생: %s", e)
+        logger.warning("⚠️ [check_routing] T Map API 예외 발생, Google Maps API로 폴백합니다.")
+        return True
+    
+    if result.get("success"):
+        return False
     
-    # 장소 순서도 고려하여 캐시 키 생성
-    places_sorted_key = sorted(places_key)  # 순서 무관하게 같은 조합이면 같은 캐시 사용
-    cache_key_str = f"{mode}:{':'.join(places_sorted_key)}"
-    cache_key = hashlib.md5(cache_key_str.encode()).hexdigest()
+    error_msg = result.get("error", "T Map API 호출 실패")
+    logger.warning("⚠️ [check_routing] T Map API 실패: %s", error_msg)
     
-    # 캐시 확인
-    if cache_key in _routing_cache:
-        cached_result = _routing_cache[cache_key]
-        print(f"✅ [check_routing] 캐시된 결과 사용 (동일한 장소 조합, 중복 호출 방지)")
-        return cached_result
+    # 모든 구간이 실패했는지 확인
+    directions = result.get("directions", [])
+    all_failed = len(directions) > 0 and all(
+        d.get("error") or (not d.get("steps") and d.get("duration", 0) == 0)
+        for d in directions
+    )
+    
+    if all_failed or "API 키" in error_msg or "서비스 제공 지역" in error_msg:
+        logger.warning("⚠️ [check_routing] T Map API 실패, Google Maps API로 폴백합니다.")
+        return True
+    return False
 
+async def _fetch_route(
+        places: List[Dict[str, Any]],
+        origin: Optional[Dict[str, Any]],
+        destination: Optional[Dict[str, Any]],
+        mode: str,
+        coords: List[Optional[Tuple[float, float]]],
+    ) -> Dict[str, Any]:
+    """T Map/Google Maps API로 경로 조회 (캐시 미사용, 원본 결과 반환, coords는 장소별 좌표)"""
     # 한국 내에서 도보/자동차 경로인 경우 T Map API 우선 사용
     # 단, mode가 transit이면 T Map API 사용 안 함 (T Map은 대중교통 미지원)
     use_tmap = False
     if mode in ["walking", "driving"]:
         # 장소 좌표가 한국 영역 내에 있는지 확인
-        is_korea = _is_in_korea(places)
+        is_korea = _is_in_korea(coords)
         if is_korea:
             use_tmap = True
-            print(f"🗺️ [check_routing] 한국 내 경로 감지: T Map API 사용 ({mode})")
+            logger.info("🗺️ [check_routing] 한국 내 경로 감지: T Map API 사용 (%s)", mode)
     elif mode == "transit":
-        print(f"🚇 [check_routing] 대중교통 모드: Google Maps API 사용 (T Map API는 대중교통 미지원)")
-    
-    if use_tmap:
-        # T Map API 사용
-        tmap_mode = "walking" if mode == "walking" else "driving"
-        try:
-            result = await tmaptool.execute(
-                places=places,
-                origin=origin,
-                destination=destination,
-                mode=tmap_mode,
-                optimize_waypoints=False
-            )
-            
-            # T Map API 실패 시 Google Maps로 폴백
-            if not result.get("success"):
-                error_msg = result.get("error", "T Map API 호출 실패")
-                print(f"⚠️ [check_routing] T Map API 실패: {error_msg}")
-                
-                # 모든 구간이 실패했는지 확인
-                directions = result.get("directions", [])
-                all_failed = len(directions) > 0 and all(
-                    d.get("error") or (not d.get("steps") and d.get("duration", 0) == 0)
-                    for d in directions
-                )
-                
-                if all_failed or "API 키" in error_msg or "서비스 제공 지역" in error_msg:
-                    print(f"⚠️ [check_routing] T Map API 실패, Google Maps API로 폴백합니다.")
-                    use_tmap = False
-        except Exception as e:
-            print(f"❌ [check_routing] T Map API 예외 발생: {e}")
-            print(f"⚠️ [check_routing] T Map API 예외 발생, Google Maps API로 폴백합니다.")
-            use_tmap = False
+        logger.info("🚇 [check_routing] 대중교통 모드: Google Maps API 사용 (T Map API는 대중교통 미지원)")
     
-    if not use_tmap:
-        # Google Maps API 사용 (대중교통 또는 한국 외 지역 또는 T Map 실패 시)
-        print(f"🗺️ [check_routing] Google Maps API 사용 ({mode})")
-        result = await maptool.execute(
+    def start_google_maps():
+        # Google Maps API 사용 (대중교통 또는 한국 외 지역 또는 T Map 실패/지연 시)
+        logger.info("🗺️ [check_routing] Google Maps API 사용 (%s)", mode)
+        return asyncio.create_task(maptool.execute(
             places=places,
             origin=origin,
             destination=destination,
             mode=mode
+        ))
+
+    if not use_tmap:
+        result = await start_google_maps()
+    else:
+        # T Map API 사용 (TMAP_HEDGE_DELAY_SECONDS 안에 응답이 없으면 Google Maps도 동시에 요청해 먼저 성공한 결과 사용)
+        tmap_mode = "walking" if mode == "walking" else "driving"
+        tmap_task = asyncio.create_task(tmaptool.execute(
+            places=places,
+            origin=origin,
+            destination=destination,
+            mode=tmap_mode,
+            optimize_waypoints=False
+        ))
+        google_task = None
+        try:
+            while True:
+                if tmap_task.done():
+                    if not _tmap_needs_fallback(tmap_task):
+                        result = tmap_task.result()
+                        break
+                    if google_task is None:
+                        google_task = start_google_maps()
+                    result = await google_task
+                    break
+                if google_task is not None and google_task.done() and google_task.exception() is None \
+                        and google_task.result().get("success"):
+                    logger.info("✅ [check_routing] Google Maps API 응답이 먼저 도착, T Map API 요청 취소")
+                    result = google_task.result()
+                    break
+                waiting = [task for task in (tmap_task, google_task) if task is not None and not task.done()]
+                done, _ = await asyncio.wait(
+                    waiting,
+                    timeout=None if google_task is not None else TMAP_HEDGE_DELAY_SECONDS,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done and google_task is None:
+                    logger.info("⏳ [check_routing] T Map API 응답 지연 (%s초 초과), Google Maps API 동시 요청", TMAP_HEDGE_DELAY_SECONDS)
+                    google_task = start_google_maps()
+        finally:
+            for task in (tmap_task, google_task):
+                if task is not None and not task.done():
+                    task.cancel()
+    return result
+
+async def _check_routing(
+        places: List[Dict[str, Any]],  # 필수 파라미터로 명시 (기본값 제거)
+        origin: Optional[Dict[str, Any]] = None,
+        destination: Optional[Dict[str, Any]] = None,
+        mode: str = "transit",  # 'driving', 'walking', 'transit' (자전거 제외)
+    ) -> Dict[str, Any]:
+    """check_routing 구현 (결과를 딕셔너리로 반환, check_routing_batch에서도 사용)"""
+    # places가 None이거나 비어있으면 오류 반환
+    if not places:
+        return {
+            "success": False,
+            "optimized_route": [],
+            "total_duration": 0,
+            "total_distance": 0,
+            "directions": [],
+            "error": "places 파라미터가 필수입니다."
+        }
+    
+    # 장소별 좌표를 한 번만 읽어 두고 거리 계산/캐시 키/한국 영역 확인에 재사용
+    coords = [_place_coordinates(place) for place in places]
+    
+    # 장소가 2개이고 매우 가까운 경우 (10m 이내) 직접 경로 반환
+    if len(places) == 2 and None not in coords:
+        distance_m = haversine_m(*coords[0], *coords[1])
+        if distance_m < 10:
+            logger.info("✅ [check_routing] 두 지점이 매우 가까움 (%.1fm), 직접 경로 반환 (API 호출 생략)", distance_m)
+            return {
+                "success": True,
+                "total_duration": 0,
+                "total_distance": int(distance_m),
+                "directions": [{
+                    "from": places[0].get("name", "Unknown"),
+                    "to": places[1].get("name", "Unknown"),
+                    "duration_text": "즉시",
+                    "distance_text": f"{int(distance_m)}m",
+                    "mode": mode,
+                    "error": None
+                }],
+                "mode": mode,
+                "error": None
+            }
+    
+    # 캐시 키 생성 (장소 이름과 좌표, mode 기반)
+    # 좌표를 소수점 4자리로 반올림하여 캐시 키 생성 (약 11m 정밀도, 좌표가 없거나 숫자가 아니면 원본 문자열)
+    rounded_coords = [
+        (round(c[0], 4), round(c[1], 4)) if c is not None else str(place.get("coordinates"))
+        for place, c in zip(places, coords)
+    ]
+    places_key = [(place.get('name', ''), c) for place, c in zip(places, rounded_coords)]
+    
+    # 순서 무관하게 같은 조합이면 같은 캐시 사용 (같은 장소가 여러 번 나오면 횟수까지 구분)
+    # 튜플을 그대로 dict 키로 사용 (문자열 조합/정렬/MD5 생략)
+    cache_key = (mode, frozenset(collections.Counter(places_key).items()))
+    
+    # 캐시 확인
+    cached_result = _get_cached_routing(_routing_cache, cache_key)
+    if cached_result is not None:
+        logger.info("✅ [check_routing] 캐시된 결과 사용 (동일한 장소 조합, 중복 호출 방지)")
+        return cached_result
+
+    # 구간 캐시: 연속한 두 장소 구간별로 저장해 두어, 장소 조합이 달라도 이미 조회한 구간은 다시 조회하지 않음
+    leg_keys = _route_leg_keys(rounded_coords, mode) if origin is None and destination is None else None
+    legs = [_get_cached_routing(_leg_cache, key) for key in leg_keys] if leg_keys else []
+    missing = [i for i, leg in enumerate(legs) if leg is None]
+    if missing:
+        # 메모리에 없는 구간은 Redis(다른 워커가 조회한 결과)에서 확인
+        shared_legs = _load_shared_legs([leg_keys[i] for i in missing])
+        for i in missing:
+            legs[i] = shared_legs.get(leg_keys[i])
+        missing = [i for i in missing if legs[i] is None]
+    if legs and len(missing) < len(legs):
+        rest = f"나머지 {len(missing)}개 구간만 조회" if missing else "API 호출 생략"
+        logger.info("✅ [check_routing] 구간 캐시 %d/%d개 사용, %s", len(legs) - len(missing), len(legs), rest)
+        leg_results = await asyncio.gather(
+            *(_fetch_route(places[i:i + 2], None, None, mode, coords[i:i + 2]) for i in missing),
+            return_exceptions=True
         )
+        for i, leg_result in zip(missing, leg_results):
+            if isinstance(leg_result, Exception):
+                legs[i] = {"error": str(leg_result)}
+                continue
+            _store_route_legs(places[i:i + 2], leg_result, mode)
+            leg_directions = leg_result.get("directions") or [{}]
+            legs[i] = leg_directions[0] if leg_result.get("success") else {
+                **leg_directions[0], "error": leg_directions[0].get("error") or leg_result.get("error") or "경로 조회 실패"
+            }
+        result = _assemble_route(places, legs)
+    else:
+        result = await _fetch_route(places, origin, destination, mode, coords)
+        if leg_keys:
+            _store_route_legs(places, result, mode)
     
-    # directions에서 step/path/raw 데이터 제거, 핵심 요약만 반환
-    slim_directions = []
-    for d in result.get("directions", [])[:10]:  # 최대 10구간만
-        slim_directions.append({
-            "from": d.get("from"),
-            "to": d.get("to"),
-            "duration_text": d.get("duration_text"),
-            "distance_text": d.get("distance_text"),
-            "mode": d.get("mode"),
-            "error": d.get("error")
-        })
+    # directions에서 step/path/raw 데이터 제거, 핵심 요약만 반환 (최대 SLIM_DIRECTIONS_MAX_LEGS구간, 리스트 슬라이스 복사 없이)
+    slim_directions = [
+        {field: d.get(field) for field in SLIM_DIRECTION_FIELDS}
+        for d in itertools.islice(result.get("directions") or (), SLIM_DIRECTIONS_MAX_LEGS)
+    ]
     
     final_result = {
         "success": result.get("success", False),
@@ -206,71 +852,129 @@ async def check_routing(
         "error": result.get("error")
     }
     
-    # 결과를 캐시에 저장 (최대 100개까지만 캐시 유지)
-    if len(_routing_cache) >= 100:
-        # 가장 오래된 항목 제거 (FIFO)
-        oldest_key = next(iter(_routing_cache))
-        del _routing_cache[oldest_key]
-    _routing_cache[cache_key] = final_result
+    _store_cached_routing(_routing_cache, cache_key, final_result, ROUTING_CACHE_MAX_SIZE)
     
     return final_result
 
-def _is_in_korea(places: List[Dict[str, Any]]) -> bool:
+@tool
+async def check_routing(
+        places: List[Dict[str, Any]],  # 필수 파라미터로 명시 (기본값 제거)
+        origin: Optional[Dict[str, Any]] = None,
+        destination: Optional[Dict[str, Any]] = None,
+        mode: str = "transit",  # 'driving', 'walking', 'transit' (자전거 제외)
+    ) -> str:
     """
-    장소들이 한국 영역 내에 있는지 확인
+    주어진 장소들에 대해 경로 최적화를 실행합니다.
+    
+    **중요: 이 함수를 호출할 때는 반드시 'places' 파라미터를 전달해야 합니다.**
+    **주의: 이미 검증한 경로는 다시 확인하지 마세요. 캐시된 결과를 사용합니다.**
     
     Args:
-        places: 장소 리스트
-        
+        places: 장소 정보 리스트 (필수, 각 장소는 name, address, coordinates 등을 포함)
+               각 장소는 반드시 coordinates 필드를 포함해야 합니다: {{"lat": 위도, "lng": 경도}}
+        origin: 출발지 (선택사항, 없으면 places의 첫 번째 항목)
+        destination: 도착지 (선택사항, 없으면 places의 마지막 항목)
+        mode: 이동 수단 ('driving', 'walking', 'transit') (자전거 제외)
+    
     Returns:
-        한국 영역 내에 있으면 True
+        경로 최적화 결과 (JSON 문자열)
     """
-    if not places:
-        return False
+    # Agent에게는 공백 없는 JSON으로 전달 (LangChain 기본 직렬화보다 짧아 토큰 절약)
+    return _dumps_for_prompt(await _check_routing(places, origin, destination, mode))
+
+@tool
+async def check_routing_batch(legs: List[Dict[str, Any]]) -> str:
+    """
+    여러 구간의 경로를 동시에 확인합니다. (check_routing을 구간마다 순서대로 호출하는 것보다 빠름)
     
-    # 한국 영역 경계 (대략적인 범위)
-    KOREA_BOUNDS = {
-        "min_lat": 33.0,  # 제주도 남쪽
-        "max_lat": 38.6,  # DMZ 북쪽
-        "min_lng": 124.5,  # 서해
-        "max_lng": 132.0   # 동해
-    }
+    Args:
+        legs: 구간 리스트. 각 구간은 check_routing 파라미터와 같은 딕셔너리입니다.
+              예: [{{"places": [장소A, 장소B], "mode": "walking"}}, {{"places": [장소B, 장소C], "mode": "transit"}}]
     
-    has_valid_coords = False
-    korea_count = 0
-    non_korea_count = 0
+    Returns:
+        구간 순서대로 check_routing 결과 리스트 (JSON 문자열)
+    """
+    async def run_leg(leg: Any) -> Dict[str, Any]:
+        if not isinstance(leg, dict) or not leg.get("places"):
+            return {
+                "success": False,
+                "total_duration": 0,
+                "total_distance": 0,
+                "directions": [],
+                "error": "각 구간에는 places 파라미터가 필수입니다."
+            }
+        return await _check_routing(
+            places=leg["places"],
+            origin=leg.get("origin"),
+            destination=leg.get("destination"),
+            mode=leg.get("mode", "transit"),
+        )
     
-    for place in places:
-        coords = place.get("coordinates")
-        if not coords:
-            continue
-        
-        lat = coords.get("lat")
-        lng = coords.get("lng")
-        
-        if lat is None or lng is None:
-            continue
-        
-        has_valid_coords = True
-        
-        # 한국 영역 확인
-        if (KOREA_BOUNDS["min_lat"] <= lat <= KOREA_BOUNDS["max_lat"] and
-            KOREA_BOUNDS["min_lng"] <= lng <= KOREA_BOUNDS["max_lng"]):
-            korea_count += 1
-        else:
-            non_korea_count += 1
-            # 한국 밖 장소가 하나라도 있으면 False
-            return False
+    results = await asyncio.gather(*(run_leg(leg) for leg in legs or []), return_exceptions=True)
+    # 한 구간의 예외가 나머지 구간 결과를 버리지 않도록 오류 결과로 변환
+    return _dumps_for_prompt([
+        {"success": False, "total_duration": 0, "total_distance": 0, "directions": [], "error": str(r)}
+        if isinstance(r, Exception) else r
+        for r in results
+    ])
+
+def _handle_tool_error(error: Exception) -> str:
+    """Tool 호출 오류 처리"""
+    error_msg = str(error)
+    if "Field required" in error_msg and "places" in error_msg:
+        return "오류: check_routing tool을 호출할 때는 반드시 'places' 파라미터를 전달해야 합니다. 예: check_routing(places=[장소리스트], mode='transit')"
+    return f"Tool 오류: {error_msg}"
+
+def _is_in_korea(coords: List[Optional[Tuple[float, float]]]) -> bool:
+    """
+    장소들이 한국 영역 내에 있는지 확인
     
-    # 좌표가 있는 장소가 하나도 없으면 False (확인 불가)
-    if not has_valid_coords:
+    Args:
+        coords: 장소별 (위도, 경도) 리스트 (좌표가 없는 장소는 None, 확인에서 제외)
+        
+    Returns:
+        좌표가 있는 장소가 하나 이상이고 모두 한국 영역 내에 있으면 True
+    """
+    points = np.array([c for c in coords if c is not None], dtype=float).reshape(-1, 2)
+    if not len(points):
         return False
+    return bool(korea_bounds_mask(points[:, 0], points[:, 1]).all())
+
+class PlacesView:
+    """
+    장소 리스트의 열 단위 뷰 (요청마다 한 번 만들고 이후에는 인덱스로 접근)
     
-    # 모든 좌표가 있는 장소가 한국 영역 내에 있으면 True
-    if korea_count > 0 and non_korea_count == 0:
-        return True
+    검증/코스 구성 단계마다 장소 딕셔너리를 다시 훑지 않도록 자주 쓰는 값을 미리 모아 둡니다.
+    """
     
-    return False
+    def __init__(self, places: List[Dict[str, Any]]):
+        n = len(places)
+        self.names: List[Optional[str]] = [place.get('name') for place in places]
+        self.categories: List[str] = [place.get('category') or '' for place in places]
+        self.is_saved = np.fromiter((bool(place.get('is_saved_place')) for place in places), dtype=bool, count=n)
+        # 좌표가 없거나 숫자가 아니면 NaN
+        self.lats = np.full(n, np.nan)
+        self.lngs = np.full(n, np.nan)
+        for i, place in enumerate(places):
+            coords = place.get('coordinates') or {}
+            try:
+                self.lats[i] = float(coords['lat'])
+                self.lngs[i] = float(coords['lng'])
+            except (KeyError, TypeError, ValueError):
+                self.lats[i] = np.nan
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    @property
+    def saved_indices(self) -> List[int]:
+        """저장된 장소 인덱스 (오름차순)"""
+        return np.flatnonzero(self.is_saved).tolist()
+    
+    @property
+    def has_all_coordinates(self) -> bool:
+        """모든 장소에 좌표가 있는지 여부"""
+        return not (np.isnan(self.lats).any() or np.isnan(self.lngs).any())
 
 class CourseCreationTool(BaseTool):
     """LLM을 사용한 맞춤형 코스 제작 Tool"""
@@ -294,19 +998,63 @@ class CourseCreationTool(BaseTool):
             self.config.get("api_key") or 
             os.getenv("OPENAI_API_KEY")
         )
-        if self.api_key:
-            self.client = openai.AsyncOpenAI(api_key=self.api_key)
-        else:
-            # 환경 변수에서 직접 로드
-            self.client = openai.AsyncOpenAI()
+        # 코스 제작 Agent(ChatOpenAI)와 설명 생성 호출이 같은 연결 풀을 쓰도록 HTTP 클라이언트 공유
+        # (Agent 호출로 열린 TLS 연결을 설명 생성 호출이 재사용, 작업마다 이벤트 루프가 달라 인스턴스 단위로 공유)
+        self.http_client = openai.DefaultAsyncHttpxClient(
+            timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+        )
+        # api_key가 None이면 환경 변수에서 직접 로드
+        self.client = openai.AsyncOpenAI(
+            api_key=self.api_key,
+            max_retries=OPENAI_MAX_RETRIES,
+            http_client=self.http_client,
+        )
         # LLM 클라이언트 초기화 (실제 구현 시 사용)
         # 예: OpenAI, Anthropic, 등
         # self.client = OpenAI(api_key=self.api_key)
-        self.tools = [check_routing]
+        self.tools = [check_routing, check_routing_batch]
+        
+        # 코스 제작 Agent (처음 사용할 때 한 번 만들어 재사용)
+        self._planner_executor = None
+        # Agent 실행 과정 출력 여부 (기본: 출력 안 함)
+        self.agent_verbose = bool(self.config.get("agent_verbose", False))
         
         # 경고 로그 출력 여부 (기본: 경고 표시)
         self.suppress_llm_warnings = self._resolve_warning_suppression()
     
+    def _get_planner_executor(self) -> AgentExecutor:
+        """
+        코스 제작 AgentExecutor 반환 (LLM/Agent/Executor는 인스턴스당 한 번만 생성)
+        
+        작업마다 별도 이벤트 루프에서 실행되고 LLM의 비동기 HTTP 클라이언트는 루프에 묶이므로
+        모듈 전역이 아닌 인스턴스 단위로 재사용
+        """
+        if self._planner_executor is None:
+            llm = ChatOpenAI(
+                model=self.llm_model,
+                temperature=0,
+                api_key=self.api_key,
+                max_retries=OPENAI_MAX_RETRIES,
+                http_async_client=self.http_client,
+                max_tokens=PLANNER_MAX_COMPLETION_TOKENS,
+                extra_body={"response_format": PLANNER_RESPONSE_FORMAT},
+            )
+            planner = create_openai_tools_agent(llm, self.tools, PLANNER_PROMPT)
+            self._planner_executor = AgentExecutor(
+                agent=planner, 
+                tools=self.tools, 
+                verbose=self.agent_verbose,
+                handle_parsing_errors=_handle_tool_error,  # AgentExecutor에 에러 핸들러 추가
+                max_iterations=PLANNER_MAX_ITERATIONS,  # 최대 반복 횟수 (불필요한 반복 방지)
+                return_intermediate_steps=True,  # 중간 단계 반환 (디버깅용)
+                max_execution_time=300  # 최대 실행 시간 5분
+            )
+        return self._planner_executor
+    
     def _parse_visit_date(self, visit_date: str) -> Optional[str]:
         """
         방문 날짜 문자열을 YYYY-MM-DD 형식으로 파싱
@@ -320,53 +1068,15 @@ class CourseCreationTool(BaseTool):
         if not visit_date:
             return None
         
-        from datetime import datetime, timedelta
-        
         visit_date = visit_date.strip()
         
-        # "오늘" 처리
-        if visit_date == "오늘" or visit_date.lower() == "today":
-            return datetime.now().strftime("%Y-%m-%d")
-        
-        # "내일" 처리
-        if visit_date == "내일" or visit_date.lower() == "tomorrow":
-            return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        
-        # 날짜 범위 처리 (예: "2025-01-29 ~ 2025-01-31")
-        if "~" in visit_date or "-" in visit_date:
-            # 첫 번째 날짜 추출
-            date_parts = visit_date.split("~")
-            if len(date_parts) > 1:
-                first_date = date_parts[0].strip()
-            else:
-                first_date = visit_date.split()[0] if visit_date.split() else visit_date
-            
-            # YYYY-MM-DD 형식인지 확인
-            try:
-                datetime.strptime(first_date, "%Y-%m-%d")
-                return first_date
-            except ValueError:
-                # 다른 형식 시도
-                try:
-                    parsed_date = datetime.strptime(first_date, "%Y/%m/%d")
-                    return parsed_date.strftime("%Y-%m-%d")
-                except ValueError:
-                    pass
-        
-        # 직접 YYYY-MM-DD 형식인지 확인
-        try:
-            datetime.strptime(visit_date, "%Y-%m-%d")
-            return visit_date
-        except ValueError:
-            # 다른 형식 시도
-            try:
-                parsed_date = datetime.strptime(visit_date, "%Y/%m/%d")
-                return parsed_date.strftime("%Y-%m-%d")
-            except ValueError:
-                pass
+        # "오늘"/"내일" 처리
+        relative_days = RELATIVE_VISIT_DAYS.get(visit_date.lower())
+        if relative_days is not None:
+            return (datetime.now() + timedelta(days=relative_days)).strftime("%Y-%m-%d")
         
-        # 파싱 실패 시 None 반환
-        return None
+        # 날짜 문자열 파싱은 현재 시각과 무관하므로 캐시된 결과 사용
+        return _parse_absolute_visit_date(visit_date)
     
     def _resolve_warning_suppression(self) -> bool:
         """LLM 경고 로그 출력 여부 결정"""
@@ -386,10 +1096,10 @@ class CourseCreationTool(BaseTool):
         # 기본값: 경고 표시
         return False
     
-    def _log_llm_warning(self, message: str):
-        """LLM 경고 로그 출력 (필요 시에만)"""
+    def _log_llm_warning(self, message: str, *args):
+        """LLM 경고 로그 출력 (필요 시에만, 포맷팅은 로그 레벨 확인 후 수행)"""
         if not self.suppress_llm_warnings:
-            print(message)
+            logger.warning(message, *args)
     
     async def execute(
         self,
@@ -406,19 +1116,29 @@ class CourseCreationTool(BaseTool):
             user_preferences: 사용자 선호도
             time_constraints: 시간 제약
             
+        Returns:
+            코스 생성 결과
+        """
+        try:
+            return await self._create_course(places, user_preferences, time_constraints)
+        finally:
+            # check_routing이 사용한 T Map HTTP 세션 정리 (작업별 이벤트 루프가 끝나기 전에 한 번만)
+            await tmaptool.close()
+    
+    async def _create_course(
+        self,
+        places: List[Dict[str, Any]],
+        user_preferences: Dict[str, Any],
+        time_constraints: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        코스 제작 (execute/execute_many 공통, T Map 세션은 호출한 쪽에서 정리)
+        
         Returns:
             코스 생성 결과
         """
         # 장소 개수 사전 제한 (컨텍스트 길이 초과 방지) - 더 엄격하게 제한
-        MAX_PLACES = 20  # 30 -> 20으로 감소 (토큰 길이 초과 방지)
-        if len(places) > MAX_PLACES:
-            print(f"⚠️ 장소가 {len(places)}개로 너무 많아 {MAX_PLACES}개로 제한합니다.")
-            # 저장된 장소는 우선 보존
-            saved_places = [p for p in places if p.get('is_saved_place')]
-            other_places = [p for p in places if not p.get('is_saved_place')]
-            # 저장된 장소 + 나머지 장소 (신뢰도 순으로 정렬)
-            other_places.sort(key=lambda x: x.get('trust_score', 0), reverse=True)
-            places = saved_places + other_places[:MAX_PLACES - len(saved_places)]
+        places = self._limit_places(places)
         """
         코스 제작 실행
         
@@ -466,6 +1186,15 @@ class CourseCreationTool(BaseTool):
                     "error": "장소 리스트가 비어있습니다."
                 }
             
+            # 테마는 Agent 입력에 바로 쓰이므로 날씨 조회/프롬프트 생성 전에 확인
+            if not user_preferences.get("theme"):
+                return {
+                    "success": False,
+                    "course": None,
+                    "reasoning": "",
+                    "error": "사용자 선호 조건에 테마(theme)가 없습니다."
+                }
+            
             # 날씨 정보 가져오기 (지역 기준으로 한 번만 체크)
             weather_info = {}
             try:
@@ -478,34 +1207,48 @@ class CourseCreationTool(BaseTool):
                     date_str = self._parse_visit_date(visit_date)
                     
                     if date_str:
-                        # 지역의 중심 좌표를 가져와서 날씨 조회 (한 번만)
-                        # 첫 번째 장소의 좌표를 사용
-                        if places and len(places) > 0:
-                            first_place = places[0]
-                            coords = first_place.get("coordinates")
-                            if coords and coords.get("lat") and coords.get("lng"):
-                                lat = float(coords.get("lat"))
-                                lng = float(coords.get("lng"))
-                                # 지역 날씨 한 번만 조회 (사용자가 설정한 날짜 기준)
-                                single_weather = await maptool.get_weather_info(lat, lng, date_str)
-                                # 모든 장소에 동일한 날씨 정보 적용
+                        # 좌표를 소수점 1자리(약 11km) 격자로 묶어 지역별로 한 번씩, 동시에 조회
+                        regions: Dict[Tuple[float, float], List[int]] = {}
+                        place_coords = [_place_coordinates(place) for place in places]
+                        for idx, coords in enumerate(place_coords):
+                            if coords is not None:
+                                regions.setdefault((round(coords[0], 1), round(coords[1], 1)), []).append(idx)
+                        if regions:
+                            # 장소가 많은 지역부터 최대 WEATHER_MAX_REGIONS곳만 조회 (나머지 장소는 가장 큰 지역 날씨 사용)
+                            region_indices = sorted(regions.values(), key=len, reverse=True)[:WEATHER_MAX_REGIONS]
+                            centroids = [
+                                np.mean([place_coords[idx] for idx in indices], axis=0).tolist()
+                                for indices in region_indices
+                            ]
+                            region_weathers = await asyncio.gather(
+                                *(maptool.get_weather_info(lat, lng, date_str) for lat, lng in centroids),
+                                return_exceptions=True
+                            )
+                            # 조회에 성공한 지역만 사용 (장소가 많은 지역 순서 유지)
+                            fetched_regions = []
+                            for indices, (lat, lng), region_weather in zip(region_indices, centroids, region_weathers):
+                                location_name = location if location and len(region_indices) == 1 else f"{lat:.2f},{lng:.2f}"
+                                if isinstance(region_weather, BaseException) or not region_weather:
+                                    logger.warning("⚠️ 지역 날씨 정보 조회 실패 (%s): %s", location_name, region_weather)
+                                    continue
+                                fetched_regions.append((indices, region_weather))
+                                weather_date = region_weather.get('date', date_str)
+                                logger.info("🌤️ 지역 날씨 정보 조회 완료 (%s): %s - %s°C, %s", weather_date, location_name, region_weather.get('temperature'), region_weather.get('condition'))
+                            if fetched_regions:
+                                # 각 장소에 자기 지역 날씨 적용, 조회하지 못한 지역/좌표 없는 장소는 가장 큰 지역 날씨 사용
+                                # (가장 큰 지역 장소가 먼저 들어가므로 첫 항목이 프롬프트에 쓰이는 대표 날씨)
+                                for indices, region_weather in fetched_regions:
+                                    weather_info.update(dict.fromkeys(indices, region_weather))
                                 for idx in range(len(places)):
-                                    weather_info[idx] = single_weather
-                                location_name = location or f"{lat:.2f},{lng:.2f}"
-                                weather_date = single_weather.get('date', date_str)
-                                print(f"🌤️ 지역 날씨 정보 조회 완료 ({weather_date}): {location_name} - {single_weather.get('temperature')}°C, {single_weather.get('condition')}")
-                            else:
-                                print(f"⚠️ 첫 번째 장소에 좌표 정보가 없어 날씨 정보를 가져올 수 없습니다.")
+                                    weather_info.setdefault(idx, fetched_regions[0][1])
                         else:
-                            print(f"⚠️ 장소 리스트가 비어있어 날씨 정보를 가져올 수 없습니다.")
+                            logger.warning("⚠️ 좌표 정보가 있는 장소가 없어 날씨 정보를 가져올 수 없습니다.")
                     else:
-                        print(f"⚠️ 방문 날짜를 파싱할 수 없습니다: {visit_date}")
+                        logger.warning("⚠️ 방문 날짜를 파싱할 수 없습니다: %s", visit_date)
                 else:
-                    print(f"⚠️ 방문 날짜 정보가 없어 날씨 정보를 가져오지 않습니다.")
+                    logger.warning("⚠️ 방문 날짜 정보가 없어 날씨 정보를 가져오지 않습니다.")
             except Exception as e:
-                print(f"⚠️ 날씨 정보 가져오기 실패 (계속 진행): {e}")
-                import traceback
-                traceback.print_exc()
+                logger.warning("⚠️ 날씨 정보 가져오기 실패 (계속 진행): %s", e, exc_info=True)
                 weather_info = {}
             
             # LLM을 사용하여 코스 생성
@@ -528,192 +1271,663 @@ class CourseCreationTool(BaseTool):
                 "error": str(e)
             }
     
+    @staticmethod
+    def _limit_places(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        장소가 MAX_PLACES_FOR_PROMPT개를 넘으면 저장된 장소 + 신뢰도 상위 장소만 남긴 리스트 반환
+        (execute와 Batch 요청이 같은 장소 목록으로 프롬프트를 만들도록 공통 사용)
+        """
+        if len(places) <= MAX_PLACES_FOR_PROMPT:
+            return places
+        logger.warning("⚠️ 장소가 %d개로 너무 많아 %d개로 제한합니다.", len(places), MAX_PLACES_FOR_PROMPT)
+        # 저장된 장소는 우선 보존 (한 번 훑으면서 저장/나머지로 분리)
+        saved_places = []
+        other_places = []
+        for p in places:
+            if p.get('is_saved_place'):
+                saved_places.append(p)
+            else:
+                other_places.append(p)
+        # 저장된 장소 + 나머지 장소 중 신뢰도 상위 장소 (전체 정렬 없이 상위 k개만 선택)
+        scores = np.fromiter((_to_float(p.get('trust_score', 0)) for p in other_places), dtype=float, count=len(other_places))
+        top_indices = _top_k_indices(scores, MAX_PLACES_FOR_PROMPT - len(saved_places))
+        return saved_places + [other_places[i] for i in top_indices]
+    
+    @staticmethod
+    def _batch_job_places(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Batch 작업의 장소 리스트 (호출자의 장소는 수정하지 않도록 복사한 뒤 execute와 같은 개수 제한 적용)
+        submit_batch와 collect_batch가 같은 목록을 쓰므로 planner 응답의 인덱스가 그대로 맞음
+        """
+        return CourseCreationTool._limit_places(copy.deepcopy(job["places"]))
+    
+    def _build_batch_planner_request(
+        self,
+        custom_id: str,
+        places: List[Dict[str, Any]],
+        user_preferences: Dict[str, Any],
+        time_constraints: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Batch API 입력(JSONL) 한 줄 생성 (Agent와 같은 planner 프롬프트, tool 없이 JSON 응답)"""
+        places = self._index_places_for_prompt(places)
+        prompt_messages = PLANNER_PROMPT.format_messages(
+            input=BATCH_PLANNER_INPUT.format(theme=user_preferences.get('theme', '')),
+            places=self._format_places_for_prompt(places),
+            user_preferences=_dumps_for_prompt(user_preferences),
+            time_constraints=_dumps_for_prompt(time_constraints),
+            weather_info="",
+            allowed_indices=_allowed_indices_for_prompt(len(places)),
+            suggested_route=self._suggested_route_for_prompt(PlacesView(places)),
+            agent_scratchpad=[],
+        )
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": self.llm_model,
+                "messages": [
+                    {"role": "system" if message.type == "system" else "user", "content": message.content}
+                    for message in prompt_messages
+                ],
+                "temperature": 0,
+                "response_format": COURSE_RESPONSE_FORMAT,
+            },
+        }
+    
+    @staticmethod
+    def _batch_job_ids(jobs: List[Dict[str, Any]]) -> List[str]:
+        """Batch 작업별 custom_id (지정하지 않으면 순번)"""
+        return [str(job.get("custom_id") or i) for i, job in enumerate(jobs)]
+    
+    async def execute_many(
+        self,
+        places: List[Dict[str, Any]],
+        variants: List[Dict[str, Any]],
+        max_concurrency: int = EXECUTE_MANY_MAX_CONCURRENCY,
+    ) -> List[Dict[str, Any]]:
+        """
+        같은 장소 리스트로 여러 선호 조건(테마/이동 수단 등)의 코스를 동시에 생성
+        
+        실제 LLM 동시 호출 수는 _llm_call_slot(COURSE_LLM_CONCURRENCY)으로 따로 제한됩니다.
+        
+        Args:
+            places: 공통 장소 리스트 (변형마다 복사해서 사용)
+            variants: 변형 리스트. 각 변형은 {"user_preferences", "time_constraints"(선택)}
+            max_concurrency: 동시에 진행할 코스 생성 수
+            
+        Returns:
+            variants와 같은 순서의 execute() 결과 리스트
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def run_variant(variant: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    # 장소에 original_index를 기록하고 결과에 장소를 그대로 담으므로 변형마다 복사
+                    return await self._create_course(
+                        copy.deepcopy(places), variant["user_preferences"], variant.get("time_constraints"))
+                except Exception as e:
+                    return {
+                        "success": False,
+                        "course": None,
+                        "reasoning": "",
+                        "error": str(e)
+                    }
+        
+        try:
+            return await asyncio.gather(*(run_variant(variant) for variant in variants))
+        finally:
+            # 모든 변형이 같은 이벤트 루프의 T Map 세션을 공유하므로 모두 끝난 뒤 한 번만 정리
+            await tmaptool.close()
+    
+    async def submit_batch(self, jobs: List[Dict[str, Any]]) -> str:
+        """
+        비대화형 대량 코스 생성 요청을 OpenAI Batch API로 제출 (비용 50% 절감, 별도 rate limit)
+        
+        Batch에서는 tool 호출 루프를 돌 수 없으므로 planner는 check_routing 없이 한 번에 응답합니다.
+        대화형 요청은 기존처럼 execute()를 사용하세요.
+        
+        Args:
+            jobs: 작업 리스트. 각 작업은 {"places", "user_preferences", "time_constraints"(선택), "custom_id"(선택)}
+            
+        Returns:
+            batch ID (collect_batch 호출 시 필요하므로 호출 측에서 보관)
+        """
+        lines = [
+            orjson.dumps(self._build_batch_planner_request(
+                custom_id, self._batch_job_places(job), job["user_preferences"], job.get("time_constraints")))
+            for custom_id, job in zip(self._batch_job_ids(jobs), jobs)
+        ]
+        batch_file = await self.client.files.create(
+            file=("course_batch.jsonl", b"\n".join(lines)),
+            purpose="batch",
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=BATCH_COMPLETION_WINDOW,
+        )
+        logger.info("📦 [course_creation] Batch 작업 제출: %s (%d건)", batch.id, len(jobs))
+        return batch.id
+    
+    async def collect_batch(self, batch_id: str, jobs: List[Dict[str, Any]]) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        완료된 Batch 결과를 받아 코스 생성 (검증/코스 설명 생성은 execute()와 같은 경로)
+        
+        Args:
+            batch_id: submit_batch가 반환한 batch ID
+            jobs: submit_batch에 넘긴 작업 리스트 (같은 custom_id/순서)
+            
+        Returns:
+            custom_id -> execute()와 같은 형식의 결과 (아직 완료되지 않았으면 None)
+        """
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            logger.info("⏳ [course_creation] Batch 작업 %s 상태: %s", batch_id, batch.status)
+            return None
+        
+        outputs = {}
+        if batch.output_file_id:
+            output_file = await self.client.files.content(batch.output_file_id)
+            for line in output_file.text.splitlines():
+                if line.strip():
+                    item = orjson.loads(line)
+                    outputs[item.get("custom_id")] = item
+        
+        async def build_course(custom_id: str, job: Dict[str, Any]) -> Dict[str, Any]:
+            try:
+                item = outputs.get(custom_id)
+                if item is None:
+                    raise ValueError("Batch 결과가 없습니다. (요청 실패는 batch의 error_file_id를 확인하세요)")
+                response = item.get("response") or {}
+                if item.get("error") or response.get("status_code") != 200:
+                    raise ValueError(f"Batch 요청 실패: {item.get('error') or response.get('status_code')}")
+                planned_result = self._JSON_verification(response["body"]["choices"][0]["message"]["content"])
+                course_result = await self._generate_course_with_llm(
+                    self._batch_job_places(job), job["user_preferences"], job.get("time_constraints"),
+                    planned_result=planned_result,
+                )
+                return {
+                    "success": True,
+                    "course": course_result.get("course"),
+                    "reasoning": course_result.get("reasoning", ""),
+                    "error": None
+                }
+            except Exception as e:
+                return {
+                    "success": False,
+                    "course": None,
+                    "reasoning": "",
+                    "error": str(e)
+                }
+        
+        custom_ids = self._batch_job_ids(jobs)
+        results = await asyncio.gather(*(build_course(custom_id, job) for custom_id, job in zip(custom_ids, jobs)))
+        return dict(zip(custom_ids, results))
+    
     def get_schema(self) -> Dict[str, Any]:
         """
-        Tool 입력 스키마 반환
+        Tool 입력 스키마 반환
+        
+        Returns:
+            스키마 딕셔너리
+        """
+        return {
+            "type": "object",
+            "properties": {
+                "places": {
+                    "type": "array",
+                    "description": "검색된 장소 리스트",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "name": {"type": "string"},
+                            "description": {"type": "string"},
+                            "category": {"type": "string"},
+                            "rating": {"type": "number"},
+                            "address": {"type": "string"},
+                            "tags": {"type": "array", "items": {"type": "string"}}
+                        }
+                    }
+                },
+                "user_preferences": {
+                    "type": "object",
+                    "description": "사용자 선호도",
+                    "properties": {
+                        "theme": {"type": "string"},
+                        "group_size": {"type": "integer"},
+                        "visit_date": {"type": "string"},
+                        "visit_time": {"type": "string"},
+                        "transportation": {"type": "string"},
+                        "budget": {"type": "string"}
+                    },
+                    "required": ["theme"]
+                },
+                "time_constraints": {
+                    "type": "object",
+                    "description": "시간 제약 (선택사항)",
+                    "properties": {
+                        "start_time": {"type": "string"},
+                        "end_time": {"type": "string"},
+                        "total_duration": {"type": "integer"}
+                    }
+                }
+            },
+            "required": ["places", "user_preferences"]
+        }
+    
+    async def _generate_course_with_llm(
+        self,
+        places: List[Dict[str, Any]],
+        user_preferences: Dict[str, Any],
+        time_constraints: Optional[Dict[str, Any]],
+        weather_info: Optional[Dict[int, Dict[str, Any]]] = None,
+        planned_result: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        LLM을 사용하여 코스 생성
+        
+        Args:
+            places: 장소 리스트
+            user_preferences: 사용자 선호도
+            time_constraints: 시간 제약
+            planned_result: 미리 받은 planner 응답 (Batch API 결과 등, 있으면 Agent 호출 생략)
+            
+        Returns:
+            코스 생성 결과
+        """
+        # 날씨 정보는 토큰 예산 적용 전 장소 인덱스 기준이므로 장소 객체에 대응시켜 둠
+        weather_by_place = {id(place): weather_info[idx] for idx, place in enumerate(places) if idx in weather_info} if weather_info else {}
+        places = self._index_places_for_prompt(places)
+        places_view = PlacesView(places)
+
+        # 날씨 정보 포맷팅 (가장 큰 지역의 대표 날씨)
+        weather_info_str = ""
+        if weather_info:
+            # 첫 번째 항목이 장소가 가장 많은 지역의 날씨
+            first_weather = next(iter(weather_info.values()))
+            if first_weather:
+                temp = first_weather.get('temperature', 'N/A')
+                condition = first_weather.get('condition', '정보없음')
+                # 날씨 정보를 더 상세하게 제공하여 LLM이 판단하기 쉽게 함
+                weather_info_str = f"지역날씨: {temp}°C, {condition}. 날씨에 따라 야외/실내 활동을 적절히 선택하고, 날씨가 나쁘면 이동 경로를 최소화하세요."
+
+        # 프롬프트 입력값 (캐시 키로도 사용)
+        places_str = self._format_places_for_prompt(places)
+        user_preferences_str = _dumps_for_prompt(user_preferences)
+        time_constraints_str = _dumps_for_prompt(time_constraints)
+
+        # 같은 입력으로 만든 코스가 있으면 Agent/LLM 호출 없이 반환
+        cache_key = _course_cache_key(self.llm_model, places_str, user_preferences_str, time_constraints_str, weather_info_str)
+        cached_course = _get_cached_course(cache_key)
+        if cached_course is not None:
+            logger.info("✅ [course_creation] 캐시된 코스 사용 (동일한 입력, LLM 호출 생략)")
+            cached_course["course"]["places"] = places
+            return cached_course
+
+        result = planned_result
+        cacheable = True
+        if result is None:
+            # 장소가 적고 모두 가까이 모여 있으면 Agent 없이 이동 거리가 가장 짧은 순서로 코스 구성
+            result = self._plan_compact_course(places_view, time_constraints)
+            if result is not None:
+                logger.info("⚡ [course_creation] 장소가 적고 가까이 모여 있어 Agent 없이 코스를 구성합니다.")
+            else:
+                result, cacheable = await self._plan_course_with_agent(
+                    places, user_preferences, weather_info,
+                    places_str, user_preferences_str, time_constraints_str, weather_info_str,
+                    self._suggested_route_for_prompt(places_view))
+
+        # ============================================================
+        # [최종 버그 수정] LLM이 반환한 인덱스 유효성 검증
+        # ============================================================
+        
+        # 문자열 인덱스(장소명) 정규화: 가능한 경우 인덱스로 변환
+        # 대부분의 응답은 정수만 담고 있으므로 장소명 -> 인덱스 맵은 문자열이 있을 때만 생성
+        name_to_index = None
+        
+        def _normalize_indices(values: list) -> list:
+            nonlocal name_to_index
+            if all(isinstance(value, int) for value in values):
+                return values
+            if name_to_index is None:
+                name_to_index = {}
+                for i, name in enumerate(places_view.names):
+                    name = (name or "").strip().lower()
+                    if name:
+                        name_to_index[name] = i
+            normalized = []
+            for value in values:
+                if isinstance(value, int):
+                    normalized.append(value)
+                elif isinstance(value, str):
+                    index = name_to_index.get(value.strip().lower())
+                    if index is not None:
+                        normalized.append(index)
+            return normalized
+        
+        for key in ("selected_places", "sequence"):
+            if isinstance(result.get(key), list):
+                result[key] = _normalize_indices(result[key])
+        
+        # 저장된 장소 인덱스 추출 (나중에 강제 추가를 위해)
+        saved_place_indices = places_view.saved_indices
+        if saved_place_indices and logger.isEnabledFor(logging.INFO):
+            logger.info("📌 저장된 장소 발견: %s", ", ".join(f"[{i}] {places_view.names[i]}" for i in saved_place_indices))
+        
+        # LLM 응답이 이미 올바르면(대부분의 경우) 복구 단계를 건너뜀:
+        # 모든 인덱스가 유효하고, 저장된 장소를 모두 포함하고, sequence가 선택된 장소 위치의 순열인 경우
+        selected = result.get("selected_places")
+        sequence = result.get("sequence")
+        if (
+            isinstance(selected, list) and selected
+            and isinstance(sequence, list) and len(sequence) == len(selected)
+            and all(isinstance(index, int) and 0 <= index < len(places) for index in selected)
+            and all(isinstance(seq_index, int) for seq_index in sequence)
+            and sorted(sequence) == list(range(len(selected)))
+            and set(saved_place_indices).issubset(selected)
+        ):
+            valid_selected_indices = list(selected)
+            valid_sequence = list(sequence)
+        else:
+            valid_selected_indices, valid_sequence = self._repair_course_indices(result, places_view, saved_place_indices)
+        
+        # selected_places 내 위치 매핑 (original_index -> position)
+        position_map = {orig_idx: pos for pos, orig_idx in enumerate(valid_selected_indices)}
+
+        # 3. estimated_duration 키 검증 (selected_places 기준 위치 인덱스 사용)
+        valid_duration = {}
+        if "estimated_duration" in result and isinstance(result["estimated_duration"], dict):
+            for key, value in result["estimated_duration"].items():
+                try:
+                    # 키를 정수로 변환하여 유효한 인덱스인지 확인
+                    index_key = int(key)
+                    if 0 <= index_key < len(valid_selected_indices):
+                        valid_duration[str(index_key)] = value
+                    elif index_key in position_map:
+                        valid_duration[str(position_map[index_key])] = value
+                except (ValueError, TypeError):
+                    continue # 키가 숫자가 아니면 무시
+        else:
+            self._log_llm_warning("⚠️ LLM이 'estimated_duration'를 반환하지 않았거나 딕셔너리가 아닙니다.")
+
+        # 검증된 인덱스를 사용하여 최종 결과 생성
+        selected_places = [places[i] for i in valid_selected_indices]
+        
+        # 코스 설명 생성(LLM 호출)은 검증된 sequence만 있으면 되므로 먼저 시작하고,
+        # 응답을 기다리는 동안 나머지 후처리를 진행
+        description_task = asyncio.create_task(self._generate_course_descriptions(
+            places=places,
+            sequence=valid_sequence,
+            user_preferences=user_preferences,
+            time_constraints=time_constraints,
+            estimated_duration=result["estimated_duration"]))
+        try:
+            await asyncio.sleep(0)  # 설명 요청이 먼저 전송되도록 양보
+
+            # 장소별로 출력하지 않고 한 번에 기록 (INFO 로그가 꺼져 있으면 문자열도 만들지 않음)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("✅ 최종 선택된 장소: %d개\n%s", len(selected_places), "\n".join(
+                    f"   {'⭐' if places_view.is_saved[idx] else '  '} [{i}] {places_view.names[idx]} (인덱스: {idx})"
+                    for i, idx in enumerate(valid_selected_indices)))
+
+            reasoning = ""
+            if isinstance(result, dict):
+                reasoning = result.get("reasoning", "")
+                if not isinstance(reasoning, str):
+                    reasoning = str(reasoning) if reasoning else ""
+
+            # 날씨 정보를 코스 결과에 포함 (선택된 장소마다 해당 지역 날씨)
+            course_weather_info = {}
+            for idx in valid_selected_indices:
+                place_weather = weather_by_place.get(id(places[idx]))
+                if place_weather:
+                    course_weather_info[idx] = place_weather
+
+            raw_course_description = await description_task
+        finally:
+            # 후처리 중 예외가 나면 진행 중인 설명 요청 취소
+            if not description_task.done():
+                description_task.cancel()
+
+        # course_description 안전하게 추출
+        course_description = ""
+        if isinstance(raw_course_description, dict):
+            course_description = raw_course_description.get("course_description", "")
+            if not isinstance(course_description, str):
+                course_description = str(course_description) if course_description else ""
+
+        course_result = {
+            "course": {
+                "places": places,
+                "sequence": valid_sequence,
+                "estimated_duration": valid_duration,
+                "course_description": course_description,
+                "weather_info": course_weather_info,
+                "visit_date": user_preferences.get("visit_date")
+            },
+            "reasoning": reasoning
+        }
+
+        # 정상 응답으로 만든 코스만 캐시 (폴백 코스 제외, places는 요청마다 다시 넣으므로 제외)
+        if cacheable:
+            _store_cached_course(cache_key, {
+                "course": {key: value for key, value in course_result["course"].items() if key != "places"},
+                "reasoning": reasoning
+            })
+
+        return course_result
+    
+    def _repair_course_indices(
+        self,
+        result: Dict[str, Any],
+        places_view: PlacesView,
+        saved_place_indices: List[int],
+    ) -> Tuple[List[int], List[int]]:
+        """
+        LLM이 반환한 selected_places/sequence 검증 및 복구
+        
+        잘못된 인덱스 제거, 빠진 저장된 장소 강제 추가, sequence 복구를 수행합니다.
+        
+        Returns:
+            (검증된 selected_places 인덱스, selected_places 기준 위치 sequence)
+        """
+        # 1. selected_places 인덱스 검증
+        valid_selected_indices = []
+        if "selected_places" in result and isinstance(result["selected_places"], list):
+            invalid_indices = []
+            for index in result["selected_places"]:
+                # 인덱스가 정수이고, 유효한 범위 내에 있는지 확인
+                if isinstance(index, int) and 0 <= index < len(places_view):
+                    valid_selected_indices.append(index)
+                else:
+                    invalid_indices.append(index)
+            if invalid_indices:
+                self._log_llm_warning("⚠️ LLM이 잘못된 장소 인덱스(%s)를 반환하여 무시합니다.", invalid_indices)
+        else:
+            self._log_llm_warning("⚠️ LLM이 'selected_places'를 반환하지 않았거나 리스트가 아닙니다.")
+        
+        # 저장된 장소가 selected_places에 포함되지 않은 경우 강제 추가
+        selected_index_set = set(valid_selected_indices)
+        missing_saved_indices = [idx for idx in saved_place_indices if idx not in selected_index_set]
+        if missing_saved_indices:
+            self._log_llm_warning(
+                "⚠️ 저장된 장소 %d개가 selected_places에 포함되지 않아 강제로 추가합니다: %s",
+                len(missing_saved_indices), [(idx, places_view.names[idx]) for idx in missing_saved_indices])
+            # 맨 앞에 추가 (최우선순위, 하나씩 앞에 넣은 것과 같은 순서)
+            valid_selected_indices = missing_saved_indices[::-1] + valid_selected_indices
+        
+        # valid_selected_indices가 비어있을 때 폴백 로직
+        if not valid_selected_indices:
+            # 저장된 장소가 있으면 사용
+            if saved_place_indices:
+                self._log_llm_warning("⚠️ LLM이 장소를 선택하지 않았지만, 저장된 장소 %d개를 사용합니다.", len(saved_place_indices))
+                valid_selected_indices = saved_place_indices.copy()
+            # 저장된 장소도 없으면 최소한 처음 몇 개라도 선택 (최대 5개)
+            elif len(places_view) > 0:
+                fallback_count = min(5, len(places_view))
+                self._log_llm_warning("⚠️ LLM이 장소를 선택하지 않았고 저장된 장소도 없어, 처음 %d개 장소를 자동 선택합니다.", fallback_count)
+                valid_selected_indices = list(range(fallback_count))
+            else:
+                raise ValueError("선택할 수 있는 장소가 없습니다.")
+        
+        # selected_places 내 위치 매핑 (original_index -> position)
+        position_map = {orig_idx: pos for pos, orig_idx in enumerate(valid_selected_indices)}
+
+        # 2. sequence 인덱스 검증 (selected_places의 인덱스를 참조)
+        valid_sequence = []
+        if "sequence" in result and isinstance(result["sequence"], list):
+            # 1) selected_places 위치 인덱스(0..N-1)인지 먼저 확인
+            if all(isinstance(seq_index, int) and 0 <= seq_index < len(valid_selected_indices) for seq_index in result["sequence"]):
+                valid_sequence = result["sequence"].copy()
+            # 2) original_index로 왔으면 selected_places 기준 위치로 변환
+            elif all(isinstance(seq_index, int) and seq_index in position_map for seq_index in result["sequence"]):
+                valid_sequence = [position_map[seq_index] for seq_index in result["sequence"]]
+            else:
+                self._log_llm_warning("⚠️ LLM이 잘못된 순서 인덱스(%s)를 반환하여 무시합니다.", result["sequence"])
+        else:
+            self._log_llm_warning("⚠️ LLM이 'sequence'를 반환하지 않았거나 리스트가 아닙니다.")
+        
+        # 만약 sequence가 잘못되었으면, 그냥 selected 순서대로라도 복구
+        if not valid_sequence or len(valid_sequence) != len(valid_selected_indices):
+            self._log_llm_warning("⚠️ LLM이 반환한 sequence가 유효하지 않아, 선택된 순서로 복구합니다.")
+            valid_sequence = list(range(len(valid_selected_indices)))
+
+        # 저장된 장소가 sequence에 포함되어 있는지 확인하고, 없으면 맨 앞에 추가
+        # sequence는 selected_places의 인덱스를 참조하므로, 저장된 장소의 selected_places 내 인덱스를 찾아야 함
+        # selected_places 내에서의 위치 (같은 장소가 여러 번 있으면 첫 위치)
+        first_position_map = {}
+        for pos, orig_idx in enumerate(valid_selected_indices):
+            first_position_map.setdefault(orig_idx, pos)
+        saved_place_positions = [first_position_map[saved_idx] for saved_idx in saved_place_indices if saved_idx in first_position_map]
+        
+        # 저장된 장소가 sequence에 없으면 맨 앞에 추가
+        sequence_set = set(valid_sequence)
+        missing_saved_positions = [saved_pos for saved_pos in saved_place_positions if saved_pos not in sequence_set]
+        if missing_saved_positions:
+            logger.warning("⚠️ 저장된 장소가 sequence에 없어 맨 앞에 추가합니다: %s",
+                           [places_view.names[valid_selected_indices[saved_pos]] for saved_pos in missing_saved_positions])
+            # 하나씩 앞에 넣은 것과 같은 순서로 추가한 뒤, 순서 유지하면서 중복 제거
+            valid_sequence = list(dict.fromkeys(missing_saved_positions[::-1] + valid_sequence))
+        
+        # 최종 검증: sequence가 모든 selected_places를 포함하는지 확인
+        if len(valid_sequence) != len(valid_selected_indices):
+            # 빠진 인덱스 추가
+            sequence_set = set(valid_sequence)
+            missing_seq_indices = [i for i in range(len(valid_selected_indices)) if i not in sequence_set]
+            valid_sequence.extend(missing_seq_indices)
+            logger.warning("⚠️ sequence에 빠진 장소 %d개를 추가했습니다.", len(missing_seq_indices))
+        
+        return valid_selected_indices, valid_sequence
+
+    @staticmethod
+    def _plan_compact_course(
+        places_view: PlacesView,
+        time_constraints: Optional[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        장소가 적고 모두 가까이 모여 있으면 Agent 없이 코스 구성
+        
+        모든 장소를 방문하며, 식당/카페가 연속되지 않는 순서 중 이동 거리가 가장 짧은 순서를 선택합니다.
         
         Returns:
-            스키마 딕셔너리
+            Agent 응답과 같은 형식의 결과 딕셔너리 (조건에 맞지 않으면 None)
         """
+        n = len(places_view)
+        if not 0 < n <= COMPACT_COURSE_MAX_PLACES:
+            return None
+        
+        # 시간 제약 안에 모든 장소를 방문할 수 있어야 함
+        total_duration = (time_constraints or {}).get("total_duration")
+        if isinstance(total_duration, (int, float)) and n * COMPACT_COURSE_STAY_MINUTES > total_duration:
+            return None
+        
+        # 모든 장소에 좌표가 있고, 가장 먼 두 장소도 충분히 가까워야 함
+        if not places_view.has_all_coordinates:
+            return None
+        dist = haversine_matrix(places_view.lats, places_view.lngs)
+        if dist.max() >= COMPACT_COURSE_MAX_SPAN_M:
+            return None
+        
+        is_food = [category in ('식당', '카페') for category in places_view.categories]
+        best_order = None
+        best_distance = None
+        for order in itertools.permutations(range(n)):
+            if any(is_food[a] and is_food[b] for a, b in zip(order, order[1:])):
+                continue
+            total = sum(dist[a, b] for a, b in zip(order, order[1:]))
+            if best_distance is None or total < best_distance:
+                best_order, best_distance = order, total
+        if best_order is None:
+            # 식당/카페 연속 방문을 피할 수 없으면 Agent에게 맡김
+            return None
+        
         return {
-            "type": "object",
-            "properties": {
-                "places": {
-                    "type": "array",
-                    "description": "검색된 장소 리스트",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "name": {"type": "string"},
-                            "description": {"type": "string"},
-                            "category": {"type": "string"},
-                            "rating": {"type": "number"},
-                            "address": {"type": "string"},
-                            "tags": {"type": "array", "items": {"type": "string"}}
-                        }
-                    }
-                },
-                "user_preferences": {
-                    "type": "object",
-                    "description": "사용자 선호도",
-                    "properties": {
-                        "theme": {"type": "string"},
-                        "group_size": {"type": "integer"},
-                        "visit_date": {"type": "string"},
-                        "visit_time": {"type": "string"},
-                        "transportation": {"type": "string"},
-                        "budget": {"type": "string"}
-                    },
-                    "required": ["theme"]
-                },
-                "time_constraints": {
-                    "type": "object",
-                    "description": "시간 제약 (선택사항)",
-                    "properties": {
-                        "start_time": {"type": "string"},
-                        "end_time": {"type": "string"},
-                        "total_duration": {"type": "integer"}
-                    }
-                }
-            },
-            "required": ["places", "user_preferences"]
+            "selected_places": list(range(n)),
+            "sequence": list(best_order),
+            "estimated_duration": {str(i): COMPACT_COURSE_STAY_MINUTES for i in range(n)},
+            "reasoning": "\n".join(
+                f"{step}. [{idx}] {places_view.names[idx]}: 가까운 장소끼리 이동 거리가 가장 짧은 순서로 배치"
+                for step, idx in enumerate(best_order, 1)
+            ),
         }
-    
-    async def _generate_course_with_llm(
+
+    @staticmethod
+    def _suggested_route_for_prompt(places_view: PlacesView) -> str:
+        """
+        프롬프트용 추천 동선 문자열 (좌표가 있는 모든 장소를 직선거리 합이 짧은 순서로 연결)
+        
+        Agent가 순서를 정하려고 check_routing을 반복 호출하지 않도록 미리 계산해 전달합니다.
+        형식: "3→0(0.4)→5(1.2)" (괄호는 이전 장소에서의 직선거리 km)
+        """
+        positions = np.flatnonzero(~(np.isnan(places_view.lats) | np.isnan(places_view.lngs)))
+        if len(positions) < 2:
+            return "없음"
+        dist = haversine_matrix(places_view.lats[positions], places_view.lngs[positions])
+        order = shortest_path_order(dist)
+        parts = [str(positions[order[0]])]
+        for a, b in zip(order, order[1:]):
+            parts.append(f"{positions[b]}({dist[a, b] / 1000:.1f})")
+        return "→".join(parts)
+
+    async def _plan_course_with_agent(
         self,
         places: List[Dict[str, Any]],
         user_preferences: Dict[str, Any],
-        time_constraints: Optional[Dict[str, Any]],
-        weather_info: Optional[Dict[int, Dict[str, Any]]] = None,
-    ) -> Dict[str, Any]:
+        weather_info: Optional[Dict[int, Dict[str, Any]]],
+        places_str: str,
+        user_preferences_str: str,
+        time_constraints_str: str,
+        weather_info_str: str,
+        suggested_route: str,
+    ) -> Tuple[Dict[str, Any], bool]:
         """
-        LLM을 사용하여 코스 생성
+        코스 제작 Agent 실행 및 응답 JSON 파싱
         
-        Args:
-            places: 장소 리스트
-            user_preferences: 사용자 선호도
-            time_constraints: 시간 제약
-            
         Returns:
-            코스 생성 결과
-        """
-        for i, place in enumerate(places):
-            place['original_index'] = i
-        
-        system_instruction = """
-        # Role
-        여행 가이드. 제공된 장소 리스트에서 최적의 코스를 선택하고 JSON으로 반환.
-
-        # Input
-        - 장소 리스트: {places} (형식: [인덱스]이름|카테고리|⭐|좌표|평점)
-        - 허용 인덱스 목록: {allowed_indices}
-        - 사용자 선호: {user_preferences}
-        - 시간 제약: {time_constraints}
-        - 날씨 정보: {weather_info}
-        **중요**: 각 장소의 original_index를 기준으로 인덱스 참조.
-
-        # Constraints
-        1. 저장된 장소(⭐ 표시) 최우선 포함
-        2. check_routing tool로 거리/시간 계산 (coordinates 필수: {{"lat":숫자,"lng":숫자}})
-        **중요: 같은 장소 조합에 대해서는 한 번만 check_routing을 호출하세요. 이미 검증한 경로는 다시 확인하지 마세요.**
-        **중요: 좌표가 동일하거나 매우 가까운 장소(10m 이내)는 check_routing을 호출하지 말고 직접 경로로 처리하세요.**
-        3. 좌표 기반으로 가까운 장소 우선 그룹화
-        4. 이동 시간 30분 이내
-        5. 도보 우선 (차이 20분 이내면 도보)
-        6. 식당/카페 연속 방문 금지
-
-        # Workflow
-        1. 저장된 장소(⭐) 선정
-        2. 테마에 맞는 추가 장소 선정
-        3. 식당/카페 연속 방문 체크 및 재배치
-        4. 거리 최소화 순서로 배열
-        5. check_routing으로 경로 검증 (중요: 같은 장소 조합은 한 번만 검증하세요. 이미 검증한 경로는 다시 확인하지 마세요.)
-        6. JSON 출력
-
-        # Output (JSON만)
-        {{
-        "selected_places": [장소 리스트],
-        "sequence": [선택된 장소 내 순서 인덱스],
-        "estimated_duration": {{"선택된 장소 인덱스": 분}},
-        "course_description": "코스 설명",
-        "reasoning": "선정 이유"
-        }}
-
-        # Rules
-        - selected_places: 반드시 허용 인덱스 목록 안의 정수만 사용
-        - sequence: selected_places 기준 0..N-1 인덱스 (예: selected_places가 3개면 sequence는 0~2만)
-        - reasoning: "1. [original_index] 장소이름: 설명" 형식, 모든 인덱스 포함
-        - JSON 마지막 쉼표 금지
-        - 인덱스 연산 금지 (+1/-1 등)
+            (LLM 결과 딕셔너리, 캐시 가능 여부) - 폴백 결과는 캐시하지 않음
         """
-        
-        prompt = ChatPromptTemplate.from_messages([
-            ("system", system_instruction),
-            MessagesPlaceholder(variable_name="chat_history", optional=True),
-            ("human", "{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad"),
-        ])
-
-        llm = ChatOpenAI(model=self.llm_model, temperature=0)
-        planner = create_openai_tools_agent(llm, self.tools, prompt)
-        # AgentExecutor에 에러 핸들러 추가
-        def handle_tool_error(error: Exception) -> str:
-            """Tool 호출 오류 처리"""
-            error_msg = str(error)
-            if "Field required" in error_msg and "places" in error_msg:
-                return "오류: check_routing tool을 호출할 때는 반드시 'places' 파라미터를 전달해야 합니다. 예: check_routing(places=[장소리스트], mode='transit')"
-            return f"Tool 오류: {error_msg}"
-        
-        planner_executer = AgentExecutor(
-            agent=planner, 
-            tools=self.tools, 
-            verbose=True,
-            handle_parsing_errors=handle_tool_error,
-            max_iterations=10,  # 최대 반복 횟수 (불필요한 반복 방지)
-            return_intermediate_steps=True,  # 중간 단계 반환 (디버깅용)
-            max_execution_time=300  # 최대 실행 시간 5분
-        )
+        planner_executer = self._get_planner_executor()
 
-        # 날씨 정보 포맷팅 (지역 기준 단일 날씨 정보)
-        weather_info_str = ""
-        if weather_info:
-            # 첫 번째 날씨 정보만 사용 (모든 장소가 같은 지역이므로 동일한 날씨)
-            first_weather = next(iter(weather_info.values())) if weather_info else None
-            if first_weather:
-                temp = first_weather.get('temperature', 'N/A')
-                condition = first_weather.get('condition', '정보없음')
-                # 날씨 정보를 더 상세하게 제공하여 LLM이 판단하기 쉽게 함
-                weather_info_str = f"지역날씨: {temp}°C, {condition}. 날씨에 따라 야외/실내 활동을 적절히 선택하고, 날씨가 나쁘면 이동 경로를 최소화하세요."
-        
-        # check_routing 사용 예시를 input에 포함
-        check_routing_example = """
-        중요: check_routing tool을 사용할 때는 반드시 다음과 같이 호출하세요:
-        check_routing(places=[장소리스트], mode="transit")
-        - places 파라미터는 반드시 포함해야 합니다.
-        - 각 장소는 coordinates 필드를 포함해야 합니다: {"name":"장소명","coordinates":{"lat":위도,"lng":경도}}
-        - **중요: 같은 장소 조합에 대해서는 한 번만 check_routing을 호출하세요. 이미 검증한 경로는 다시 확인하지 마세요.**
-        - **중요: 좌표가 동일하거나 매우 가까운 장소(10m 이내)는 check_routing을 호출하지 말고 직접 경로로 처리하세요.**
-        """
-        
-        allowed_indices = list(range(len(places)))
         try:
-            planning_result = await planner_executer.ainvoke({
-                'input': f"""{user_preferences['theme']}에 맞는 여행 코스를 제작해 주세요. {'날씨 정보를 반드시 고려하여 실내/야외 장소를 적절히 선택하고, 날씨가 나쁘면 이동 경로를 최소화하세요.' if weather_info else ''}
-
-{check_routing_example}""",
-                "places": self._format_places_for_prompt(places),
-                "user_preferences": json.dumps(user_preferences, ensure_ascii=False),
-                "time_constraints": json.dumps(time_constraints, ensure_ascii=False),
-                "weather_info": weather_info_str,
-                "allowed_indices": json.dumps(allowed_indices, ensure_ascii=False)
-                })
+            async with _llm_call_slot():
+                planning_result = await planner_executer.ainvoke({
+                    'input': _planner_input(str(user_preferences['theme']), bool(weather_info)),
+                    "places": places_str,
+                    "user_preferences": user_preferences_str,
+                    "time_constraints": time_constraints_str,
+                    "weather_info": weather_info_str,
+                    "allowed_indices": _allowed_indices_for_prompt(len(places)),
+                    "suggested_route": suggested_route,
+                    })
         except Exception as e:
             error_msg = str(e)
-            print(f"⚠️ AgentExecutor 실행 중 오류: {error_msg}")
+            logger.warning("⚠️ AgentExecutor 실행 중 오류: %s", error_msg)
             
             # max_iterations 도달 오류 처리
             if "max iterations" in error_msg.lower() or "max_iterations" in error_msg.lower() or "stopped due to max iterations" in error_msg.lower():
-                print(f"   ⚠️ Agent가 최대 반복 횟수에 도달했습니다. 중간 단계를 확인합니다...")
+                logger.warning("   ⚠️ Agent가 최대 반복 횟수에 도달했습니다. 중간 단계를 확인합니다...")
                 # 중간 단계에서 마지막 출력 시도
                 intermediate_steps = planning_result.get('intermediate_steps', []) if 'intermediate_steps' in locals() else []
                 if intermediate_steps:
@@ -722,7 +1936,7 @@ class CourseCreationTool(BaseTool):
                         if isinstance(step, tuple) and len(step) >= 2:
                             last_output = step[1] if isinstance(step[1], str) else str(step[1])
                             if last_output and ('{' in last_output or '[' in last_output):
-                                print(f"   마지막 단계에서 JSON 형식의 출력을 찾았습니다. 복구를 시도합니다...")
+                                logger.info("   마지막 단계에서 JSON 형식의 출력을 찾았습니다. 복구를 시도합니다...")
                                 try:
                                     result = self._JSON_verification(last_output)
                                     # 성공하면 계속 진행
@@ -751,11 +1965,11 @@ class CourseCreationTool(BaseTool):
             # 중간 단계 확인
             intermediate_steps = planning_result.get('intermediate_steps', [])
             if intermediate_steps:
-                print(f"⚠️ Agent가 {len(intermediate_steps)}번의 단계를 수행했지만 최종 출력이 없습니다.")
+                logger.warning("⚠️ Agent가 %d번의 단계를 수행했지만 최종 출력이 없습니다.", len(intermediate_steps))
                 # 마지막 단계의 출력 확인
                 last_step = intermediate_steps[-1] if intermediate_steps else None
                 if last_step:
-                    print(f"   마지막 단계: {str(last_step)[:200]}...")
+                    logger.warning("   마지막 단계: %.200s...", last_step)
             
             # output이 없으면 에러 메시지 생성
             error_msg = f"LLM 응답에 'output' 키가 없습니다."
@@ -779,7 +1993,8 @@ class CourseCreationTool(BaseTool):
             or "max_iterations" in lower_output
             or "agent stopped" in lower_output
         ):
-            print("⚠️ Agent가 최대 반복 횟수로 인해 중단되었습니다. 기본 코스 구조를 반환합니다.")
+            logger.warning("⚠️ Agent가 최대 반복 횟수로 인해 중단되었습니다. 기본 코스 구조를 반환합니다.")
+            cacheable = False
             result = {
                 "selected_places": [],
                 "sequence": [],
@@ -788,22 +2003,24 @@ class CourseCreationTool(BaseTool):
                 "reasoning": "Agent stopped due to max iterations.",
             }
         else:
+            cacheable = True
             try:
                 result = self._JSON_verification(response_content)
             except ValueError as json_error:
                 # JSON 파싱 실패 시 더 자세한 정보 제공
                 error_msg = str(json_error)
-                print(f"❌ JSON 파싱 실패: {error_msg}")
+                logger.error("❌ JSON 파싱 실패: %s", error_msg)
                 
                 # 중간 단계 정보 출력
                 if 'intermediate_steps' in planning_result:
-                    print(f"   Agent 실행 단계: {len(planning_result.get('intermediate_steps', []))}개")
+                    logger.error("   Agent 실행 단계: %d개", len(planning_result.get('intermediate_steps', [])))
                 
                 # 응답 내용 일부 출력
-                print(f"   응답 내용 (처음 500자): {response_content[:500]}")
+                logger.error("   응답 내용 (처음 500자): %.500s", response_content)
                 
                 # 폴백: 최소한의 JSON 구조라도 생성 시도
-                print(f"   ⚠️ JSON 파싱 실패로 인해 기본 코스 구조를 생성합니다...")
+                logger.warning("   ⚠️ JSON 파싱 실패로 인해 기본 코스 구조를 생성합니다...")
+                cacheable = False
                 # 빈 코스 구조 반환 (나중에 검증 로직에서 처리)
                 result = {
                     "selected_places": [],
@@ -813,198 +2030,8 @@ class CourseCreationTool(BaseTool):
                     "reasoning": f"JSON 파싱 오류: {error_msg}"
                 }
 
-        # ============================================================
-        # [최종 버그 수정] LLM이 반환한 인덱스 유효성 검증
-        # ============================================================
-        
-        # 문자열 인덱스(장소명) 정규화: 가능한 경우 인덱스로 변환
-        name_to_index = {}
-        for i, place in enumerate(places):
-            name = (place.get("name") or "").strip().lower()
-            if name:
-                name_to_index[name] = i
-        
-        def _normalize_index(value):
-            if isinstance(value, int):
-                return value
-            if isinstance(value, str):
-                key = value.strip().lower()
-                return name_to_index.get(key)
-            return None
-        
-        if "selected_places" in result and isinstance(result["selected_places"], list):
-            normalized_selected = []
-            for item in result["selected_places"]:
-                normalized = _normalize_index(item)
-                if normalized is not None:
-                    normalized_selected.append(normalized)
-            result["selected_places"] = normalized_selected
-        
-        if "sequence" in result and isinstance(result["sequence"], list):
-            normalized_sequence = []
-            for item in result["sequence"]:
-                normalized = _normalize_index(item)
-                if normalized is not None:
-                    normalized_sequence.append(normalized)
-            result["sequence"] = normalized_sequence
-        
-        # 저장된 장소 인덱스 추출 (나중에 강제 추가를 위해)
-        saved_place_indices = []
-        for i, place in enumerate(places):
-            if place.get('is_saved_place'):
-                saved_place_indices.append(i)
-                print(f"   📌 저장된 장소 발견: [{i}] {place.get('name')}")
-        
-        # 1. selected_places 인덱스 검증
-        valid_selected_indices = []
-        if "selected_places" in result and isinstance(result["selected_places"], list):
-            for index in result["selected_places"]:
-                # 인덱스가 정수이고, 유효한 범위 내에 있는지 확인
-                if isinstance(index, int) and 0 <= index < len(places):
-                    valid_selected_indices.append(index)
-                else:
-                    self._log_llm_warning(f"   ⚠️ LLM이 잘못된 장소 인덱스({index})를 반환하여 무시합니다.")
-        else:
-            self._log_llm_warning("   ⚠️ LLM이 'selected_places'를 반환하지 않았거나 리스트가 아닙니다.")
-        
-        # 저장된 장소가 selected_places에 포함되지 않은 경우 강제 추가
-        missing_saved_indices = [idx for idx in saved_place_indices if idx not in valid_selected_indices]
-        if missing_saved_indices:
-            self._log_llm_warning(f"   ⚠️ 저장된 장소 {len(missing_saved_indices)}개가 selected_places에 포함되지 않아 강제로 추가합니다.")
-            for idx in missing_saved_indices:
-                if idx not in valid_selected_indices:
-                    valid_selected_indices.insert(0, idx)  # 맨 앞에 추가 (최우선순위)
-                    self._log_llm_warning(f"   ✅ 저장된 장소 강제 추가: [{idx}] {places[idx].get('name')}")
-        
-        # valid_selected_indices가 비어있을 때 폴백 로직
-        if not valid_selected_indices:
-            # 저장된 장소가 있으면 사용
-            if saved_place_indices:
-                self._log_llm_warning(f"   ⚠️ LLM이 장소를 선택하지 않았지만, 저장된 장소 {len(saved_place_indices)}개를 사용합니다.")
-                valid_selected_indices = saved_place_indices.copy()
-            # 저장된 장소도 없으면 최소한 처음 몇 개라도 선택 (최대 5개)
-            elif len(places) > 0:
-                fallback_count = min(5, len(places))
-                self._log_llm_warning(f"   ⚠️ LLM이 장소를 선택하지 않았고 저장된 장소도 없어, 처음 {fallback_count}개 장소를 자동 선택합니다.")
-                valid_selected_indices = list(range(fallback_count))
-            else:
-                raise ValueError("선택할 수 있는 장소가 없습니다.")
-        
-        # selected_places 내 위치 매핑 (original_index -> position)
-        position_map = {orig_idx: pos for pos, orig_idx in enumerate(valid_selected_indices)}
-
-        # 2. sequence 인덱스 검증 (selected_places의 인덱스를 참조)
-        valid_sequence = []
-        if "sequence" in result and isinstance(result["sequence"], list):
-            # 1) selected_places 위치 인덱스(0..N-1)인지 먼저 확인
-            if all(isinstance(seq_index, int) and 0 <= seq_index < len(valid_selected_indices) for seq_index in result["sequence"]):
-                valid_sequence = result["sequence"].copy()
-            # 2) original_index로 왔으면 selected_places 기준 위치로 변환
-            elif all(isinstance(seq_index, int) and seq_index in position_map for seq_index in result["sequence"]):
-                valid_sequence = [position_map[seq_index] for seq_index in result["sequence"]]
-            else:
-                for seq_index in result["sequence"]:
-                    self._log_llm_warning(f"   ⚠️ LLM이 잘못된 순서 인덱스({seq_index})를 반환하여 무시합니다.")
-        else:
-            self._log_llm_warning("   ⚠️ LLM이 'sequence'를 반환하지 않았거나 리스트가 아닙니다.")
-        
-        # 만약 sequence가 잘못되었으면, 그냥 selected 순서대로라도 복구
-        if not valid_sequence or len(valid_sequence) != len(valid_selected_indices):
-            self._log_llm_warning("   ⚠️ LLM이 반환한 sequence가 유효하지 않아, 선택된 순서로 복구합니다.")
-            valid_sequence = list(range(len(valid_selected_indices)))
-
-        # 3. estimated_duration 키 검증 (selected_places 기준 위치 인덱스 사용)
-        valid_duration = {}
-        if "estimated_duration" in result and isinstance(result["estimated_duration"], dict):
-            for key, value in result["estimated_duration"].items():
-                try:
-                    # 키를 정수로 변환하여 유효한 인덱스인지 확인
-                    index_key = int(key)
-                    if 0 <= index_key < len(valid_selected_indices):
-                        valid_duration[str(index_key)] = value
-                    elif index_key in position_map:
-                        valid_duration[str(position_map[index_key])] = value
-                except (ValueError, TypeError):
-                    continue # 키가 숫자가 아니면 무시
-        else:
-            self._log_llm_warning("   ⚠️ LLM이 'estimated_duration'를 반환하지 않았거나 딕셔너리가 아닙니다.")
+        return result, cacheable
 
-        # 검증된 인덱스를 사용하여 최종 결과 생성
-        selected_places = [places[i] for i in valid_selected_indices]
-        
-        # 저장된 장소가 sequence에 포함되어 있는지 확인하고, 없으면 맨 앞에 추가
-        # sequence는 selected_places의 인덱스를 참조하므로, 저장된 장소의 selected_places 내 인덱스를 찾아야 함
-        saved_place_positions = []
-        for saved_idx in saved_place_indices:
-            if saved_idx in valid_selected_indices:
-                # selected_places 내에서의 위치 찾기
-                position_in_selected = valid_selected_indices.index(saved_idx)
-                saved_place_positions.append(position_in_selected)
-        
-        # 저장된 장소가 sequence에 없으면 맨 앞에 추가
-        if saved_place_positions:
-            for saved_pos in saved_place_positions:
-                if saved_pos not in valid_sequence:
-                    print(f"   ⚠️ 저장된 장소가 sequence에 없어 맨 앞에 추가합니다: {selected_places[saved_pos].get('name')}")
-                    valid_sequence.insert(0, saved_pos)
-                    # 중복 제거
-                    valid_sequence = list(dict.fromkeys(valid_sequence))  # 순서 유지하면서 중복 제거
-        
-        # 최종 검증: sequence가 모든 selected_places를 포함하는지 확인
-        if len(valid_sequence) != len(valid_selected_indices):
-            # 빠진 인덱스 추가
-            missing_seq_indices = [i for i in range(len(valid_selected_indices)) if i not in valid_sequence]
-            valid_sequence.extend(missing_seq_indices)
-            print(f"   ⚠️ sequence에 빠진 장소 {len(missing_seq_indices)}개를 추가했습니다.")
-        
-        print(f"\n   ✅ 최종 선택된 장소: {len(selected_places)}개")
-        for i, idx in enumerate(valid_selected_indices):
-            place = places[idx]
-            is_saved = place.get('is_saved_place', False)
-            marker = "⭐" if is_saved else "  "
-            print(f"   {marker} [{i}] {place.get('name')} (인덱스: {idx})")
-        
-        # course_description과 reasoning 안전하게 추출
-        course_description = ""
-        raw_course_description = await self._generate_course_descriptions(
-            places=places,
-            sequence=valid_sequence,
-            user_preferences=user_preferences,
-            time_constraints=time_constraints,
-            estimated_duration=result["estimated_duration"])
-        if isinstance(raw_course_description, dict):
-            course_description = raw_course_description.get("course_description", "")
-            if not isinstance(course_description, str):
-                course_description = str(course_description) if course_description else ""
-        
-        reasoning = ""
-        if isinstance(result, dict):
-            reasoning = result.get("reasoning", "")
-            if not isinstance(reasoning, str):
-                reasoning = str(reasoning) if reasoning else ""
-        
-        # 날씨 정보를 코스 결과에 포함 (지역 기준 단일 날씨 정보)
-        course_weather_info = {}
-        if weather_info:
-            # 첫 번째 날씨 정보를 모든 장소에 적용 (같은 지역이므로 동일한 날씨)
-            first_weather = next(iter(weather_info.values())) if weather_info else None
-            if first_weather:
-                # 선택된 모든 장소에 동일한 날씨 정보 적용
-                for idx in valid_selected_indices:
-                    course_weather_info[idx] = first_weather
-        
-        return {
-            "course": {
-                "places": places,
-                "sequence": valid_sequence,
-                "estimated_duration": valid_duration,
-                "course_description": course_description,
-                "weather_info": course_weather_info,
-                "visit_date": user_preferences.get("visit_date")
-            },
-            "reasoning": reasoning
-        }
-    
     async def _generate_course_descriptions(
             self,
             sequence: List[int],
@@ -1025,184 +2052,49 @@ class CourseCreationTool(BaseTool):
         Returns:
             장소에 대한 설명
         """
-        selected_places = []
-        selected_duration = {}
-        for i in sequence:
-            selected_places.append(places[i])
-            # selected_duration[places[i].get("name")] = estimated_duration[f"{i}"]
-
-        
-        system_prompt = f"""
-            # Role
-            당신은 현지 지리에 능통하고 모든 장소를 방문해본 베테랑 여행 가이드입니다.
-            **당신의 절대적인 임무는 제공된 '장소 리스트'의 모든 항목을 단 하나도 빠짐없이 순서대로 포함하여 코스 설명을 작성하는 것입니다.**
-
-            # Context
-            설계된 코스와 사용자 선호 조건을 바탕으로 코스 설명을 제공합니다.
-            제공된 코스는 최적화된 순서로 배열되어 있습니다. 당신은 가이드로서 첫 번째 장소부터 마지막 장소까지 사용자를 인솔하듯 '순차적으로' 설명해야 합니다.
-
-            # Input Data
-            - 장소 리스트 : {selected_places}
-            - 사용자 선호 조건 : {user_preferences}
-            - 활동 시간 제약 : {time_constraints}
-            - 장소 별 체류 시간 : {estimated_duration}
-
-            # Constraints (엄수 사항)
-            1. **전수 포함 원칙 (Zero Omission):** 장소 리스트에 포함된 장소의 총 개수가 N개라면, 설명 내에도 반드시 N개의 장소가 모두 등장해야 합니다. 임의로 생략하거나 묶어서 설명하지 마세요.
-            2. **순차 기술 원칙:** 리스트의 0번 인덱스부터 마지막 인덱스까지 물리적 이동 순서에 따라 작성하세요.
-            3. **상세 정보 결합:** 각 장소의 별점, 카테고리, 그리고 '장소 별 체류 시간' 데이터를 활용하여 해당 장소에서 무엇을 할지 구체적으로 제안하세요.
-            4. **연결성 강화:** 장소와 장소 사이의 '이동 수단'과 '선택 이유'를 설명하여 흐름이 끊기지 않게 하세요.
-
-            # Task Workflow
-            1. **리스트 스캔:** 입력된 '장소 리스트'의 총 개수를 먼저 확인합니다.
-            2. **순차적 설명 작성:** - [장소 정보]: 이름, 별점, 카테고리 언급 및 방문 목적 기술.
-            - [활동]: 해당 장소에서의 추천 활동 및 예상 체류 시간 언급.
-            - [이동]: 다음 장소로 이동하는 방법과 소요 시간/이유 기술 (마지막 장소 제외).
-            3. **전체 요약:** 모든 장소 기술이 끝난 후, 사용자 선호 조건이 어떻게 반영되었는지 요약하며 마무리합니다.
-            4. **자가 검증:** 작성된 설명 속에 포함된 장소의 개수가 입력 데이터의 개수와 일치하는지 확인합니다.
-
-            # IMPORTANT: Output Format
-            - **오직 JSON 형식만 출력하세요.** - **마크다운 코드 블록(```json)을 사용하지 말고 순수 JSON만 반환하세요.**
-
-            ---
-
-            ## Return Value
-            ```json
-            {{
-                "course_description": "여기에 전체 설명을 작성하세요."
-            }}
-            
-            ### OUTPUT Rules
-            "course_description" 작성 규칙:
-            - [필수 엄수]: 장소 리스트에 나열된 인덱스 순서대로 각 장소의 설명을 작성하세요.
-            - [구조적 서술]: 설명을 작성할 때 각 장소의 시작 부분에 [번호. 장소이름] 형식을 사용하여 모델이 스스로 순서를 인지하게 하세요. (예: "1. 카페 A에서 시작합니다... 이후 2. 식당 B로 이동하여...")
-            - [순차적 논리]: 장소 리스트의 인덱스 순서에 따라 장소 방문 목적과 사용자 선호 조건 만족 여부를 설명하세요.
-            - [누락 방지 로직]: "장소 리스트의 모든 장소(총 N개)를 순서대로 전부 설명함"이라는 전제를 머릿속에 두고 작성하세요.
-            - [언어]: 장소 이름과 모든 설명은 한국어로 작성하세요.
-            - [이동 수단]: 각 장소 사이(인덱스 간 이동)의 이동 수단 선택 이유와 경로 설계 과정을 상세히 포함하세요.
-            - [흐름의 완결성]: 첫 번째 장소부터 마지막 장소까지, 장소 리스트의 인덱스 이동 경로를 따라가며 전체 코스를 설명하세요. 각 장소 사이의 연결 고리(이동 수단, 소요 시간, 선택 이유)를 빠짐없이 서술해야 합니다.
-            """
-        response = await self.client.chat.completions.create(
-            model=self.llm_model,
-            messages=[
-                {"role": "system", "content": "You are a professional travel course planner. You MUST output only valid JSON format. Never refuse the task or provide explanations outside JSON."},
-                {"role": "user", "content": system_prompt}
-            ],
-            max_tokens=2000,  # 충분한 토큰 할당
-            temperature=0.3  # 일관된 JSON 형식 유지
-        )
-        response_content = response.choices[0].message.content.strip()
-        result = self._JSON_verification(response_content)
-        return result
-
-    
-    def _remove_trailing_commas(self, json_str: str) -> str:
-        """
-        JSON 문자열에서 trailing comma 제거
-        배열과 객체 내부의 마지막 요소 뒤의 쉼표를 제거합니다.
-        """
-        # 문자열 내부의 쉼표는 건드리지 않도록 주의
-        # 1. 배열 내부의 trailing comma 제거: ], }] 앞의 쉼표
-        # 예: [1, 2, 3,] -> [1, 2, 3]
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-        
-        # 2. 객체 내부의 trailing comma 제거: }, ]} 앞의 쉼표
-        # 예: {"a": 1, "b": 2,} -> {"a": 1, "b": 2}
-        json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-        
-        # 3. 중첩된 구조에서도 작동하도록 여러 번 적용
-        for _ in range(5):  # 최대 5번 중첩 구조 처리
-            old_str = json_str
-            json_str = re.sub(r',(\s*[}\]])', r'\1', json_str)
-            if old_str == json_str:
-                break
-        
-        return json_str
-    
-    def _JSON_verification(self, response_content):
-        if not response_content:
-            raise ValueError("LLM이 빈 응답을 반환했습니다.")
-
-        # JSON 부분만 추출 (마크다운 코드 블록 제거)
-        if "```json" in response_content:
-            json_start = response_content.find("```json") + 7
-            json_end = response_content.find("```", json_start)
-            if json_end == -1:
-                json_end = len(response_content)
-            response_content = response_content[json_start:json_end].strip()
-        elif "```" in response_content:
-            json_start = response_content.find("```") + 3
-            json_end = response_content.find("```", json_start)
-            if json_end == -1:
-                json_end = len(response_content)
-            response_content = response_content[json_start:json_end].strip()
-        
-        # JSON 객체 시작/끝 찾기 (중괄호 기준)
-        json_start_idx = response_content.find("{")
-        json_end_idx = response_content.rfind("}") + 1
-        if json_start_idx != -1 and json_end_idx > json_start_idx:
-            response_content = response_content[json_start_idx:json_end_idx]
-        
-        # Trailing comma 제거 (파싱 전에 미리 처리)
-        response_content = self._remove_trailing_commas(response_content)
-        
-        # JSON 파싱 (강화된 오류 처리)
-        result = None
-        try:
-            result = json.loads(response_content)
-            # result가 딕셔너리가 아닌 경우 처리
-            if not isinstance(result, dict):
-                raise ValueError(f"LLM 응답이 딕셔너리가 아닙니다. 타입: {type(result)}")
-        except json.JSONDecodeError as e:
-            # 복구 시도 1: 첫 번째 { 부터 마지막 } 까지 다시 추출 + trailing comma 제거
-            try:
-                first_brace = response_content.find('{')
-                last_brace = response_content.rfind('}')
-                if first_brace != -1 and last_brace > first_brace:
-                    cleaned_json = response_content[first_brace:last_brace+1]
-                    # Trailing comma 제거
-                    cleaned_json = self._remove_trailing_commas(cleaned_json)
-                    result = json.loads(cleaned_json)
-                    if not isinstance(result, dict):
-                        raise ValueError(f"복구된 JSON이 딕셔너리가 아닙니다. 타입: {type(result)}")
-                else:
-                    raise ValueError(f"JSON 파싱 오류: {str(e)}\n응답 내용: {response_content[:500]}")
-            except:
-                # 복구 시도 2: 불완전한 JSON 복구 + trailing comma 제거
-                try:
-                    json_part = response_content[response_content.find('{'):]
-                    # 닫히지 않은 문자열/배열/객체 닫기
-                    open_braces = json_part.count('{')
-                    close_braces = json_part.count('}')
-                    open_brackets = json_part.count('[')
-                    close_brackets = json_part.count(']')
-                    
-                    json_part += '}' * (open_braces - close_braces)
-                    json_part += ']' * (open_brackets - close_brackets)
-                    # Trailing comma 제거 (여러 번 적용)
-                    json_part = self._remove_trailing_commas(json_part)
-                    json_part = json_part.rstrip().rstrip(',')
-                    if not json_part.endswith('}'):
-                        json_part += '}'
-                    
-                    result = json.loads(json_part)
-                    if not isinstance(result, dict):
-                        raise ValueError(f"복구된 JSON이 딕셔너리가 아닙니다. 타입: {type(result)}")
-                except Exception as recovery_error:
-                    # 모든 복구 시도 실패
-                    error_detail = f"원본 오류: {str(e)}\n복구 시도 오류: {str(recovery_error)}"
-                    raise ValueError(f"JSON 파싱 오류: {error_detail}\n응답 내용: {response_content[:500]}\n\nLLM이 JSON 형식으로 응답하지 않았습니다. 작업을 거부했거나 다른 형식으로 응답한 것 같습니다.")
-        
-        # result가 None이면 에러
-        if result is None:
-            raise ValueError("JSON 파싱에 실패했습니다.")
+        # 설명에 필요한 필드만 공백 없는 JSON으로 전달 (입력 토큰 절약)
+        selected_places = [
+            {key: places[i][key] for key in DESCRIPTION_PLACE_FIELDS if places[i].get(key) is not None}
+            for i in sequence
+        ]
         
-        # result가 딕셔너리가 아닌 경우 에러
-        if not isinstance(result, dict):
-            raise ValueError(f"LLM 응답이 딕셔너리가 아닙니다. 타입: {type(result)}, 값: {result}")
+        user_prompt = COURSE_DESCRIPTION_INPUT_TEMPLATE.format(
+            selected_places=_dumps_for_prompt(selected_places),
+            user_preferences=_dumps_for_prompt(user_preferences),
+            time_constraints=_dumps_for_prompt(time_constraints),
+            estimated_duration=_dumps_for_prompt(estimated_duration)
+        )
+        # 같은 장소/순서/체류 시간/선호 조건이면 설명 프롬프트가 같으므로 이전 설명 재사용
+        cache_key = _course_cache_key(self.llm_model, user_prompt)
+        cached_description = _get_cached_description(cache_key)
+        if cached_description is not None:
+            logger.info("✅ [course_creation] 캐시된 코스 설명 사용 (동일한 입력, LLM 호출 생략)")
+            return cached_description
         
+        async with _llm_call_slot():
+            # rate limit 헤더를 읽기 위해 raw 응답으로 받음
+            raw_response = await self.client.chat.completions.with_raw_response.create(
+                model=self.llm_model,
+                messages=[
+                    COURSE_DESCRIPTION_SYSTEM_CHAT_MESSAGE,
+                    {"role": "user", "content": user_prompt}
+                ],
+                max_completion_tokens=_description_max_tokens,  # 최근 응답 길이 기준 상한
+                temperature=0.3,  # 일관된 JSON 형식 유지
+                response_format=COURSE_DESCRIPTION_RESPONSE_FORMAT,
+                stream=True,
+            )
+            _update_rate_limit(raw_response.headers)
+            response_content = await _read_json_stream(raw_response.parse())
+        # 스트림을 중간에 닫아 usage 청크를 받지 않으므로 응답 문자열로 출력 토큰 수 계산
+        encoder = _get_token_encoder(self.llm_model)
+        _record_description_tokens(len(encoder.encode_ordinary(response_content)) if encoder else len(response_content))
+        result = self._JSON_verification(response_content.strip())
+        if isinstance(result.get("course_description"), str) and result["course_description"]:
+            _store_cached_description(cache_key, result)
         return result
 
+    
     def _format_places_for_prompt(self, places: List[Dict[str, Any]]) -> str:
         """
         프롬프트용 장소 정보 포맷팅 (토큰 최적화 - 더욱 간결하게)
@@ -1213,66 +2105,122 @@ class CourseCreationTool(BaseTool):
         Returns:
             포맷팅된 문자열
         """
-        # 장소 개수 제한 (너무 많으면 토큰 초과) - 더 엄격하게 제한
-        MAX_PLACES = 20  # 30 -> 20으로 감소 (토큰 길이 초과 방지)
-        if len(places) > MAX_PLACES:
-            print(f"⚠️ 장소가 {len(places)}개로 너무 많아 {MAX_PLACES}개로 제한합니다.")
-            places = places[:MAX_PLACES]
+        # 장소 개수 제한 (너무 많으면 토큰 초과) - execute()에서 이미 제한하지만 직접 호출 대비
+        if len(places) > MAX_PLACES_FOR_PROMPT:
+            logger.warning("⚠️ 장소가 %d개로 너무 많아 %d개로 제한합니다.", len(places), MAX_PLACES_FOR_PROMPT)
+            places = places[:MAX_PLACES_FOR_PROMPT]
         
-        formatted = []
-        for i, place in enumerate(places):
+        # 포맷팅에 쓰이는 값만 모아 캐시 키로 사용 (해시할 수 없는 값이 섞여 있으면 캐시하지 않음)
+        place_keys = [self._place_prompt_key(i, place) for i, place in enumerate(places)]
+        cache_key = tuple(place_keys)
+        try:
+            cached = _places_prompt_cache.get(cache_key)
+        except TypeError:
+            cache_key = None
+            cached = None
+        if cached is not None:
+            return cached
+        
+        lines = self._places_prompt_lines(places, place_keys, hashable=cache_key is not None)
+        places_str = "\n".join(lines)
+        if cache_key is not None:
+            if len(_places_prompt_cache) >= PLACES_PROMPT_CACHE_MAX_SIZE:
+                # 가장 오래된 항목 제거 (FIFO)
+                _places_prompt_cache.pop(next(iter(_places_prompt_cache)), None)
+            _places_prompt_cache[cache_key] = places_str
+        return places_str
+
+    @staticmethod
+    def _places_prompt_lines(places: List[Dict[str, Any]], place_keys: List[tuple], hashable: bool = True) -> List[str]:
+        """장소별 프롬프트 줄 생성 (캐시 없이, place_keys는 _place_prompt_key 값)"""
+        # 좌표 기반 근접 장소 (거리 행렬을 한 번에 계산해 LLM의 거리 추론/경로 검증 호출을 줄임)
+        neighbors = nearest_neighbors(places, NEAREST_PLACES_K)
+        original_indices = [place_key[0] for place_key in place_keys]
+        
+        # 장소별 고정 필드는 장소 값 기준 LRU 캐시로 재사용 (다른 장소 목록에 같은 장소가 있어도 다시 포맷팅하지 않음)
+        # 해시할 수 없는 값이 섞여 있으면 캐시 없이 포맷팅
+        format_place = _format_place_fields if hashable else _format_place_fields.__wrapped__
+        lines = []
+        for i, place_key in enumerate(place_keys):
             # original_index는 0부터 시작 (프롬프트에서 명확히 표시)
-            original_idx = place.get('original_index', i)
-            
-            # 장소 이름 (최대 25자로 제한)
-            name = place.get('name', 'Unknown')
-            if len(name) > 25:
-                name = name[:22] + "..."
-            
-            # 최소한의 정보만 포함 (토큰 절약)
-            info = f"[{original_idx}]{name}"
-            
-            # 카테고리 (간략하게, 1글자로 축약)
-            category = place.get('category', '')
-            if category:
-                category_map = {
-                    '식당': '식', '카페': '카', '관광지': '관', 
-                    '쇼핑': '쇼', '활동': '활', '숙소': '숙'
-                }
-                short_cat = category_map.get(category, category[:1] if category else '')
-                if short_cat:
-                    info += f"|{short_cat}"
+            line = f"[{original_indices[i]}]{format_place(*place_key[1:6])}"
 
-            # 저장된 장소 플래그 (간략하게)
-            if place.get('is_saved_place'):
-                info += "|⭐"
-            
-            # 좌표 정보 (정밀도 더 낮춤: 소수점 2자리까지만)
-            coords = place.get('coordinates')
-            if coords:
-                lat = round(float(coords.get('lat', 0)), 2)
-                lng = round(float(coords.get('lng', 0)), 2)
-                info += f"|{lat:.2f},{lng:.2f}"
-
-            # 평점 (소수점 제거, 정수만)
-            if place.get('rating'):
-                rating = int(float(place['rating']))
-                info += f"|{rating}"
-                
-            # 주소 정보 제거 또는 매우 짧게 (최대 15자)
-            # 주소는 토큰을 많이 소비하므로 선택적으로만 포함
-            # if place.get('address'):
-            #     address = place['address']
-            #     # 구/동 정보만 추출 시도
-            #     import re
-            #     match = re.search(r'([가-힣]+구|[가-힣]+동)', address)
-            #     if match:
-            #         address = match.group(1)
-            #     elif len(address) > 15:
-            #         address = address[:12] + "..."
-            #     info += f"|{address}"
-            
-            # 링크, 설명 등은 모두 제거 (토큰 절약)
-            formatted.append(info)
-            
-        return "\n\n".join(formatted)
+            # 가까운 장소 인덱스 (가까운 순)
+            nearby = neighbors[i]
+            if nearby:
+                line += "|근처:" + ",".join([f"{original_indices[j]}({distance / 1000:.1f})" for j, distance in nearby])
+            lines.append(line)
+        
+        return lines
+
+    def _index_places_for_prompt(self, places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        장소에 original_index를 기록하고 토큰 예산에 맞춘 장소 리스트 반환
+        (장소가 제외되면 남은 장소 기준으로 original_index를 다시 매김 - 근처 목록/허용 인덱스가 제외된 장소를 가리키지 않도록)
+        """
+        for i, place in enumerate(places):
+            place['original_index'] = i
+        fitted_places = self._fit_places_to_token_budget(places)
+        if len(fitted_places) != len(places):
+            for i, place in enumerate(fitted_places):
+                place['original_index'] = i
+        return fitted_places
+
+    def _fit_places_to_token_budget(self, places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        프롬프트 장소 목록의 토큰 수가 PLACES_PROMPT_TOKEN_BUDGET을 넘으면 우선순위가 낮은 장소부터 제외한 리스트 반환
+        (저장된 장소는 항상 포함, 나머지는 신뢰도/평점 순, 남은 장소는 원래 순서 유지)
+        
+        근처 목록과 허용 인덱스가 남은 장소만 가리키도록 _format_places_for_prompt 전에 호출합니다.
+        """
+        places = places[:MAX_PLACES_FOR_PROMPT]
+        place_keys = [self._place_prompt_key(i, place) for i, place in enumerate(places)]
+        # 이미 포맷팅해 둔 장소 목록은 이 단계를 거친(예산 안에 드는) 목록이므로 토큰 수를 다시 세지 않음
+        hashable = True
+        try:
+            if tuple(place_keys) in _places_prompt_cache:
+                return places
+        except TypeError:
+            hashable = False
+        
+        lines = self._places_prompt_lines(places, place_keys, hashable)
+        encoder = _get_token_encoder(self.llm_model)
+        if encoder is not None:
+            token_counts = [len(tokens) for tokens in encoder.encode_ordinary_batch(lines)]
+        else:
+            token_counts = [len(line) for line in lines]  # 한글 위주라 글자 수를 토큰 수 상한으로 사용
+        if sum(token_counts) <= PLACES_PROMPT_TOKEN_BUDGET:
+            return places
+        
+        priority = sorted(
+            range(len(places)),
+            key=lambda i: (
+                bool(places[i].get('is_saved_place')),
+                _to_float(places[i].get('trust_score')),
+                _to_float(places[i].get('rating')),
+            ),
+            reverse=True,
+        )
+        kept = set()
+        total = 0
+        for i in priority:
+            if not places[i].get('is_saved_place') and total + token_counts[i] > PLACES_PROMPT_TOKEN_BUDGET:
+                break
+            kept.add(i)
+            total += token_counts[i]
+        logger.warning("⚠️ 장소 목록이 토큰 예산(%d)을 넘어 %d/%d개 장소만 포함합니다.", PLACES_PROMPT_TOKEN_BUDGET, len(kept), len(places))
+        return [place for i, place in enumerate(places) if i in kept]
+
+    @staticmethod
+    def _place_prompt_key(i: int, place: Dict[str, Any]) -> tuple:
+        """_format_places_for_prompt 결과에 영향을 주는 장소 값들"""
+        coords = place.get('coordinates')
+        return (
+            place.get('original_index', i),
+            place.get('name', 'Unknown'),
+            place.get('category', ''),
+            bool(place.get('is_saved_place')),
+            (coords.get('lat', 0), coords.get('lng', 0)) if coords else None,
+            place.get('rating'),
+            place.get('trust_score'),  # 토큰 예산을 넘을 때 남길 장소 순서에 쓰임
+        )
@@ -11,6 +11,13 @@ import googlemaps
 import aiohttp
 from datetime import datetime
 from .base_tool import BaseTool
+from utils.geo import haversine_m
+
+# 경로 안내 문자열 정리용 정규식 (호출마다 re 모듈 캐시를 조회하지 않도록 미리 컴파일)
+_HTML_TAG_RE = re.compile(r"<[^>]+>")
+_WHITESPACE_RE = re.compile(r"\s+")
+_DIRECTIONS_STATUS_RE = re.compile(r"status[:\s]+([A-Z_]+)", re.IGNORECASE)
+_DIGITS_RE = re.compile(r"(\d+)")
 
 
 class GoogleMapsTool(BaseTool):
@@ -116,13 +123,13 @@ class GoogleMapsTool(BaseTool):
         """HTML 태그 제거"""
         if not text:
             return ""
-        return re.sub(r'<[^>]+>', '', text)
+        return _HTML_TAG_RE.sub('', text)
     
     def _normalize_address_for_geocode(self, address: str) -> str:
         """지오코딩 입력 정규화"""
         if not address:
             return ""
-        normalized = re.sub(r"\s+", " ", str(address)).strip()
+        normalized = _WHITESPACE_RE.sub(" ", str(address)).strip()
         return normalized
 
     def _log_directions_failure(
@@ -174,8 +181,7 @@ class GoogleMapsTool(BaseTool):
                 error_message = error.error_message
             # 예외 메시지에서 status 패턴 찾기
             if not status and err_text:
-                import re
-                status_match = re.search(r'status[:\s]+([A-Z_]+)', err_text, re.IGNORECASE)
+                status_match = _DIRECTIONS_STATUS_RE.search(err_text)
                 if status_match:
                     status = status_match.group(1)
         
@@ -324,7 +330,7 @@ class GoogleMapsTool(BaseTool):
             if bus_number:
                 # 너무 길면 정리하지만, 웬만하면 그대로 유지
                 if len(bus_number) > 20:
-                    bus_num_match = re.search(r'(\d+)', bus_number)
+                    bus_num_match = _DIGITS_RE.search(bus_number)
                     if bus_num_match:
                         bus_number = bus_num_match.group(1)
             
@@ -344,7 +350,7 @@ class GoogleMapsTool(BaseTool):
                 vehicle_type == "bus" or 
                 "bus" in vehicle_type or 
                 "버스" in line_name or
-                (not is_subway and bus_number and (re.search(r'\d+', bus_number) or "버스" in bus_number))
+                (not is_subway and bus_number and (_DIGITS_RE.search(bus_number) or "버스" in bus_number))
             )
             
             formatted_parts = []
@@ -353,7 +359,7 @@ class GoogleMapsTool(BaseTool):
                 # 노선명 정리
                 subway_line = bus_number or line_name
                 if "line" in subway_line.lower():
-                    line_num_match = re.search(r'(\d+)', subway_line)
+                    line_num_match = _DIGITS_RE.search(subway_line)
                     if line_num_match:
                         subway_line = f"{line_num_match.group(1)}호선"
                 
@@ -1144,18 +1150,9 @@ class GoogleMapsTool(BaseTool):
                         cost = distance_matrix_data[key]
                     else:
                         # 데이터가 없으면 Haversine 거리 사용
-                        import math
                         coord1 = coordinates[current]
                         coord2 = coordinates[idx]
-                        R = 6371000
-                        phi1 = math.radians(coord1[0])
-                        phi2 = math.radians(coord2[0])
-                        delta_phi = math.radians(coord2[0] - coord1[0])
-                        delta_lambda = math.radians(coord2[1] - coord1[1])
-                        a = math.sin(delta_phi / 2) ** 2 + \
-                            math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-                        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-                        cost = R * c
+                        cost = haversine_m(coord1[0], coord1[1], coord2[0], coord2[1])
                     
                     if cost < min_cost:
                         min_cost = cost
@@ -1196,24 +1193,6 @@ class GoogleMapsTool(BaseTool):
         Returns:
             최적화된 순서의 인덱스 리스트
         """
-        def haversine_distance(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
-            """두 좌표 간의 대략적인 거리 계산 (Haversine 공식)"""
-            import math
-            lat1, lon1 = coord1
-            lat2, lon2 = coord2
-            R = 6371000  # 지구 반지름 (미터)
-            
-            phi1 = math.radians(lat1)
-            phi2 = math.radians(lat2)
-            delta_phi = math.radians(lat2 - lat1)
-            delta_lambda = math.radians(lon2 - lon1)
-            
-            a = math.sin(delta_phi / 2) ** 2 + \
-                math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-            
-            return R * c
-        
         if len(coordinates) <= 1:
             return list(range(len(coordinates)))
         
@@ -1221,7 +1200,7 @@ class GoogleMapsTool(BaseTool):
         start_idx = 0
         if origin_coords:
             # origin과 가장 가까운 좌표 찾기
-            distances = [haversine_distance(origin_coords, coord) for coord in coordinates]
+            distances = [haversine_m(origin_coords[0], origin_coords[1], coord[0], coord[1]) for coord in coordinates]
             start_idx = distances.index(min(distances))
         
         # 방문하지 않은 인덱스 리스트
@@ -1248,7 +1227,7 @@ class GoogleMapsTool(BaseTool):
                         nearest_idx = idx
                         break
                 
-                dist = haversine_distance(current, coordinates[idx])
+                dist = haversine_m(current[0], current[1], coordinates[idx][0], coordinates[idx][1])
                 if dist < nearest_dist:
                     nearest_dist = dist
                     nearest_idx = idx
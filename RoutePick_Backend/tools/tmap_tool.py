@@ -11,6 +11,10 @@ import urllib.parse
 import json
 import math
 from .base_tool import BaseTool
+from utils.geo import haversine_m
+
+# 호스트당 최대 동시 연결 수 (check_routing_batch 등 동시 요청용, 연결은 keep-alive로 재사용)
+TMAP_MAX_CONNECTIONS = 20
 
 
 class TMapTool(BaseTool):
@@ -44,6 +48,33 @@ class TMapTool(BaseTool):
         self.base_url = "https://apis.openapi.sk.com"
         self.pedestrian_url = f"{self.base_url}/tmap/routes/pedestrian"
         self.car_url = f"{self.base_url}/tmap/routes"
+        
+        # 이벤트 루프별 HTTP 세션 (요청마다 새 TLS 연결을 맺지 않도록 재사용)
+        # 작업마다 별도 이벤트 루프에서 실행되므로 루프 단위로 보관
+        # 세션이 루프를 참조하므로 자동으로 정리되지 않음: 루프를 소유한 쪽이 루프가 끝나기 전에 반드시 close() 호출
+        self._sessions: Dict[asyncio.AbstractEventLoop, aiohttp.ClientSession] = {}
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """현재 이벤트 루프의 HTTP 세션 반환 (없으면 생성)"""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit_per_host=TMAP_MAX_CONNECTIONS)
+            )
+            self._sessions[loop] = session
+        return session
+    
+    async def close(self):
+        """
+        현재 이벤트 루프의 HTTP 세션 종료
+        
+        execute()/_make_request()를 사용한 이벤트 루프마다 루프가 끝나기 전에 한 번 호출해야 합니다.
+        (호출하지 않으면 세션/연결과 루프가 계속 남음 - RoutingAgent.execute, CourseCreationTool.execute에서 호출)
+        """
+        session = self._sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None and not session.closed:
+            await session.close()
     
     def _url_encode(self, text: str) -> str:
         """UTF-8 기반 URL 인코딩"""
@@ -71,65 +102,65 @@ class TMapTool(BaseTool):
         params = {"version": str(version)}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, headers=headers, json=data, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
-                    if response.status == 200:
-                        try:
-                            result = await response.json()
-                            # 응답이 비어있는지 확인
-                            if not result or (isinstance(result, dict) and not result.get("features")):
-                                response_text = await response.text()
-                                print(f"⚠️ T Map API 응답이 비어있습니다. 응답 내용: {response_text[:500]}")
-                                return None
-                            return result
-                        except Exception as e:
-                            try:
-                                response_text = await response.text()
-                                print(f"❌ T Map API JSON 파싱 실패: {e}")
-                                print(f"   응답 내용: {response_text[:500]}")
-                            except:
-                                print(f"❌ T Map API JSON 파싱 실패: {e}")
+            session = self._get_session()
+            async with session.post(url, headers=headers, json=data, params=params, timeout=aiohttp.ClientTimeout(total=30)) as response:
+                if response.status == 200:
+                    try:
+                        result = await response.json()
+                        # 응답이 비어있는지 확인
+                        if not result or (isinstance(result, dict) and not result.get("features")):
+                            response_text = await response.text()
+                            print(f"⚠️ T Map API 응답이 비어있습니다. 응답 내용: {response_text[:500]}")
                             return None
-                    else:
-                        # 에러 응답 상세 로깅
-                        response_text = await response.text()
-                        print(f"❌ T Map API 요청 실패 ({response.status})")
-                        print(f"   요청 URL: {url}")
-                        print(f"   요청 데이터: {data}")
-                        print(f"   응답 내용: {response_text[:500]}")
-                        
-                        # JSON 형식의 에러 응답 파싱 시도
-                        error_msg = None
+                        return result
+                    except Exception as e:
                         try:
-                            if response_text:
-                                error_json = json.loads(response_text)
-                                error_msg = (
-                                    error_json.get("errorMessage") or 
-                                    error_json.get("message") or 
-                                    error_json.get("error") or 
-                                    error_json.get("statusMessage") or
-                                    str(error_json)
-                                )
-                                print(f"   에러 메시지: {error_msg}")
+                            response_text = await response.text()
+                            print(f"❌ T Map API JSON 파싱 실패: {e}")
+                            print(f"   응답 내용: {response_text[:500]}")
                         except:
-                            # JSON 파싱 실패 시 원문 출력
-                            print(f"   에러 메시지 (원문): {response_text[:500]}")
-                            error_msg = response_text[:200] if response_text else "알 수 없는 오류"
+                            print(f"❌ T Map API JSON 파싱 실패: {e}")
+                        return None
+                else:
+                    # 에러 응답 상세 로깅
+                    response_text = await response.text()
+                    print(f"❌ T Map API 요청 실패 ({response.status})")
+                    print(f"   요청 URL: {url}")
+                    print(f"   요청 데이터: {data}")
+                    print(f"   응답 내용: {response_text[:500]}")
                         
-                        # 401, 403 에러는 API 키 문제
-                        if response.status in [401, 403]:
-                            print(f"   → API 키 인증 문제일 수 있습니다. T Map API 키를 확인해주세요.")
-                        elif response.status == 400:
-                            print(f"   → 잘못된 요청입니다. 요청 파라미터를 확인해주세요.")
-                            # 400 에러의 경우 특정 에러 메시지 확인
-                            if error_msg and ("too near" in error_msg.lower() or "너무 가깝" in error_msg):
-                                print(f"   → 두 지점이 너무 가까워 경로를 계산할 수 없습니다.")
-                        elif response.status == 404:
-                            print(f"   → API 엔드포인트를 찾을 수 없습니다.")
-                        elif response.status == 500:
-                            print(f"   → 서버 내부 오류입니다.")
+                    # JSON 형식의 에러 응답 파싱 시도
+                    error_msg = None
+                    try:
+                        if response_text:
+                            error_json = json.loads(response_text)
+                            error_msg = (
+                                error_json.get("errorMessage") or 
+                                error_json.get("message") or 
+                                error_json.get("error") or 
+                                error_json.get("statusMessage") or
+                                str(error_json)
+                            )
+                            print(f"   에러 메시지: {error_msg}")
+                    except:
+                        # JSON 파싱 실패 시 원문 출력
+                        print(f"   에러 메시지 (원문): {response_text[:500]}")
+                        error_msg = response_text[:200] if response_text else "알 수 없는 오류"
                         
-                        return None
+                    # 401, 403 에러는 API 키 문제
+                    if response.status in [401, 403]:
+                        print(f"   → API 키 인증 문제일 수 있습니다. T Map API 키를 확인해주세요.")
+                    elif response.status == 400:
+                        print(f"   → 잘못된 요청입니다. 요청 파라미터를 확인해주세요.")
+                        # 400 에러의 경우 특정 에러 메시지 확인
+                        if error_msg and ("too near" in error_msg.lower() or "너무 가깝" in error_msg):
+                            print(f"   → 두 지점이 너무 가까워 경로를 계산할 수 없습니다.")
+                    elif response.status == 404:
+                        print(f"   → API 엔드포인트를 찾을 수 없습니다.")
+                    elif response.status == 500:
+                        print(f"   → 서버 내부 오류입니다.")
+                        
+                    return None
         except asyncio.TimeoutError:
             print(f"❌ T Map API 요청 타임아웃 (30초 초과)")
             return None
@@ -534,21 +565,7 @@ class TMapTool(BaseTool):
                 end_y = end_lat
                 
                 # 두 지점 간 거리 확인 (너무 가까우면 경로 계산 불필요)
-                import math
-                def haversine_distance(lat1, lon1, lat2, lon2):
-                    """두 지점 간 거리 계산 (미터)"""
-                    R = 6371000  # 지구 반지름 (미터)
-                    phi1 = math.radians(lat1)
-                    phi2 = math.radians(lat2)
-                    delta_phi = math.radians(lat2 - lat1)
-                    delta_lambda = math.radians(lon2 - lon1)
-                    
-                    a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
-                    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                    
-                    return R * c
-                
-                distance_m = haversine_distance(start_lat, start_lng, end_lat, end_lng)
+                distance_m = haversine_m(start_lat, start_lng, end_lat, end_lng)
                 
                 # 거리가 너무 가까우면 (10미터 이하) 직접 경로로 처리
                 if distance_m < 10:
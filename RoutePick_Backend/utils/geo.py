@@ -0,0 +1,199 @@
+"""
+좌표 거리 계산 유틸리티
+장소 목록 전체의 거리를 NumPy로 한 번에 계산합니다.
+"""
+
+import math
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+EARTH_RADIUS_M = 6371000  # 지구 반지름 (미터)
+
+# 한국 영역 경계 (대략적인 범위)
+KOREA_MIN_LAT = 33.0  # 제주도 남쪽
+KOREA_MAX_LAT = 38.6  # DMZ 북쪽
+KOREA_MIN_LNG = 124.5  # 서해
+KOREA_MAX_LNG = 132.0  # 동해
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """두 지점 간 haversine 거리 (미터). 한 쌍만 계산할 때는 NumPy보다 math가 빠름"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    sin_dlat = math.sin((phi2 - phi1) / 2)
+    sin_dlng = math.sin(math.radians(lng2 - lng1) / 2)
+    a = sin_dlat * sin_dlat + math.cos(phi1) * math.cos(phi2) * sin_dlng * sin_dlng
+    return 2 * EARTH_RADIUS_M * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_matrix(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """
+    모든 장소 쌍의 haversine 거리 행렬 계산
+
+    Args:
+        lats: 위도 배열 (도 단위)
+        lngs: 경도 배열 (도 단위)
+
+    Returns:
+        (N, N) 거리 행렬 (미터)
+    """
+    lat_rad = np.radians(lats)
+    lng_rad = np.radians(lngs)
+    dlat = lat_rad[:, None] - lat_rad[None, :]
+    dlng = lng_rad[:, None] - lng_rad[None, :]
+    cos_lat = np.cos(lat_rad)
+    a = np.sin(dlat / 2) ** 2 + cos_lat[:, None] * cos_lat[None, :] * np.sin(dlng / 2) ** 2
+    return (2 * EARTH_RADIUS_M) * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def haversine_distances(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    같은 길이의 두 좌표 배열에 대해 원소별 haversine 거리 계산
+    (연속 구간 거리는 lats[:-1], lngs[:-1], lats[1:], lngs[1:]로 한 번에 계산)
+
+    Args:
+        lat1, lng1: 출발 위도/경도 배열 (도 단위)
+        lat2, lng2: 도착 위도/경도 배열 (도 단위)
+
+    Returns:
+        (N,) 거리 배열 (미터)
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlng = np.radians(lng2) - np.radians(lng1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return (2 * EARTH_RADIUS_M) * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def extract_coordinates(places: List[Dict[str, Any]]) -> Tuple[List[int], np.ndarray, np.ndarray]:
+    """
+    좌표가 있는 장소의 위치와 위도/경도 배열 추출 (좌표가 없거나 숫자가 아니면 제외)
+    
+    Returns:
+        (좌표가 있는 장소의 places 내 위치 리스트, 위도 배열, 경도 배열)
+    """
+    positions = []
+    lats = []
+    lngs = []
+    for i, place in enumerate(places):
+        coords = place.get('coordinates')
+        if not coords:
+            continue
+        try:
+            lat = float(coords.get('lat'))
+            lng = float(coords.get('lng'))
+        except (TypeError, ValueError):
+            continue
+        positions.append(i)
+        lats.append(lat)
+        lngs.append(lng)
+    return positions, np.array(lats), np.array(lngs)
+
+
+def korea_bounds_mask(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """위도/경도 배열의 원소별 한국 영역 포함 여부 (bool 배열)"""
+    return (lats >= KOREA_MIN_LAT) & (lats <= KOREA_MAX_LAT) & (lngs >= KOREA_MIN_LNG) & (lngs <= KOREA_MAX_LNG)
+
+
+def korea_mask(places: List[Dict[str, Any]]) -> Tuple[List[int], np.ndarray]:
+    """
+    좌표가 있는 장소별로 한국 영역 안에 있는지 한 번에 계산
+    
+    Returns:
+        (좌표가 있는 장소의 places 내 위치 리스트, 같은 길이의 bool 배열)
+    """
+    positions, lats, lngs = extract_coordinates(places)
+    return positions, korea_bounds_mask(lats, lngs)
+
+
+def nearest_neighbors(places: List[Dict[str, Any]], k: int = 5) -> List[Optional[List[Tuple[int, float]]]]:
+    """
+    장소별로 가장 가까운 k개 장소의 위치(리스트 인덱스)와 거리 계산
+
+    Args:
+        places: 장소 리스트 (coordinates: {"lat", "lng"} 포함)
+        k: 장소당 이웃 수
+
+    Returns:
+        places와 같은 길이의 리스트. 각 항목은 (위치, 거리(미터)) 리스트
+        (좌표가 없는 장소는 None, 가까운 순으로 정렬)
+    """
+    positions, lats, lngs = extract_coordinates(places)
+
+    neighbors: List[Optional[List[Tuple[int, float]]]] = [None] * len(places)
+    n = len(positions)
+    if n < 2:
+        return neighbors
+
+    dist = haversine_matrix(lats.astype(np.float32), lngs.astype(np.float32))
+    np.fill_diagonal(dist, np.inf)  # 자기 자신 제외
+
+    k = min(k, n - 1)
+    nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    # argpartition은 순서를 보장하지 않으므로 k개 안에서만 거리순 정렬
+    rows = np.arange(n)[:, None]
+    nearest = np.take_along_axis(nearest, np.argsort(dist[rows, nearest], axis=1, kind='stable'), axis=1)
+
+    nearest_dist = np.take_along_axis(dist, nearest, axis=1)
+    for row, pos in enumerate(positions):
+        neighbors[pos] = [
+            (positions[j], d) for j, d in zip(nearest[row].tolist(), nearest_dist[row].tolist())
+        ]
+    return neighbors
+
+
+def shortest_path_order(dist: np.ndarray) -> List[int]:
+    """
+    거리 행렬 기준으로 모든 지점을 한 번씩 지나는 짧은 이동 순서 (출발/도착 지점 자유, 근사해)
+
+    모든 지점에서 출발하는 최근접 이웃 경로 중 가장 짧은 경로를 2-opt로 개선합니다.
+    (코스 후보 수준(수십 개)에서는 1ms 안팎)
+
+    Args:
+        dist: (N, N) 거리 행렬
+
+    Returns:
+        지점 인덱스의 방문 순서
+    """
+    n = len(dist)
+    if n < 3:
+        return list(range(n))
+    d = dist.tolist()  # 작은 행렬은 파이썬 리스트 인덱싱이 NumPy 원소 접근보다 빠름
+
+    best_order: List[int] = []
+    best_length = math.inf
+    for start in range(n):
+        order = [start]
+        unvisited = set(range(n))
+        unvisited.remove(start)
+        length = 0.0
+        while unvisited:
+            row = d[order[-1]]
+            nxt = min(unvisited, key=row.__getitem__)
+            length += row[nxt]
+            order.append(nxt)
+            unvisited.remove(nxt)
+        if length < best_length:
+            best_order, best_length = order, length
+
+    # 2-opt: 구간 [i, j]를 뒤집어 짧아지면 반영 (양 끝 구간은 바깥쪽 간선이 없음)
+    improved = True
+    while improved:
+        improved = False
+        for i in range(n - 1):
+            for j in range(i + 1, n):
+                if i == 0 and j == n - 1:
+                    continue
+                b, c = best_order[i], best_order[j]
+                delta = 0.0
+                if i > 0:
+                    a = best_order[i - 1]
+                    delta += d[a][c] - d[a][b]
+                if j < n - 1:
+                    e = best_order[j + 1]
+                    delta += d[b][e] - d[c][e]
+                if delta < -1e-9:
+                    best_order[i:j + 1] = best_order[i:j + 1][::-1]
+                    improved = True
+    return best_order
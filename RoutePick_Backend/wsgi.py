@@ -0,0 +1,13 @@
+"""
+운영 환경용 WSGI 진입점
+
+gunicorn --preload -w 1 -k gthread --threads 8 -b 0.0.0.0:${PORT:-5000} wsgi:app
+
+- --preload: 카드 템플릿/폰트 등 모듈 로드 시 만드는 캐시를 마스터에서 한 번만 준비
+- 작업 상태(agent_tasks)를 프로세스 메모리에 보관하므로 워커는 1개로 두고 스레드로 동시 요청 처리
+  (워커를 늘리려면 같은 작업의 요청이 같은 워커로 가도록 sticky session 필요)
+"""
+
+from app import app
+
+__all__ = ["app"]